@@ -3,8 +3,10 @@ Core Agent implementation for visual tool generation.
 This module provides the VisualAgent class that handles LLM-based conversation and visualization.
 """
 
+import asyncio
 import json
 import os
+import time
 from typing import Dict, Any, Optional, List, AsyncGenerator
 
 from langchain_openai import ChatOpenAI
@@ -13,6 +15,7 @@ from langchain_core.output_parsers import JsonOutputParser
 
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.services.dataset import DatasetService
 from app.services.visual import VisualService
 from app.agent.models import (
     VisualToolRequest,
@@ -22,6 +25,8 @@ from app.agent.models import (
 from app.agent.rag import VisualRAG
 from app.agent.prompts import JSON_GENERATION_PROMPT
 from app.agent.error_recovery import ErrorRecoveryAgent
+from app.utils.llm_cache import LLMResponseCache, cache_config
+from app.utils.tracing import record, span
 
 logger = get_logger("visual_agent")
 
@@ -37,6 +42,9 @@ class VisualAgent:
     4. Analyze results and provide insights
     """
 
+    # Number of most recent messages included in the prompt history
+    HISTORY_MESSAGES = 10
+
     def __init__(self, llm_config: Optional[Dict[str, Any]] = None):
         """
         Initialize the visual agent
@@ -85,6 +93,8 @@ class VisualAgent:
             if self.rag.embed_model:
                 self.rag.build_index()
                 logger.info("RAG index built successfully")
+                # Reuse the embedding model for near-duplicate LLM cache lookups
+                LLMResponseCache.set_embedder(self.rag.embed_model.get_query_embedding)
             else:
                 logger.info(
                     "RAG index not built: No embedding model available. "
@@ -168,6 +178,7 @@ Return a JSON object with:
   - chart_type: e.g., "scatter/volcano" or "heatmap/cluster_basic"
   - engine: "r" or "python" (default: "r")
   - data: array of data objects (if provided)
+  - dataset: ID of an uploaded dataset (from a "[数据集 ...] dataset=<id>" block in the request); set this instead of data and use the profiled column names in mappings
   - params: Complete JSON configuration object (ggplot2 or heatmap structure)
   - reasoning: why you chose this chart type and configuration
 - show_example: Tool name if user wants to see an example (e.g., "scatter/volcano")
@@ -356,10 +367,13 @@ Return only the title text, nothing else.""",
             logger.debug("No conversation history provided")
             return "No previous conversation."
 
-        logger.debug(f"Formatting {len(messages)} messages for history (using last 10)")
+        logger.debug(
+            f"Formatting {len(messages)} messages for history "
+            f"(using last {self.HISTORY_MESSAGES})"
+        )
         formatted = []
-        # Use last 10 messages to avoid token overflow
-        recent_messages = messages[-10:]
+        # Use last N messages to avoid token overflow
+        recent_messages = messages[-self.HISTORY_MESSAGES :]
         for msg in recent_messages:
             role = msg.get("role", "user")
             content = msg.get("content", "")
@@ -372,10 +386,25 @@ Return only the title text, nothing else.""",
         logger.debug(f"Formatted history length: {len(history_str)} characters")
         return history_str
 
+    @staticmethod
+    def _understanding_cache(
+        conversation_history: List[Dict[str, Any]],
+        files: Optional[List[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Cache policy for the understanding call. Only first turns without
+        attachments (e.g. common knowledge questions) are answered from the
+        cache; the prompt names uploaded files but not their content.
+        """
+        if conversation_history or files:
+            return cache_config("off")
+        return cache_config("exact")
+
     async def process_message(
         self,
         user_message: str,
         conversation_history: List[Dict[str, Any]] = None,
+        files: Optional[List[Dict[str, Any]]] = None,
     ) -> AgentResponse:
         """
         Process a user message and return agent response.
@@ -383,6 +412,7 @@ Return only the title text, nothing else.""",
         Args:
             user_message: User's input message
             conversation_history: Previous conversation messages
+            files: Files uploaded with this message
 
         Returns:
             AgentResponse with message, needs_info, and optional visual_request
@@ -406,9 +436,10 @@ Return only the title text, nothing else.""",
             knowledge_base = ""
             if self.rag and self.rag.embed_model:
                 try:
-                    knowledge_base = self.rag.get_relevant_context(
-                        user_message, max_results=3
-                    )
+                    with span("rag.retrieve"):
+                        knowledge_base = self.rag.get_relevant_context(
+                            user_message, max_results=3
+                        )
                     if knowledge_base:
                         logger.debug(
                             f"Retrieved {len(knowledge_base)} characters of RAG context for query: {user_message[:50]}..."
@@ -430,7 +461,11 @@ Return only the title text, nothing else.""",
                 "KNOWLEDGE_BASE": knowledge_base,  # Inject RAG knowledge
             }
 
-            result = await chain.ainvoke(prompt_vars)
+            with span("llm.understand"):
+                result = await chain.ainvoke(
+                    prompt_vars,
+                    config=self._understanding_cache(conversation_history, files),
+                )
 
             # Convert dict to AgentResponse
             if isinstance(result, dict):
@@ -471,6 +506,7 @@ Return only the title text, nothing else.""",
         self,
         user_message: str,
         conversation_history: List[Dict[str, Any]] = None,
+        files: Optional[List[Dict[str, Any]]] = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         Process a user message with streaming response.
@@ -478,6 +514,7 @@ Return only the title text, nothing else.""",
         Args:
             user_message: User's input message
             conversation_history: Previous conversation messages
+            files: Files uploaded with this message
 
         Yields:
             Dict with type and content for streaming
@@ -503,9 +540,10 @@ Return only the title text, nothing else.""",
             knowledge_base = ""
             if self.rag and self.rag.embed_model:
                 try:
-                    knowledge_base = self.rag.get_relevant_context(
-                        user_message, max_results=3
-                    )
+                    with span("rag.retrieve"):
+                        knowledge_base = self.rag.get_relevant_context(
+                            user_message, max_results=3
+                        )
                     logger.debug(
                         f"Retrieved {len(knowledge_base)} characters of knowledge from RAG"
                     )
@@ -529,11 +567,19 @@ Return only the title text, nothing else.""",
             # Stream the LLM response
             full_content = ""
             message_text = ""  # Extract just the message field from JSON
+            llm_start = time.perf_counter()
+            first_token_at = None
 
-            async for chunk in chain.astream(prompt_vars):
+            async for chunk in chain.astream(
+                prompt_vars,
+                config=self._understanding_cache(conversation_history, files),
+            ):
                 if hasattr(chunk, "content"):
                     content = chunk.content
                     if content:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            record("llm.ttft", first_token_at - llm_start, llm_start)
                         full_content += content
 
                         # Try to extract message field from partial JSON for streaming display
@@ -561,6 +607,13 @@ Return only the title text, nothing else.""",
                             "needs_info": False,  # Will be updated after parsing
                         }
 
+            record(
+                "llm.stream",
+                time.perf_counter() - llm_start,
+                llm_start,
+                chars=len(full_content),
+            )
+
             # Parse the complete response
             parser = JsonOutputParser(pydantic_object=AgentResponse)
             try:
@@ -606,9 +659,7 @@ Return only the title text, nothing else.""",
                     "missing_params": result.get("missing_params", []),
                     "suggestions": result.get("suggestions", []),
                     "visual_request": (
-                        result["visual_request"].dict()
-                        if result.get("visual_request")
-                        else None
+                        visual_request.dict() if visual_request else None
                     ),
                     "show_example": result.get("show_example"),
                 }
@@ -650,20 +701,29 @@ Return only the title text, nothing else.""",
 
         for attempt in range(max_retries + 1):
             try:
+                # Uploaded datasets are read from their Parquet copy
+                data = visual_request.data or []
+                if not data and visual_request.dataset:
+                    with span("dataset.load", dataset=visual_request.dataset[:12]):
+                        data = await asyncio.to_thread(
+                            DatasetService.load_rows, visual_request.dataset, user_id
+                        )
+
                 # Prepare parameters for visual service
                 params = {
                     "chart_type": visual_request.chart_type,
                     "engine": visual_request.engine,
-                    "data": visual_request.data or [],
+                    "data": data,
                     **visual_request.params,
                 }
 
                 # Call visual service
-                result = await VisualService.run_tool(
-                    tool=visual_request.chart_type.replace("/", "_"),
-                    params=params,
-                    user_id=user_id,
-                )
+                with span("render", chart_type=visual_request.chart_type, attempt=attempt):
+                    result = await VisualService.run_tool(
+                        tool=visual_request.chart_type.replace("/", "_"),
+                        params=params,
+                        user_id=user_id,
+                    )
 
                 # If successful, return result
                 if result.success:
@@ -674,6 +734,9 @@ Return only the title text, nothing else.""",
                         "pdf_url": result.pdf_url,
                         "data_url": result.data_url,
                         "retry_count": attempt,
+                        # The request actually rendered (error recovery may have
+                        # changed it)
+                        "visual_request": visual_request,
                     }
 
                 # If failed and we have error details, try to recover
@@ -689,12 +752,13 @@ Return only the title text, nothing else.""",
 
                     if self.error_recovery and enable_error_recovery:
                         # Analyze the error
-                        error_analysis = await self.error_recovery.analyze_error(
-                            error_details=result.error_details,
-                            data_info=result.data_info,
-                            original_config=visual_request.params,
-                            original_request=visual_request,
-                        )
+                        with span("llm.error_analysis"):
+                            error_analysis = await self.error_recovery.analyze_error(
+                                error_details=result.error_details,
+                                data_info=result.data_info,
+                                original_config=visual_request.params,
+                                original_request=visual_request,
+                            )
 
                         logger.info(
                             f"Error analysis: {error_analysis.error_type} - {error_analysis.error_description}"
@@ -702,23 +766,28 @@ Return only the title text, nothing else.""",
 
                         # Try to fix the request
                         if error_analysis.can_auto_fix:
-                            fixed_request = await self.error_recovery.fix_request(
-                                error_analysis=error_analysis,
-                                original_request=visual_request,
-                                data_info=result.data_info,
-                            )
+                            with span("llm.error_fix"):
+                                fixed_request = await self.error_recovery.fix_request(
+                                    error_analysis=error_analysis,
+                                    original_request=visual_request,
+                                    data_info=result.data_info,
+                                )
 
                             if fixed_request:
                                 logger.info(
                                     f"Applied fixes: {fixed_request.fixes_applied}"
                                 )
                                 # Update visual_request with fixed version
-                                visual_request = VisualToolRequest(
-                                    chart_type=fixed_request.chart_type,
-                                    engine=fixed_request.engine,
-                                    data=fixed_request.data,
-                                    params=fixed_request.params,
-                                    reasoning=fixed_request.reasoning,
+                                # (keeping the dataset reference and inline rows the
+                                # fix doesn't replace)
+                                visual_request = visual_request.model_copy(
+                                    update={
+                                        "chart_type": fixed_request.chart_type,
+                                        "engine": fixed_request.engine,
+                                        "data": fixed_request.data or visual_request.data,
+                                        "params": fixed_request.params,
+                                        "reasoning": fixed_request.reasoning,
+                                    }
                                 )
                                 # Continue to next retry
                                 last_error = error_analysis
@@ -785,13 +854,14 @@ Return only the title text, nothing else.""",
             parser = JsonOutputParser(pydantic_object=VisualAnalysisResponse)
             chain = self.analysis_prompt | self.llm | parser
 
-            result = await chain.ainvoke(
-                {
-                    "chart_type": chart_type,
-                    "params": json.dumps(params, indent=2),
-                    "user_request": user_request,
-                }
-            )
+            with span("llm.analysis"):
+                result = await chain.ainvoke(
+                    {
+                        "chart_type": chart_type,
+                        "params": json.dumps(params, indent=2),
+                        "user_request": user_request,
+                    }
+                )
 
             if isinstance(result, dict):
                 return VisualAnalysisResponse(**result)
@@ -829,9 +899,11 @@ Return only the title text, nothing else.""",
 
         try:
             # Use LLM to generate title
-            result = await self.llm.ainvoke(
-                self.title_prompt.format_messages(user_message=user_message)
-            )
+            with span("llm.title"):
+                result = await self.llm.ainvoke(
+                    self.title_prompt.format_messages(user_message=user_message),
+                    config=cache_config("semantic", query=user_message),
+                )
 
             # Extract title from response
             title = result.content.strip()
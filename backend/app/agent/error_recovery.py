@@ -9,6 +9,7 @@ from pydantic import BaseModel, Field
 
 from app.core.logging import get_logger
 from app.agent.models import VisualToolRequest
+from app.utils.llm_cache import cache_config
 
 logger = get_logger("error_recovery")
 
@@ -170,7 +171,9 @@ Please provide a fixed version of the request that addresses the error.""",
                     "data_info": json.dumps(data_info, indent=2),
                     "original_config": json.dumps(original_config, indent=2),
                     "original_request": original_request.dict(),
-                }
+                },
+                # Recurring error signatures get the same analysis
+                config=cache_config("exact"),
             )
             
             if isinstance(result, dict):
@@ -216,7 +219,8 @@ Please provide a fixed version of the request that addresses the error.""",
                     "error_analysis": error_analysis.dict(),
                     "original_request": original_request.dict(),
                     "data_info": json.dumps(data_info, indent=2),
-                }
+                },
+                config=cache_config("exact"),
             )
             
             if isinstance(result, dict):
@@ -11,6 +11,7 @@ class VisualToolRequest(BaseModel):
     chart_type: str = Field(..., description="Chart type (e.g., scatter/volcano, heatmap/cluster_basic)")
     engine: str = Field(default="r", description="Engine to use: 'r' or 'python'")
     data: Optional[List[Dict[str, Any]]] = Field(None, description="Chart data")
+    dataset: Optional[str] = Field(None, description="ID of an uploaded dataset to plot instead of inline data")
     params: Dict[str, Any] = Field(default_factory=dict, description="Additional chart parameters")
     reasoning: str = Field(..., description="Reasoning for choosing this chart type")
 
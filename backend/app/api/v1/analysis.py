@@ -158,9 +158,11 @@ async def run_analysis_tool(
 ):
     try:
         result = await AnalysisService.run_analysis(tool, params, user_id=user.id)
+        data = result.get("data")
         return AnalysisRunResponse(
             success=True,
-            data=result.get("data", []),
+            # 结果以 Arrow 表传递，只在响应时生成 JSON 行
+            data=data.rows() if data is not None else [],
             message="Analysis tool executed successfully",
             tool=tool,
             used_params=params,
@@ -12,6 +12,8 @@ import json
 from app.api.deps import get_current_active_user, get_db
 from app.models.user import User
 from app.orchestration import ChatOrchestrator
+from app.services.chat_upload import ChatUploadService, UploadTooLargeError
+from app.services.dataset import DatasetService
 from app.core.logging import get_logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -42,6 +44,10 @@ def get_chat_orchestrator() -> ChatOrchestrator:
     return _chat_orchestrator
 
 
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
 @router.post("")
 async def chat(
     request: ChatRequest,
@@ -107,6 +113,7 @@ async def chat_stream(
     - Agent message saved AFTER streaming completes (not per chunk)
 
     Returns streaming JSON responses with different event types:
+    - "upload_progress" / "upload_complete": Attachment copy progress
     - "message": Agent's text response
     - "generating": Visualization generation in progress
     - "visualization": Visualization result
@@ -124,46 +131,29 @@ async def chat_stream(
     try:
         orchestrator = get_chat_orchestrator()
 
-        # Process uploaded files - save to temporary storage
-        file_info = []
-        if files:
-            import uuid
-            from pathlib import Path
-            from app.core.config import settings
-            from aiofile import AIOFile
-
-            # Create temporary directory for chat files
-            temp_dir = settings.static_root / "chat_files" / str(current_user.id)
-            temp_dir.mkdir(parents=True, exist_ok=True)
-
+        # Reject oversized attachments before the stream starts; the rest
+        # are copied to disk inside the stream so progress reaches the client
+        try:
             for file in files:
-                # Generate unique filename
-                file_ext = Path(file.filename).suffix if file.filename else ""
-                unique_filename = f"{uuid.uuid4()}{file_ext}"
-                file_path = temp_dir / unique_filename
-
-                # Save file to disk
-                content = await file.read()
-                async with AIOFile(file_path, "wb") as f:
-                    await f.write(content)
-
-                # Get relative path for URL
-                relative_path = f"chat_files/{current_user.id}/{unique_filename}"
-                file_url = f"/static/{relative_path}"
-
-                file_info.append(
-                    {
-                        "filename": file.filename or "unknown",
-                        "size": len(content),
-                        "content_type": file.content_type,
-                        "file_path": str(file_path),
-                        "file_url": file_url,
-                        "relative_path": relative_path,
-                    }
-                )
-                await file.seek(0)  # Reset file pointer
+                ChatUploadService.check_size(file)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
 
         async def generate():
+            file_info = []
+            try:
+                for file in files:
+                    async for event in ChatUploadService.save(file, current_user.id):
+                        if event["type"] == "upload_complete":
+                            file_info.append(event.pop("file"))
+                            # Profile tables while the rest uploads
+                            DatasetService.schedule(file_info[-1], current_user.id)
+                        yield _sse(event)
+            except UploadTooLargeError as e:
+                yield _sse({"type": "error", "content": str(e)})
+                yield "data: [DONE]\n\n"
+                return
+
             async for chunk in orchestrator.process_stream(
                 db=db,
                 user_message=message,
@@ -171,7 +161,7 @@ async def chat_stream(
                 user_id=current_user.id,
                 files=file_info,
             ):
-                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                yield _sse(chunk)
             yield "data: [DONE]\n\n"
 
         return StreamingResponse(
@@ -184,6 +174,8 @@ async def chat_stream(
             },
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat_stream endpoint: {e}", exc_info=True)
         raise HTTPException(
@@ -17,6 +17,7 @@ from app.schemas.conversation import (
     ConversationResponse,
     ConversationListResponse,
     ConversationListItem,
+    ConversationPageResponse,
     MessageResponse,
     LLMConfig,
 )
@@ -128,9 +129,57 @@ async def list_conversations(
         )
 
 
+@router.get("/summaries", response_model=ConversationPageResponse)
+async def list_conversation_summaries(
+    limit: int = Query(30, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    preview_chars: int = Query(200, ge=0, le=2000),
+    include_inactive: bool = Query(False),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List conversations for the sidebar, newest first, with a preview of each
+    conversation's last message.
+
+    Args:
+        limit: Page size
+        cursor: ``next_cursor`` from the previous page (first page if not provided)
+        preview_chars: Maximum length of the last-message preview
+        include_inactive: Whether to include archived conversations
+        current_user: Current authenticated user
+        db: Database session
+
+    Returns:
+        A page of conversation summaries and the cursor of the next page
+    """
+    try:
+        conversations, next_cursor = (
+            await ConversationService.list_conversation_summaries(
+                db=db,
+                user_id=current_user.id,
+                limit=limit,
+                cursor=cursor,
+                preview_chars=preview_chars,
+                include_inactive=include_inactive,
+            )
+        )
+        return ConversationPageResponse(
+            conversations=conversations, next_cursor=next_cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing conversation summaries: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"Error listing conversations: {str(e)}"
+        )
+
+
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: int,
+    message_limit: Optional[int] = Query(None, ge=1, le=1000),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
@@ -139,6 +188,7 @@ async def get_conversation(
 
     Args:
         conversation_id: Conversation ID
+        message_limit: Only include the last N messages (all if not provided)
         current_user: Current authenticated user
         db: Database session
 
@@ -147,7 +197,11 @@ async def get_conversation(
     """
     try:
         conversation = await ConversationService.get_conversation(
-            db=db, conversation_id=conversation_id, user_id=current_user.id
+            db=db,
+            conversation_id=conversation_id,
+            user_id=current_user.id,
+            load="recent" if message_limit else "full",
+            message_limit=message_limit or 0,
         )
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -227,6 +281,7 @@ async def update_conversation(
             conversation_id=conversation_id,
             user_id=current_user.id,
             update_data=update_data,
+            load="full",  # The response includes the messages
         )
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -266,7 +321,10 @@ async def update_conversation_llm_config(
         )
         # Get conversation
         conversation = await ConversationService.get_conversation(
-            db=db, conversation_id=conversation_id, user_id=current_user.id
+            db=db,
+            conversation_id=conversation_id,
+            user_id=current_user.id,
+            load="header",
         )
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -362,15 +420,23 @@ async def delete_conversation(
 async def get_conversation_messages(
     conversation_id: int,
     limit: Optional[int] = Query(None, ge=1, le=1000),
+    after_id: Optional[int] = Query(None, description="Messages after this message ID"),
+    before_id: Optional[int] = Query(None, description="Messages before this message ID"),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get messages for a conversation.
 
+    Pagination is keyset-based: pass the ID of the last message of a page as
+    ``after_id`` for the next page, or the first one as ``before_id`` for the
+    previous page.
+
     Args:
         conversation_id: Conversation ID
         limit: Optional limit on number of messages
+        after_id: Optional cursor for the next page
+        before_id: Optional cursor for the previous page
         current_user: Current authenticated user
         db: Database session
 
@@ -378,15 +444,27 @@ async def get_conversation_messages(
         List of messages
     """
     try:
+        if after_id is not None and before_id is not None:
+            raise HTTPException(
+                status_code=400, detail="Use either after_id or before_id, not both"
+            )
+
         # Verify conversation belongs to user
         conversation = await ConversationService.get_conversation(
-            db=db, conversation_id=conversation_id, user_id=current_user.id
+            db=db,
+            conversation_id=conversation_id,
+            user_id=current_user.id,
+            load="header",
         )
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
 
         messages = await MessageService.get_conversation_messages(
-            db=db, conversation_id=conversation_id, limit=limit
+            db=db,
+            conversation_id=conversation_id,
+            limit=limit,
+            after_id=after_id,
+            before_id=before_id,
         )
         return [MessageResponse.model_validate(msg) for msg in messages]
     except HTTPException:
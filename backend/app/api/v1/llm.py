@@ -9,6 +9,9 @@ from pydantic import BaseModel, Field
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.utils.llm_factory import get_available_models, ALLOWED_SOURCES, SourceType
+from app.utils.http_pool import HTTPClientPool
+from app.utils.llm_scheduler import LLMScheduler
+from app.utils.llm_cache import LLMResponseCache
 from app.core.logging import get_logger
 
 logger = get_logger("llm_api")
@@ -49,3 +52,20 @@ async def get_models_for_source(source: SourceType):
             status_code=500, detail=f"Error getting models: {str(e)}"
         )
 
+
+@router.get("/pool-stats")
+async def get_llm_pool_stats(current_user: User = Depends(get_current_active_user)):
+    """Get connection reuse metrics of the shared LLM HTTP pools"""
+    return {"pools": HTTPClientPool.stats()}
+
+
+@router.get("/scheduler-stats")
+async def get_llm_scheduler_stats(current_user: User = Depends(get_current_active_user)):
+    """Get rate limiting, retry and hedging counters of the LLM schedulers"""
+    return {"schedulers": LLMScheduler.all_stats()}
+
+
+@router.get("/cache-stats")
+async def get_llm_cache_stats(current_user: User = Depends(get_current_active_user)):
+    """Get hit/miss counters of the LLM response cache"""
+    return {"cache": LLMResponseCache.stats()}
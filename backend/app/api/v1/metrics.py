@@ -0,0 +1,29 @@
+"""
+Metrics API endpoints.
+Exposes the in-memory per-stage latency histograms of the chat pipeline.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_current_active_user
+from app.models.user import User
+from app.utils.tracing import LatencyMetrics
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/latency")
+async def get_latency_metrics(current_user: User = Depends(get_current_active_user)):
+    """Get per-stage latency histograms (count, sum, p50/p95/p99, buckets)"""
+    return {"stages": LatencyMetrics.snapshot()}
+
+
+@router.get("/latency/prometheus", response_class=PlainTextResponse)
+async def get_latency_metrics_prometheus(
+    current_user: User = Depends(get_current_active_user),
+):
+    """Get per-stage latency histograms in Prometheus text format"""
+    return PlainTextResponse(
+        LatencyMetrics.prometheus(), media_type="text/plain; version=0.0.4"
+    )
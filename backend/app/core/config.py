@@ -72,6 +72,64 @@ class Settings(BaseSettings):
     llm_base_url: str = "https://api.siliconflow.cn/v1/"
     deepseek_base_url: str = "https://api.deepseek.com/v1"
     qwen_base_url: str = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
+    ollama_base_url: str = "http://localhost:11434"
+
+    # LLM HTTP connection pools (shared by all LLM instances per provider/base_url)
+    llm_http_max_connections: int = 100
+    llm_http_max_keepalive: int = 20
+    llm_http_keepalive_expiry: float = 60.0
+    llm_http_timeout: float = 600.0
+    llm_http2: bool = True  # Only used when the optional h2 package is installed
+
+    # LLM request scheduler (per provider; see app/utils/llm_scheduler.py)
+    llm_scheduler_enabled: bool = True
+    llm_rate_limit: float = 5.0  # Requests per second, 0 disables rate limiting
+    llm_rate_burst: float = 10.0
+    llm_max_concurrency: int = 16
+    llm_max_retries: int = 3
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 30.0
+    llm_hedge_enabled: bool = False  # Duplicate requests slower than observed p95
+    llm_hedge_min_samples: int = 20
+    # Per-provider overrides, e.g. {"DeepSeek": {"rate": 2, "max_concurrency": 4}}
+    llm_provider_limits: dict = {}
+
+    # LLM response cache (see app/utils/llm_cache.py)
+    llm_cache_enabled: bool = True
+    llm_cache_default_mode: str = "off"  # off | exact | semantic; call sites opt in
+    llm_cache_ttl: float = 3600.0
+    llm_cache_max_entries: int = 1000
+    llm_cache_semantic_threshold: float = 0.95  # Cosine similarity of user text
+
+    # Chat attachments (see app/services/chat_upload.py)
+    chat_upload_max_bytes: int = 10 * 1024**3
+    chat_upload_chunk_size: int = 1024 * 1024
+    chat_upload_progress_interval: float = 0.5  # Seconds between progress events
+
+    # Tabular attachments ingested as datasets (see app/services/dataset.py)
+    dataset_memory_limit: str = "1GB"  # DuckDB memory limit per ingest
+    dataset_threads: int = 2
+    dataset_sniff_rows: int = 20480  # Rows sampled for CSV type detection
+    dataset_profile_wait: float = 10.0  # Seconds a chat turn waits for profiles
+    dataset_render_max_rows: int = 200_000
+
+    # DuckDB database shared by the analysis scripts (see app/utils/duckdb_pool.py)
+    analysis_duckdb_memory_limit: str = "2GB"
+    analysis_duckdb_threads: int = 4
+
+    # Analysis sub-tool result cache (see app/services/analysis_cache.py)
+    analysis_cache_enabled: bool = True
+    analysis_cache_root: Path = BASE_DIR / "cache" / "analysis"
+    analysis_cache_memory_entries: int = 256
+    analysis_cache_memory_bytes: int = 256 * 1024**2
+    analysis_cache_disk_bytes: int = 2 * 1024**3
+
+    # DepMap column slices kept in memory (see scripts/analysis/db/depmap/depmap.py)
+    depmap_slice_cache_bytes: int = 512 * 1024**2
+
+    # Analysis worker processes (see app/services/analysis_pool.py)
+    analysis_pool_workers: int = 2  # 0 runs modules in a thread of this process
+    analysis_task_timeout: float = 120.0
 
     # Data directory root path (can be configured via environment variable DATA_ROOT)
     # Subdirectories (tcga, depmap, gtex) will be automatically identified under this root
@@ -0,0 +1,34 @@
+"""add_messages_keyset_index
+
+Revision ID: h4c5d6e7f8a9
+Revises: g3b4c5d6e7f8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "h4c5d6e7f8a9"
+down_revision: Union[str, Sequence[str], None] = "g3b4c5d6e7f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination on (conversation_id, created_at, id) and last-N lookups
+    op.create_index(
+        "ix_messages_conversation_created_id",
+        "messages",
+        ["conversation_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_conversation_created_id", table_name="messages")
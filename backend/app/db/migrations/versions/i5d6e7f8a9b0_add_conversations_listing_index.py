@@ -0,0 +1,36 @@
+"""add_conversations_listing_index
+
+Revision ID: i5d6e7f8a9b0
+Revises: h4c5d6e7f8a9
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "i5d6e7f8a9b0"
+down_revision: Union[str, Sequence[str], None] = "h4c5d6e7f8a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pages of a user's conversations ordered by (updated_at, id).
+    # The last-message preview uses ix_messages_conversation_created_id,
+    # read backwards.
+    op.create_index(
+        "ix_conversations_user_updated_id",
+        "conversations",
+        ["user_id", "updated_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_conversations_user_updated_id", table_name="conversations")
@@ -9,6 +9,8 @@ from app.db.session import init_db, DatabaseManager
 from app.core.logging import get_logger
 from app.middleware.logging_middleware import LoggingMiddleware
 from app.services.admin import AdminService
+from app.services.analysis_pool import AnalysisWorkerPool
+from app.utils.http_pool import HTTPClientPool
 from app.api.v1.auth import router as auth_router
 from app.api.v1.admin import router as admin_router
 from app.api.v1.users import router as users_router
@@ -26,6 +28,7 @@ from app.api.v1.cloud_disk import router as cloud_disk_router
 from app.api.v1.chat import router as chat_router
 from app.api.v1.conversation import router as conversation_router
 from app.api.v1.llm import router as llm_router
+from app.api.v1.metrics import router as metrics_router
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
@@ -67,10 +70,14 @@ async def lifespan(app: FastAPI):
             "⚠️  Application will continue but database features may not work"
         )
 
+    AnalysisWorkerPool.start()
+
     yield
 
     # Shutdown
     logger.info("🛑 Shutting down OmicsAgent Backend...")
+    await HTTPClientPool.aclose_all()
+    AnalysisWorkerPool.shutdown()
 
 
 # Create FastAPI application
@@ -107,6 +114,7 @@ app.include_router(cloud_disk_router, prefix=prefix)
 app.include_router(chat_router, prefix=prefix)
 app.include_router(conversation_router, prefix=prefix)
 app.include_router(llm_router, prefix=prefix)
+app.include_router(metrics_router, prefix=prefix)
 
 
 # Add exception handlers
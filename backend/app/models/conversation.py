@@ -12,6 +12,7 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,
     JSON,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -47,10 +48,20 @@ class Conversation(Base):
     messages = relationship(
         "Message",
         back_populates="conversation",
-        order_by="Message.created_at",
+        order_by="(Message.created_at, Message.id)",
         cascade="all, delete-orphan",
     )
 
+    # Sidebar listing: a user's conversations by (updated_at, id), newest first
+    __table_args__ = (
+        Index(
+            "ix_conversations_user_updated_id",
+            "user_id",
+            "updated_at",
+            "id",
+        ),
+    )
+
     def __repr__(self):
         return f"<Conversation(id={self.id}, user_id={self.user_id}, title='{self.title}')>"
 
@@ -91,5 +102,15 @@ class Message(Base):
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Keyset pagination and "last N messages" lookups
+    __table_args__ = (
+        Index(
+            "ix_messages_conversation_created_id",
+            "conversation_id",
+            "created_at",
+            "id",
+        ),
+    )
+
     def __repr__(self):
         return f"<Message(id={self.id}, conversation_id={self.conversation_id}, role='{self.role}')>"
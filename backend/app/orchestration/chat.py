@@ -10,14 +10,22 @@ Key principles:
 - LangChain only reads history, never writes history
 """
 
+import asyncio
 from typing import Dict, Any, Optional, List, AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.logging import get_logger
 from app.agent import VisualAgent
 from app.agent.models import AgentResponse, VisualToolRequest, VisualAnalysisResponse
-from app.services.conversation import ConversationService, MessageService
+from app.services.conversation import (
+    ConversationService,
+    MessageBatch,
+    MessageService,
+)
+from app.services.dataset import DatasetService
 from app.schemas.conversation import ConversationUpdate
+from app.utils.tracing import span, start_trace
 
 logger = get_logger("chat_orchestrator")
 
@@ -67,13 +75,15 @@ class ChatOrchestrator:
         Returns:
             AgentResponse with agent's reply
         """
+        trace = start_trace("chat.turn")
         try:
             # Step 1: Get or create conversation
             # If creating new conversation, generate title from first message
             is_new_conversation = conversation_id is None
-            conversation = await ConversationService.get_or_create_conversation(
-                db, user_id, conversation_id
-            )
+            with span("conversation.fetch"):
+                conversation = await ConversationService.get_or_create_conversation(
+                    db, user_id, conversation_id
+                )
 
             # Get LLM config from conversation metadata
             llm_config = (
@@ -87,23 +97,25 @@ class ChatOrchestrator:
                 llm_config = {k: v for k, v in llm_config.items() if k != "api_key"}
 
             # Initialize agent with LLM config
-            agent = self._get_agent(llm_config)
+            with span("agent.init"):
+                agent = self._get_agent(llm_config)
 
             # Generate title for new conversation based on first user message
             if is_new_conversation and conversation.title == "New Conversation":
                 try:
                     title = await agent.generate_conversation_title(user_message)
                     if title and title != "New Conversation":
-                        await ConversationService.update_conversation(
-                            db=db,
-                            conversation_id=conversation.id,
-                            user_id=user_id,
-                            update_data=ConversationUpdate(title=title),
-                        )
-                        # Refresh conversation to get updated title
-                        conversation = await ConversationService.get_conversation(
-                            db, conversation.id, user_id
-                        )
+                        with span("db.write", op="update_title"):
+                            # Returns the refreshed conversation (header only)
+                            conversation = (
+                                await ConversationService.update_conversation(
+                                    db=db,
+                                    conversation_id=conversation.id,
+                                    user_id=user_id,
+                                    update_data=ConversationUpdate(title=title),
+                                )
+                                or conversation
+                            )
                 except Exception as e:
                     logger.error(
                         f"Error generating conversation title: {e}", exc_info=True
@@ -111,29 +123,28 @@ class ChatOrchestrator:
                     # Continue without updating title
 
             # Step 2: Read conversation history from database (Agent only reads)
-            conversation_history = await MessageService.format_messages_for_agent(
-                db, conversation.id
-            )
+            with span("history.load") as attrs:
+                conversation_history = await MessageService.format_messages_for_agent(
+                    db, conversation.id, limit=VisualAgent.HISTORY_MESSAGES
+                )
+                attrs["messages"] = len(conversation_history)
 
             # Step 3: Process message through agent (Agent is stateless)
             response = await agent.process_message(
                 user_message=user_message, conversation_history=conversation_history
             )
 
+            # Steps 4-5 are written together in one transaction
+            messages = MessageBatch(db)
+
             # Step 4: Save user message AFTER understanding (not before)
-            await MessageService.create_message(
-                db=db,
-                conversation_id=conversation.id,
-                role="user",
-                content=user_message,
-            )
+            messages.add(conversation.id, "user", user_message)
 
             # Step 5: Save agent response (complete message, not streaming)
-            await MessageService.create_message(
-                db=db,
-                conversation_id=conversation.id,
-                role="assistant",
-                content=response.message,
+            messages.add(
+                conversation.id,
+                "assistant",
+                response.message,
                 metadata={
                     "needs_info": response.needs_info,
                     "missing_params": response.missing_params,
@@ -147,6 +158,9 @@ class ChatOrchestrator:
                 },
             )
 
+            with span("db.write", op="save_messages"):
+                await messages.commit()
+
             return response
         except Exception as e:
             logger.error(f"Error in chat orchestrator: {e}", exc_info=True)
@@ -154,6 +168,9 @@ class ChatOrchestrator:
                 message=f"Sorry, I encountered an error: {str(e)}. Please try again.",
                 needs_info=True,
             )
+        finally:
+            trace.finish()
+            logger.debug(f"Chat turn timings: {trace.to_dict()}")
 
     async def generate_visualization(
         self,
@@ -241,6 +258,7 @@ class ChatOrchestrator:
         - "visualization": Visualization result
         - "analyzing": Analysis in progress
         - "analysis": Analysis result
+        - "timings": Per-stage latency spans of the turn (debug mode only)
 
         Args:
             db: Database session
@@ -252,17 +270,20 @@ class ChatOrchestrator:
             Dict with event type and data
         """
         conversation = None
-        assistant_message_id = None
+        messages = MessageBatch(db)
+        assistant_message = None
         full_message_content = ""
         final_metadata = {}
+        trace = start_trace("chat.stream")
 
         try:
             # Step 1: Get or create conversation
             # If creating new conversation, generate title from first message
             is_new_conversation = conversation_id is None
-            conversation = await ConversationService.get_or_create_conversation(
-                db, user_id, conversation_id
-            )
+            with span("conversation.fetch"):
+                conversation = await ConversationService.get_or_create_conversation(
+                    db, user_id, conversation_id
+                )
 
             # Get LLM config from conversation metadata
             llm_config = (
@@ -276,23 +297,25 @@ class ChatOrchestrator:
                 llm_config = {k: v for k, v in llm_config.items() if k != "api_key"}
 
             # Initialize agent with LLM config
-            agent = self._get_agent(llm_config)
+            with span("agent.init"):
+                agent = self._get_agent(llm_config)
 
             # Generate title for new conversation based on first user message
             if is_new_conversation and conversation.title == "New Conversation":
                 try:
                     title = await agent.generate_conversation_title(user_message)
                     if title and title != "New Conversation":
-                        await ConversationService.update_conversation(
-                            db=db,
-                            conversation_id=conversation.id,
-                            user_id=user_id,
-                            update_data=ConversationUpdate(title=title),
-                        )
-                        # Refresh conversation to get updated title
-                        conversation = await ConversationService.get_conversation(
-                            db, conversation.id, user_id
-                        )
+                        with span("db.write", op="update_title"):
+                            # Returns the refreshed conversation (header only)
+                            conversation = (
+                                await ConversationService.update_conversation(
+                                    db=db,
+                                    conversation_id=conversation.id,
+                                    user_id=user_id,
+                                    update_data=ConversationUpdate(title=title),
+                                )
+                                or conversation
+                            )
                 except Exception as e:
                     logger.error(
                         f"Error generating conversation title: {e}", exc_info=True
@@ -300,9 +323,11 @@ class ChatOrchestrator:
                     # Continue without updating title
 
             # Step 2: Read conversation history from database (Agent only reads)
-            conversation_history = await MessageService.format_messages_for_agent(
-                db, conversation.id
-            )
+            with span("history.load") as attrs:
+                conversation_history = await MessageService.format_messages_for_agent(
+                    db, conversation.id, limit=VisualAgent.HISTORY_MESSAGES
+                )
+                attrs["messages"] = len(conversation_history)
             logger.debug(
                 f"Loaded {len(conversation_history)} messages from conversation {conversation.id} "
                 f"for streaming processing"
@@ -311,12 +336,20 @@ class ChatOrchestrator:
             # Step 3: Process message through agent (Agent is stateless)
             # Include file information in user message if files are provided
             enhanced_user_message = user_message
+            dataset_profiles = {}
             if files:
                 file_names = [f.get("filename", "unknown") for f in files]
                 if file_names:
                     enhanced_user_message = (
                         f"{user_message}\n\n[已上传文件: {', '.join(file_names)}]"
                     )
+                # Tabular files are profiled in the background since upload
+                with span("dataset.wait") as attrs:
+                    dataset_profiles = await DatasetService.wait_for(files, user_id)
+                    attrs["ready"] = len(dataset_profiles)
+                enhanced_user_message += DatasetService.format_for_prompt(
+                    files, dataset_profiles
+                )
 
             # Step 3.5: Process message with streaming
             # Stream the agent's response
@@ -326,6 +359,7 @@ class ChatOrchestrator:
             async for chunk in agent.process_message_stream(
                 user_message=enhanced_user_message,
                 conversation_history=conversation_history,
+                files=files,
             ):
                 if chunk.get("type") == "message":
                     full_message_content = chunk.get("content", "")
@@ -341,6 +375,7 @@ class ChatOrchestrator:
                     if chunk.get("visual_request") or chunk.get("show_example"):
                         final_response = chunk
                 elif chunk.get("type") == "error":
+                    trace.finish()
                     yield chunk
                     return
 
@@ -391,14 +426,19 @@ class ChatOrchestrator:
                             "relative_path": file_info.get(
                                 "relative_path"
                             ),  # Relative path
+                            "sha256": file_info.get("sha256"),
+                            "dataset": (
+                                file_info.get("sha256")
+                                if file_info.get("sha256") in dataset_profiles
+                                else None
+                            ),
                         }
                     )
 
-            await MessageService.create_message(
-                db=db,
-                conversation_id=conversation.id,
-                role="user",
-                content=user_message,
+            messages.add(
+                conversation.id,
+                "user",
+                user_message,
                 metadata={
                     "files": file_metadata if file_metadata else None,
                 },
@@ -406,11 +446,10 @@ class ChatOrchestrator:
 
             # Step 5: Create assistant message placeholder (will be updated when complete)
             full_message_content = response.message
-            assistant_message = await MessageService.create_message(
-                db=db,
-                conversation_id=conversation.id,
-                role="assistant",
-                content=full_message_content,
+            assistant_message = messages.add(
+                conversation.id,
+                "assistant",
+                full_message_content,
                 metadata={
                     "needs_info": response.needs_info,
                     "missing_params": response.missing_params,
@@ -418,7 +457,11 @@ class ChatOrchestrator:
                 },
                 is_complete=False,  # Mark as incomplete during streaming
             )
-            assistant_message_id = assistant_message.id
+
+            # Both messages in one INSERT, so the placeholder is visible while
+            # the visualization runs
+            with span("db.write", op="save_messages"):
+                await messages.commit()
 
             # Yield initial response
             yield {
@@ -495,104 +538,133 @@ class ChatOrchestrator:
             elif response.visual_request and not response.needs_info:
                 yield {"type": "generating", "content": "正在生成可视化图表..."}
 
-                # Generate visualization
-                viz_result = await agent.generate_visualization(
-                    response.visual_request, user_id
-                )
+                def start_analysis(request: VisualToolRequest) -> asyncio.Task:
+                    return asyncio.create_task(
+                        agent.analyze_visualization(
+                            request.chart_type,
+                            {"data": request.data, **request.params},
+                            user_message,
+                        )
+                    )
 
-                # Update metadata with visualization info
-                final_metadata.update(
-                    {
-                        "visual_request": (
-                            response.visual_request.dict()
-                            if response.visual_request
-                            else None
-                        ),
-                        "visualization": {
-                            "success": viz_result["success"],
-                            "image_url": viz_result.get("image_url"),
-                            "pdf_url": viz_result.get("pdf_url"),
-                            "data_url": viz_result.get("data_url"),
-                        },
-                    }
-                )
+                # The analysis prompt only needs the request params and data (not
+                # the rendered image), so start it alongside the R render and
+                # collect it once the render has finished.
+                analysis_task = start_analysis(response.visual_request)
 
-                yield {
-                    "type": "visualization",
-                    "success": viz_result["success"],
-                    "image_url": viz_result.get("image_url"),
-                    "pdf_url": viz_result.get("pdf_url"),
-                    "data_url": viz_result.get("data_url"),
-                    "message": viz_result.get("message"),
-                    "retry_count": viz_result.get("retry_count", 0),
-                }
-
-                # If failed after retries, provide error information
-                if not viz_result["success"] and viz_result.get("error_details"):
-                    yield {
-                        "type": "error",
-                        "content": f"生成图表失败: {viz_result.get('message', 'Unknown error')}",
-                        "error_details": viz_result.get("error_details"),
-                        "retry_count": viz_result.get("retry_count", 0),
-                    }
+                try:
+                    # Generate visualization
+                    viz_result = await agent.generate_visualization(
+                        response.visual_request, user_id
+                    )
 
-                # Step 7: If successful, analyze the result
-                if viz_result["success"]:
-                    yield {"type": "analyzing", "content": "正在分析结果..."}
+                    # Render failed: the analysis would describe a chart that does not exist
+                    if not viz_result["success"]:
+                        analysis_task.cancel()
 
-                    analysis = await agent.analyze_visualization(
-                        response.visual_request.chart_type,
-                        {
-                            "data": response.visual_request.data,
-                            **response.visual_request.params,
-                        },
-                        user_message,
+                    # Error recovery rendered a different request than the one the
+                    # analysis was started from: analyse the chart actually drawn
+                    rendered_request = (
+                        viz_result.get("visual_request") or response.visual_request
                     )
+                    if rendered_request is not response.visual_request:
+                        analysis_task.cancel()
+                        analysis_task = start_analysis(rendered_request)
 
-                    # Update metadata with analysis
+                    # Update metadata with visualization info
                     final_metadata.update(
                         {
-                            "analysis": {
-                                "analysis": analysis.analysis,
-                                "insights": analysis.insights,
-                                "recommendations": analysis.recommendations,
-                                "possible_analyses": analysis.possible_analyses,
-                            }
+                            "visual_request": rendered_request.dict(),
+                            "visualization": {
+                                "success": viz_result["success"],
+                                "image_url": viz_result.get("image_url"),
+                                "pdf_url": viz_result.get("pdf_url"),
+                                "data_url": viz_result.get("data_url"),
+                            },
                         }
                     )
 
                     yield {
-                        "type": "analysis",
-                        "analysis": analysis.analysis,
-                        "insights": analysis.insights,
-                        "recommendations": analysis.recommendations,
-                        "possible_analyses": analysis.possible_analyses,
+                        "type": "visualization",
+                        "success": viz_result["success"],
+                        "image_url": viz_result.get("image_url"),
+                        "pdf_url": viz_result.get("pdf_url"),
+                        "data_url": viz_result.get("data_url"),
+                        "message": viz_result.get("message"),
+                        "retry_count": viz_result.get("retry_count", 0),
                     }
 
+                    # If failed after retries, provide error information
+                    if not viz_result["success"] and viz_result.get("error_details"):
+                        yield {
+                            "type": "error",
+                            "content": f"生成图表失败: {viz_result.get('message', 'Unknown error')}",
+                            "error_details": viz_result.get("error_details"),
+                            "retry_count": viz_result.get("retry_count", 0),
+                        }
+
+                    # Step 7: If successful, analyze the result
+                    if viz_result["success"]:
+                        yield {"type": "analyzing", "content": "正在分析结果..."}
+
+                        # Only the part of the analysis not hidden behind the render
+                        with span("analysis.wait"):
+                            analysis = await analysis_task
+
+                        # Update metadata with analysis
+                        final_metadata.update(
+                            {
+                                "analysis": {
+                                    "analysis": analysis.analysis,
+                                    "insights": analysis.insights,
+                                    "recommendations": analysis.recommendations,
+                                    "possible_analyses": analysis.possible_analyses,
+                                }
+                            }
+                        )
+
+                        yield {
+                            "type": "analysis",
+                            "analysis": analysis.analysis,
+                            "insights": analysis.insights,
+                            "recommendations": analysis.recommendations,
+                            "possible_analyses": analysis.possible_analyses,
+                        }
+                finally:
+                    # Render failed, render raised, or the client went away
+                    if not analysis_task.done():
+                        analysis_task.cancel()
+
             # Step 8: Update assistant message as complete AFTER streaming finishes
             # This is the key: streaming generation ≠ streaming database writes
-            if assistant_message_id:
-                await MessageService.update_message(
-                    db=db,
-                    message_id=assistant_message_id,
+            if assistant_message and assistant_message.id:
+                messages.update(
+                    assistant_message,
                     metadata=final_metadata,
                     is_complete=True,  # Mark as complete
                 )
+                with span("db.write", op="complete_message"):
+                    await messages.commit()
 
         except Exception as e:
             logger.error(f"Error in stream processing: {e}", exc_info=True)
 
             # Save error message if we have a conversation
-            if conversation and assistant_message_id:
-                await MessageService.update_message(
-                    db=db,
-                    message_id=assistant_message_id,
+            if conversation and assistant_message and assistant_message.id:
+                messages.update(
+                    assistant_message,
                     content=full_message_content or f"Error: {str(e)}",
                     metadata={**final_metadata, "error": str(e)},
                     is_complete=True,
                 )
+                await messages.commit()
 
             yield {
                 "type": "error",
                 "content": f"Sorry, I encountered an error: {str(e)}. Please try again.",
             }
+
+        trace.finish()
+        logger.debug(f"Chat stream timings: {trace.to_dict()}")
+        if settings.debug:
+            yield {"type": "timings", **trace.to_dict()}
@@ -89,3 +89,23 @@ class ConversationListResponse(BaseModel):
     conversations: List[ConversationListItem]
     total: int
 
+
+
+class MessagePreview(BaseModel):
+    """Last message of a conversation, content truncated for the sidebar"""
+    role: str
+    content: str
+    created_at: datetime
+
+
+class ConversationSummary(ConversationListItem):
+    """Conversation list item with a preview of its last message"""
+    last_message: Optional[MessagePreview] = None
+
+
+class ConversationPageResponse(BaseModel):
+    """One page of conversation summaries for infinite scroll"""
+    conversations: List[ConversationSummary]
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor for the next page, null on the last page"
+    )
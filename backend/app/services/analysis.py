@@ -1,12 +1,13 @@
 import os
-import sys
 import time
 import asyncio
 import orjson
-import importlib
+import hashlib
 import pandas as pd
+import pyarrow as pa
 from aiofile import AIOFile
 from pathlib import Path
+from types import ModuleType
 from typing import Dict, Any, Optional, List
 from functools import lru_cache
 
@@ -19,6 +20,9 @@ from app.schemas.analysis import (
     AnalysisToolGroup,
 )
 from app.core.config import settings
+from app.services.analysis_cache import AnalysisResultCache
+from app.services.analysis_pool import AnalysisWorkerPool, import_module, module_name
+from app.utils.analysis_result import AnalysisResult
 
 # Base paths
 BASE_DIR = Path(__file__).parent.parent.parent
@@ -391,31 +395,11 @@ class AnalysisService:
         return data
 
     @staticmethod
-    def fetched_data(
-        module_file_path: Path, sub_tool: str, params: Dict[str, Any], output_file: Path
-    ) -> List[Dict[str, Any]]:
-        """获取工具的示例数据"""
-        # 将文件路径转换为模块路径
+    def load_module(module_file_path: Path) -> ModuleType:
+        """导入分析脚本模块（用于计算缓存键，分析本身在工作进程中运行）"""
         # 例如: backend/scripts/analysis/db/tcga/tcga.py -> scripts.analysis.db.tcga.tcga
         try:
-            # 获取相对于 BASE_DIR 的路径（BASE_DIR 是 backend 目录）
-            relative_path = module_file_path.relative_to(BASE_DIR)
-            # 转换为模块路径（移除 .py 扩展名，将 / 替换为 .）
-            module_path = str(relative_path.with_suffix("")).replace("/", ".")
-
-            # 确保 BASE_DIR 在 Python 路径中，这样 scripts 目录可以被导入
-            if str(BASE_DIR) not in sys.path:
-                sys.path.insert(0, str(BASE_DIR))
-
-            if module_path not in sys.modules:
-                try:
-                    importlib.import_module(module_path)
-                except ImportError as e:
-                    logger.error(f"Failed to import module: {module_path}, error: {e}")
-                    raise ValueError(
-                        f"Failed to import module: {module_path}: {str(e)}"
-                    )
-            module = sys.modules[module_path]
+            return import_module(module_name(module_file_path))
         except Exception as e:
             logger.error(
                 f"Error processing module path: {module_file_path}, error: {e}"
@@ -423,61 +407,37 @@ class AnalysisService:
             raise ValueError(
                 f"Failed to process module path: {module_file_path}: {str(e)}"
             )
-        result = module.run_analysis(sub_tool, params)
 
-        if isinstance(result, str):
-            # 如果是字符串，尝试解析为 JSON
-            try:
-                result = orjson.loads(result)
-            except orjson.JSONDecodeError:
-                # 如果无法解析，可能是错误消息
-                raise ValueError(f"Analysis returned error: {result}")
-
-        # 处理不同类型的返回值
-        if isinstance(result, list):
-            # 如果直接返回列表，直接使用
-            result_data = result
-        elif isinstance(result, dict):
-            # 如果是字典，检查是否有错误
-            if "error" in result:
-                raise ValueError(result.get("error", "Analysis failed"))
-
-            # 提取数据
-            result_data = result.get("data") or result
-            if isinstance(result_data, str):
-                try:
-                    result_data = orjson.loads(result_data)
-                except orjson.JSONDecodeError:
-                    # 如果无法解析，保持原样
-                    pass
-        else:
-            # 其他类型，尝试转换为列表
-            result_data = [result] if result is not None else []
-
-        # 转换为 DataFrame 并保存为 CSV
-        if isinstance(result_data, list):
-            df = pd.DataFrame(result_data)
-        elif isinstance(result_data, dict):
-            # 如果 result_data 有 data 字段，使用它
-            if "data" in result_data:
-                data = result_data["data"]
-                if isinstance(data, str):
-                    data = orjson.loads(data)
-                df = (
-                    pd.DataFrame(data)
-                    if isinstance(data, list)
-                    else pd.DataFrame([data])
-                )
-            else:
-                df = pd.DataFrame([result_data])
+    @staticmethod
+    async def fetched_data(
+        module_file_path: Path,
+        sub_tool: str,
+        params: Dict[str, Any],
+        output_file: Path,
+        cache_key: Optional[str] = None,
+    ) -> AnalysisResult:
+        """运行分析并把结果表写入绘图输入文件（在分析进程池中运行，不阻塞事件循环）"""
+        # 命中结果缓存时跳过数据读取
+        table = (
+            await asyncio.to_thread(AnalysisResultCache.get, cache_key)
+            if cache_key
+            else None
+        )
+        if table is not None:
+            result = AnalysisResult.from_table(table)
         else:
-            raise ValueError(f"Unsupported data format: {type(result_data)}")
+            result = await AnalysisWorkerPool.run(module_file_path, sub_tool, params)
+            if cache_key:
+                try:
+                    await asyncio.to_thread(
+                        AnalysisResultCache.put, cache_key, result.to_table()
+                    )
+                except (pa.ArrowException, OSError) as e:
+                    logger.warning(f"Failed to cache {sub_tool} result: {e}")
 
-        # 保存数据到 CSV
-        df.to_csv(output_file, index=False, encoding="utf-8")
+        await asyncio.to_thread(result.write_chart_input, output_file)
         logger.info(f"Data saved to: {output_file}")
-
-        return result_data
+        return result
 
     @staticmethod
     async def fetch_config(meta_file: Path) -> Dict[str, Any]:
@@ -554,7 +514,7 @@ class AnalysisService:
         output_dir.mkdir(parents=True, exist_ok=True)
 
         file_paths = {
-            "csv": output_dir / f"{sub_tool}_data.csv",
+            "data": output_dir / f"{sub_tool}_data.arrow",
             "params": output_dir / f"{sub_tool}_params.json",
             "pdf": output_dir / f"{sub_tool}.pdf",
             "png": output_dir / f"{sub_tool}.png",
@@ -564,15 +524,21 @@ class AnalysisService:
         module_path = settings.analysis_root / category / tool_name / f"{tool_name}.py"
         # 调用分析函数
         if params.pop("query_data", False):
-            result = AnalysisService.fetched_data(
-                module_path, sub_tool, params, file_paths["csv"]
+            data_key = await asyncio.to_thread(
+                AnalysisResultCache.data_key,
+                AnalysisService.load_module(module_path),
+                sub_tool,
+                params,
+            )
+            result = await AnalysisService.fetched_data(
+                module_path, sub_tool, params, file_paths["data"], cache_key=data_key
             )
             # 获取 ggplot2 配置参数
             meta_file = (
                 settings.visual_root / TOOL_VISUAL_MAPPING[sub_tool] / "meta.json"
             )
             ggplot2_config = await AnalysisService.fetch_config(meta_file)
-            columns = list(result[0].keys())
+            columns = result.columns
             if len(columns) >= 3:
                 ggplot2_config.get("mapping", {}).update(
                     {
@@ -582,16 +548,22 @@ class AnalysisService:
                 )
             params["ggplot2"] = ggplot2_config
         else:
-            result = []
+            result = None
             # 获取前端传递的 ggplot2 配置参数
             ggplot2_config = params.pop("ggplot2", None)
             if not ggplot2_config:
                 raise ValueError(f"The {sub_tool} did not pass ggplot2 config")
+            # 沿用上次查询写出的数据文件，以其内容摘要作为数据标识
+            data_key = (
+                hashlib.sha256(file_paths["data"].read_bytes()).hexdigest()
+                if settings.analysis_cache_enabled and file_paths["data"].exists()
+                else None
+            )
 
         await AnalysisService.write_params(
             file_paths["params"],
             {
-                "data": str(file_paths["csv"].resolve()),
+                "data": str(file_paths["data"].resolve()),
                 "ggplot2": ggplot2_config,
             },
         )
@@ -601,7 +573,18 @@ class AnalysisService:
         if not script_path.exists():
             # 使用通用绘图脚本
             script_path = SCRIPTS_ROOT / "utils" / "plot_ggplot2.R"
-        await AnalysisService.visualize("r", script_path, file_paths)
+        # 数据与 ggplot2 配置都相同时复用缓存的图片
+        render_key = (
+            AnalysisResultCache.render_key(data_key, ggplot2_config, script_path)
+            if data_key
+            else None
+        )
+        if not (
+            render_key and AnalysisResultCache.restore_render(render_key, file_paths)
+        ):
+            await AnalysisService.visualize("r", script_path, file_paths)
+            if render_key:
+                AnalysisResultCache.put_render(render_key, file_paths)
 
         # 生成图片 URL（相对于 static 目录）
         # 将绝对路径转换为相对路径
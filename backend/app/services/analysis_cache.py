@@ -0,0 +1,242 @@
+"""
+Result cache for analysis sub-tools.
+
+Popular queries (TP53 / EGFR / BRCA1 in the large cancer types) are requested
+over and over, and each one used to re-read Parquet and re-run R. Results are
+keyed by (module, sub_tool, parameters with defaults applied, data
+fingerprint). A module opts in by defining ``data_fingerprint(sub_tool,
+params)``, which returns a string that changes whenever the underlying data
+files change, or None to skip caching.
+
+Two tiers hold the result tables:
+
+- memory: LRU of Arrow tables, bounded by entries and bytes
+- disk: one Parquet file per key under ``settings.analysis_cache_root``,
+  evicted least-recently-used first once the directory exceeds
+  ``settings.analysis_cache_disk_bytes``
+
+Rendered charts are cached on disk next to them, keyed by the data and the
+ggplot2 config, so an identical request also skips the R script.
+"""
+
+import hashlib
+import inspect
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("analysis_cache")
+
+# Files making up one cached render
+RENDER_OUTPUTS = ("png", "pdf")
+
+
+def _digest(payload: Any) -> str:
+    data = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisResultCache:
+    """Process-wide two-tier (Arrow in memory, Parquet on disk) result cache."""
+
+    _tables: "OrderedDict[str, pa.Table]" = OrderedDict()
+    _memory_bytes: int = 0
+    _lock = threading.Lock()
+    _stats: Dict[str, int] = {
+        "memory_hits": 0,
+        "disk_hits": 0,
+        "misses": 0,
+        "stores": 0,
+        "render_hits": 0,
+        "render_stores": 0,
+        "evictions": 0,
+    }
+
+    @staticmethod
+    def data_key(
+        module: ModuleType, sub_tool: str, params: Dict[str, Any]
+    ) -> Optional[str]:
+        """Cache key for a sub-tool call, or None when it can't be cached"""
+        if not settings.analysis_cache_enabled:
+            return None
+        fingerprint_fn = getattr(module, "data_fingerprint", None)
+        if fingerprint_fn is None:
+            return None
+        normalized = AnalysisResultCache.normalize_params(module, sub_tool, params)
+        if normalized is None:
+            return None
+        fingerprint = fingerprint_fn(sub_tool, normalized)
+        if fingerprint is None:
+            return None
+        return _digest(
+            {
+                "module": module.__name__,
+                "sub_tool": sub_tool,
+                "params": normalized,
+                "fingerprint": fingerprint,
+            }
+        )
+
+    @staticmethod
+    def normalize_params(
+        module: ModuleType, sub_tool: str, params: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Parameters with the sub-tool's defaults filled in, so omitted and
+        explicit default values share a key. None if they don't bind.
+        """
+        func = getattr(module, sub_tool, None)
+        if not callable(func):
+            return None
+        try:
+            bound = inspect.signature(func).bind(**params)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        return dict(bound.arguments)
+
+    @staticmethod
+    def render_key(data_key: str, ggplot2_config: Any, script_path: Path) -> str:
+        return _digest(
+            {"data": data_key, "ggplot2": ggplot2_config, "script": str(script_path)}
+        )
+
+    @staticmethod
+    def _disk_path(key: str, suffix: str) -> Path:
+        return settings.analysis_cache_root / key[:2] / f"{key}.{suffix}"
+
+    @staticmethod
+    def get(key: str) -> Optional[pa.Table]:
+        """Cached result table, promoting disk hits into memory"""
+        with AnalysisResultCache._lock:
+            table = AnalysisResultCache._tables.get(key)
+            if table is not None:
+                AnalysisResultCache._tables.move_to_end(key)
+                AnalysisResultCache._stats["memory_hits"] += 1
+                return table
+
+        path = AnalysisResultCache._disk_path(key, "parquet")
+        try:
+            table = pq.read_table(path)
+            os.utime(path)  # LRU order for disk eviction
+        except (FileNotFoundError, pa.ArrowInvalid):
+            AnalysisResultCache._stats["misses"] += 1
+            return None
+        AnalysisResultCache._stats["disk_hits"] += 1
+        AnalysisResultCache._remember(key, table)
+        return table
+
+    @staticmethod
+    def put(key: str, table: pa.Table) -> None:
+        AnalysisResultCache._remember(key, table)
+        path = AnalysisResultCache._disk_path(key, "parquet")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part = path.with_name(f".{path.name}.part")
+        pq.write_table(table, part)
+        os.replace(part, path)
+        AnalysisResultCache._stats["stores"] += 1
+        AnalysisResultCache._evict_disk()
+
+    @staticmethod
+    def _remember(key: str, table: pa.Table) -> None:
+        if table.nbytes > settings.analysis_cache_memory_bytes:
+            return
+        with AnalysisResultCache._lock:
+            previous = AnalysisResultCache._tables.pop(key, None)
+            if previous is not None:
+                AnalysisResultCache._memory_bytes -= previous.nbytes
+            AnalysisResultCache._tables[key] = table
+            AnalysisResultCache._memory_bytes += table.nbytes
+            while AnalysisResultCache._tables and (
+                len(AnalysisResultCache._tables) > settings.analysis_cache_memory_entries
+                or AnalysisResultCache._memory_bytes
+                > settings.analysis_cache_memory_bytes
+            ):
+                _, evicted = AnalysisResultCache._tables.popitem(last=False)
+                AnalysisResultCache._memory_bytes -= evicted.nbytes
+                AnalysisResultCache._stats["evictions"] += 1
+
+    @staticmethod
+    def restore_render(key: str, outputs: Dict[str, Path]) -> bool:
+        """Copy a cached render to the request's output paths; False on a miss"""
+        cached = {
+            suffix: AnalysisResultCache._disk_path(key, suffix)
+            for suffix in RENDER_OUTPUTS
+        }
+        try:
+            for suffix, path in cached.items():
+                shutil.copyfile(path, outputs[suffix])
+                os.utime(path)
+        except FileNotFoundError:
+            return False
+        AnalysisResultCache._stats["render_hits"] += 1
+        return True
+
+    @staticmethod
+    def put_render(key: str, outputs: Dict[str, Path]) -> None:
+        for suffix in RENDER_OUTPUTS:
+            if not outputs[suffix].exists():
+                return
+        for suffix in RENDER_OUTPUTS:
+            path = AnalysisResultCache._disk_path(key, suffix)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            part = path.with_name(f".{path.name}.part")
+            shutil.copyfile(outputs[suffix], part)
+            os.replace(part, path)
+        AnalysisResultCache._stats["render_stores"] += 1
+        AnalysisResultCache._evict_disk()
+
+    @staticmethod
+    def _evict_disk() -> None:
+        """Drop least-recently-used keys until the disk tier fits its budget"""
+        root = settings.analysis_cache_root
+        entries: Dict[str, list] = {}
+        total = 0
+        for path in root.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            entry = entries.setdefault(path.name.split(".", 1)[0], [0.0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1].append((path, stat.st_size))
+
+        if total <= settings.analysis_cache_disk_bytes:
+            return
+        for _, files in sorted(entries.values(), key=lambda e: e[0]):
+            for path, size in files:
+                path.unlink(missing_ok=True)
+                total -= size
+            AnalysisResultCache._stats["evictions"] += 1
+            if total <= settings.analysis_cache_disk_bytes:
+                break
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        return {
+            **AnalysisResultCache._stats,
+            "memory_entries": len(AnalysisResultCache._tables),
+            "memory_bytes": AnalysisResultCache._memory_bytes,
+        }
+
+    @staticmethod
+    def clear() -> None:
+        """Empty the memory tier and delete the disk tier"""
+        with AnalysisResultCache._lock:
+            AnalysisResultCache._tables.clear()
+            AnalysisResultCache._memory_bytes = 0
+        shutil.rmtree(settings.analysis_cache_root, ignore_errors=True)
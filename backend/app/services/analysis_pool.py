@@ -0,0 +1,200 @@
+"""
+Worker processes for analysis modules.
+
+Analysis sub-tools (scripts/analysis/**) run DuckDB / pandas work that can
+take seconds. Calling them from ``AnalysisService.run_analysis`` blocked the
+event loop for every other request in the worker. They now run in a
+``ProcessPoolExecutor``. Each worker process imports pandas, pyarrow, DuckDB
+and the analysis modules once at startup. Results come back as an
+``AnalysisResult`` serialised to an Arrow IPC stream.
+
+Each task has a timeout (``settings.analysis_task_timeout``). A task that
+times out or whose caller is cancelled while it is already running can only
+be stopped by killing its process. In that case the pool is replaced, and
+tasks that were running in the old pool are retried once on the new one.
+"""
+
+import asyncio
+import importlib
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.utils.analysis_result import AnalysisResult
+
+logger = get_logger("analysis_pool")
+
+BASE_DIR = Path(__file__).parent.parent.parent
+
+
+class AnalysisTimeoutError(ValueError):
+    """Analysis task exceeded settings.analysis_task_timeout"""
+
+
+def module_name(module_file_path: Path) -> str:
+    """Import name of an analysis script, e.g. scripts.analysis.db.tcga.tcga"""
+    relative_path = module_file_path.resolve().relative_to(BASE_DIR.resolve())
+    return ".".join(relative_path.with_suffix("").parts)
+
+
+def import_module(name: str):
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        logger.error(f"Failed to import module: {name}, error: {e}")
+        raise ValueError(f"Failed to import module: {name}: {str(e)}")
+
+
+def run_module(name: str, sub_tool: str, params: Dict[str, Any]) -> AnalysisResult:
+    """Run one sub-tool and return its result"""
+    module = import_module(name)
+    return AnalysisResult.coerce(module.run_analysis(sub_tool, params))
+
+
+def _run_module_ipc(name: str, sub_tool: str, params: Dict[str, Any]) -> bytes:
+    """Worker entry point: the result as an Arrow IPC stream"""
+    return run_module(name, sub_tool, params).to_ipc()
+
+
+def _init_worker(module_names: List[str]) -> None:
+    """Warm imports once per worker process"""
+    import duckdb  # noqa: F401
+
+    from app.utils.duckdb_pool import DuckDBPool
+
+    DuckDBPool.cursor()
+    for name in module_names:
+        try:
+            import_module(name)
+        except ValueError:
+            pass  # Reported again when a task actually needs it
+
+
+def _warm() -> None:
+    pass
+
+
+def _analysis_modules() -> List[str]:
+    """Every tool script: scripts/analysis/<category>/<tool>/<tool>.py"""
+    if not settings.analysis_root.exists():
+        return []
+    return [
+        module_name(path)
+        for path in sorted(settings.analysis_root.glob("*/*/*.py"))
+        if path.stem == path.parent.name
+    ]
+
+
+class AnalysisWorkerPool:
+    """Process pool that runs analysis modules off the event loop."""
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_executor() -> ProcessPoolExecutor:
+        with AnalysisWorkerPool._lock:
+            if AnalysisWorkerPool._executor is None:
+                AnalysisWorkerPool._executor = ProcessPoolExecutor(
+                    max_workers=settings.analysis_pool_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(_analysis_modules(),),
+                )
+                logger.info(
+                    f"Started analysis worker pool "
+                    f"({settings.analysis_pool_workers} processes)"
+                )
+            return AnalysisWorkerPool._executor
+
+    @staticmethod
+    def start() -> None:
+        """Spawn and warm the worker processes ahead of the first request"""
+        if settings.analysis_pool_workers <= 0:
+            return
+        executor = AnalysisWorkerPool._get_executor()
+        for _ in range(settings.analysis_pool_workers):
+            executor.submit(_warm)
+
+    @staticmethod
+    def _discard(executor: ProcessPoolExecutor) -> None:
+        """Kill a pool's processes; the next task starts a fresh pool"""
+        with AnalysisWorkerPool._lock:
+            if AnalysisWorkerPool._executor is executor:
+                AnalysisWorkerPool._executor = None
+        # ProcessPoolExecutor has no public way to stop a running task
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _abort(executor: ProcessPoolExecutor, future: Future) -> None:
+        if future.done() or future.cancel():
+            return
+        logger.warning("Recycling analysis worker pool to stop a running task")
+        AnalysisWorkerPool._discard(executor)
+
+    @staticmethod
+    async def run(
+        module_file_path: Path,
+        sub_tool: str,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> AnalysisResult:
+        """
+        Run ``module.run_analysis(sub_tool, params)`` and return its data.
+
+        Raises:
+            ValueError: If the module reports an error or can't be imported
+            AnalysisTimeoutError: If the task runs longer than the timeout
+        """
+        name = module_name(module_file_path)
+        timeout = timeout or settings.analysis_task_timeout
+
+        if settings.analysis_pool_workers <= 0:
+            # In-process fallback (single-process deployments, tests)
+            try:
+                return await asyncio.wait_for(
+                    asyncio.to_thread(run_module, name, sub_tool, params), timeout
+                )
+            except asyncio.TimeoutError:
+                raise AnalysisTimeoutError(
+                    f"{sub_tool} did not finish within {timeout} seconds"
+                )
+
+        for attempt in range(2):
+            executor = AnalysisWorkerPool._get_executor()
+            future = executor.submit(_run_module_ipc, name, sub_tool, params)
+            try:
+                data = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except asyncio.TimeoutError:
+                AnalysisWorkerPool._abort(executor, future)
+                raise AnalysisTimeoutError(
+                    f"{sub_tool} did not finish within {timeout} seconds"
+                )
+            except asyncio.CancelledError:
+                AnalysisWorkerPool._abort(executor, future)
+                raise
+            except BrokenProcessPool:
+                # Another task's timeout recycled the pool, or a worker died
+                AnalysisWorkerPool._discard(executor)
+                if attempt:
+                    raise ValueError(f"Analysis worker for {sub_tool} crashed")
+                continue
+            return AnalysisResult.from_ipc(data)
+
+    @staticmethod
+    def shutdown() -> None:
+        """Stop the worker processes (application shutdown)"""
+        with AnalysisWorkerPool._lock:
+            executor, AnalysisWorkerPool._executor = AnalysisWorkerPool._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
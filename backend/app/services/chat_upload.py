@@ -0,0 +1,157 @@
+"""
+Chat attachment storage.
+
+Attachments are copied from the request to disk in fixed-size chunks, so a
+multi-GB expression matrix or FASTQ file never sits in memory. The SHA-256
+is computed while copying and the content is stored once under
+``chat_files/objects/``; each upload is a hard link to that object, so a
+file that was uploaded before takes no extra space.
+"""
+
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict
+
+from aiofile import AIOFile
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("chat_upload")
+
+
+class UploadTooLargeError(ValueError):
+    """Attachment exceeds settings.chat_upload_max_bytes"""
+
+
+class ChatUploadService:
+    """Streams chat attachments to content-addressed storage."""
+
+    @staticmethod
+    def files_root() -> Path:
+        return settings.static_root / "chat_files"
+
+    @staticmethod
+    def object_path(sha256: str) -> Path:
+        """Location of the stored content for a digest"""
+        return ChatUploadService.files_root() / "objects" / sha256[:2] / sha256
+
+    @staticmethod
+    def check_size(file: UploadFile) -> None:
+        """Reject early when the request declared the part size"""
+        if file.size is not None and file.size > settings.chat_upload_max_bytes:
+            raise UploadTooLargeError(
+                f"{file.filename} is {file.size} bytes, the limit is "
+                f"{settings.chat_upload_max_bytes} bytes"
+            )
+
+    @staticmethod
+    async def save(
+        file: UploadFile, user_id: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Save an attachment, reporting progress.
+
+        Yields ``upload_progress`` events while copying (at most one per
+        ``settings.chat_upload_progress_interval`` seconds) and finally an
+        ``upload_complete`` event whose ``file`` is the attachment info passed
+        to the orchestrator.
+
+        Raises:
+            UploadTooLargeError: If the file exceeds the configured maximum
+                (the partial copy is removed)
+        """
+        ChatUploadService.check_size(file)
+
+        user_dir = ChatUploadService.files_root() / str(user_id)
+        user_dir.mkdir(parents=True, exist_ok=True)
+        file_ext = Path(file.filename).suffix if file.filename else ""
+        unique_filename = f"{uuid.uuid4()}{file_ext}"
+        file_path = user_dir / unique_filename
+        part_path = user_dir / f".{unique_filename}.part"
+
+        digest = hashlib.sha256()
+        written = 0
+        last_report = time.monotonic()
+        try:
+            async with AIOFile(part_path, "wb") as f:
+                while True:
+                    chunk = await file.read(settings.chat_upload_chunk_size)
+                    if not chunk:
+                        break
+                    if written + len(chunk) > settings.chat_upload_max_bytes:
+                        raise UploadTooLargeError(
+                            f"{file.filename} exceeds the limit of "
+                            f"{settings.chat_upload_max_bytes} bytes"
+                        )
+                    await f.write(chunk, offset=written)
+                    digest.update(chunk)
+                    written += len(chunk)
+
+                    now = time.monotonic()
+                    if now - last_report >= settings.chat_upload_progress_interval:
+                        last_report = now
+                        yield {
+                            "type": "upload_progress",
+                            "filename": file.filename,
+                            "bytes": written,
+                            "total": file.size,
+                        }
+                await f.fsync()
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+
+        sha256 = digest.hexdigest()
+        deduplicated = ChatUploadService._store(part_path, sha256)
+        ChatUploadService._link(ChatUploadService.object_path(sha256), file_path)
+        logger.info(
+            f"Saved attachment {file.filename} ({written} bytes, sha256={sha256[:12]}"
+            f"{', deduplicated' if deduplicated else ''}) for user {user_id}"
+        )
+
+        relative_path = f"chat_files/{user_id}/{unique_filename}"
+        yield {
+            "type": "upload_complete",
+            "filename": file.filename,
+            "bytes": written,
+            "total": written,
+            "deduplicated": deduplicated,
+            "file": {
+                "filename": file.filename or "unknown",
+                "size": written,
+                "content_type": file.content_type,
+                "file_path": str(file_path),
+                "file_url": f"/static/{relative_path}",
+                "relative_path": relative_path,
+                "sha256": sha256,
+            },
+        }
+
+    @staticmethod
+    def _store(part_path: Path, sha256: str) -> bool:
+        """Move a finished copy into object storage; True if it was already there"""
+        object_path = ChatUploadService.object_path(sha256)
+        if object_path.exists():
+            part_path.unlink()
+            return True
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part_path, object_path)
+        return False
+
+    @staticmethod
+    def _link(object_path: Path, file_path: Path) -> None:
+        """Expose stored content at a per-upload path without copying it"""
+        try:
+            os.link(object_path, file_path)
+        except OSError:
+            # Hard links are unavailable (e.g. static_root spans filesystems)
+            try:
+                file_path.symlink_to(object_path)
+            except OSError:
+                shutil.copyfile(object_path, file_path)
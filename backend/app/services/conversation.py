@@ -3,10 +3,14 @@ Conversation and Message service for managing chat persistence.
 This service handles all database operations for conversations and messages.
 """
 
-from typing import List, Optional, Dict, Any
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Literal, Optional, Dict, Any, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, desc, delete, insert, update, and_, or_, true, literal
+from sqlalchemy.orm import aliased, selectinload, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.conversation import Conversation, Message
 from app.models.user import User
@@ -14,13 +18,39 @@ from app.schemas.conversation import (
     ConversationCreate,
     ConversationUpdate,
     ConversationResponse,
+    ConversationSummary,
     MessageCreate,
+    MessagePreview,
     MessageResponse,
 )
 from app.core.logging import get_logger
 
 logger = get_logger("conversation_service")
 
+# How much of a conversation to load:
+# - "header": the conversation row only (accessing .messages raises)
+# - "recent": the row plus the last ``message_limit`` messages in .messages
+# - "full": the row plus every message
+LoadProfile = Literal["header", "recent", "full"]
+
+
+def _encode_cursor(updated_at: datetime, conversation_id: int) -> str:
+    """Opaque keyset cursor carrying the (updated_at, id) of a page's last row"""
+    key = f"{updated_at.isoformat()}|{conversation_id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``_encode_cursor``; raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, conversation_id = (
+            base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        )
+        return datetime.fromisoformat(updated_at), int(conversation_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 
 class ConversationService:
     """Service for managing conversations and messages"""
@@ -58,7 +88,11 @@ class ConversationService:
 
     @staticmethod
     async def get_conversation(
-        db: AsyncSession, conversation_id: int, user_id: Optional[int] = None
+        db: AsyncSession,
+        conversation_id: int,
+        user_id: Optional[int] = None,
+        load: LoadProfile = "full",
+        message_limit: int = 20,
     ) -> Optional[Conversation]:
         """
         Get a conversation by ID.
@@ -67,6 +101,8 @@ class ConversationService:
             db: Database session
             conversation_id: Conversation ID
             user_id: Optional user ID for authorization check
+            load: Loading profile ("header", "recent" or "full")
+            message_limit: Number of messages for the "recent" profile
             
         Returns:
             Conversation if found, None otherwise
@@ -74,9 +110,21 @@ class ConversationService:
         stmt = select(Conversation).where(Conversation.id == conversation_id)
         if user_id:
             stmt = stmt.where(Conversation.user_id == user_id)
-        
-        result = await db.execute(stmt.options(selectinload(Conversation.messages)))
-        return result.scalar_one_or_none()
+
+        if load == "full":
+            stmt = stmt.options(selectinload(Conversation.messages))
+        else:
+            stmt = stmt.options(raiseload(Conversation.messages))
+
+        result = await db.execute(stmt)
+        conversation = result.scalar_one_or_none()
+
+        if conversation is not None and load == "recent":
+            messages = await MessageService.get_recent_messages(
+                db, conversation.id, message_limit
+            )
+            set_committed_value(conversation, "messages", messages)
+        return conversation
 
     @staticmethod
     async def list_conversations(
@@ -113,12 +161,129 @@ class ConversationService:
         result = await db.execute(stmt)
         return list(result.scalars().all())
 
+    @staticmethod
+    async def list_conversation_summaries(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 30,
+        cursor: Optional[str] = None,
+        preview_chars: int = 200,
+        include_inactive: bool = False,
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """
+        List a user's conversations, newest first, each with a preview of its
+        last message, in one query.
+
+        Conversations are paged by keyset on (updated_at, id); the last
+        message is picked per conversation with a LATERAL join on PostgreSQL
+        and a ROW_NUMBER() window elsewhere, both served by the
+        (conversation_id, created_at, id) index on messages.
+
+        Args:
+            db: Database session
+            user_id: User ID
+            limit: Page size
+            cursor: ``next_cursor`` of the previous page, which encodes the
+                (updated_at, id) of its last conversation, so the next page is
+                stable when that conversation is deleted or updated
+            preview_chars: Preview length in characters
+            include_inactive: Whether to include archived conversations
+
+        Returns:
+            Conversation summaries and the cursor of the next page (None on
+            the last page)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        page = select(Conversation).where(Conversation.user_id == user_id)
+        if not include_inactive:
+            page = page.where(Conversation.is_active.is_(True))
+        if cursor is not None:
+            cursor_updated_at, cursor_id = _decode_cursor(cursor)
+            updated_at, bound = Conversation.updated_at, literal(
+                cursor_updated_at, Conversation.updated_at.type
+            )
+            if db.bind.dialect.name == "sqlite":
+                # SQLite keeps timestamps as text in the format that wrote
+                # them (server defaults have no microseconds, bound values
+                # do), so compare instants rather than strings
+                updated_at, bound = func.julianday(updated_at), func.julianday(bound)
+            page = page.where(
+                or_(
+                    updated_at < bound,
+                    and_(updated_at == bound, Conversation.id < cursor_id),
+                )
+            )
+        page = (
+            page.order_by(desc(Conversation.updated_at), desc(Conversation.id))
+            .limit(limit + 1)
+            .subquery("page")
+        )
+        conversation = aliased(Conversation, page)
+
+        preview_content = func.substr(Message.content, 1, preview_chars)
+        if db.bind.dialect.name == "postgresql":
+            last = (
+                select(
+                    Message.role,
+                    preview_content.label("content"),
+                    Message.created_at,
+                )
+                .where(Message.conversation_id == page.c.id)
+                .order_by(desc(Message.created_at), desc(Message.id))
+                .limit(1)
+                .lateral("last_message")
+            )
+            onclause = true()
+        else:
+            last = (
+                select(
+                    Message.conversation_id,
+                    Message.role,
+                    preview_content.label("content"),
+                    Message.created_at,
+                    func.row_number()
+                    .over(
+                        partition_by=Message.conversation_id,
+                        order_by=(desc(Message.created_at), desc(Message.id)),
+                    )
+                    .label("rank"),
+                )
+                .where(Message.conversation_id.in_(select(page.c.id)))
+                .subquery("last_message")
+            )
+            onclause = and_(last.c.conversation_id == page.c.id, last.c.rank == 1)
+
+        stmt = (
+            select(conversation, last.c.role, last.c.content, last.c.created_at)
+            .select_from(page)
+            .outerjoin(last, onclause)
+            .order_by(desc(page.c.updated_at), desc(page.c.id))
+        )
+        rows = (await db.execute(stmt)).all()
+
+        summaries = []
+        for conv, role, content, created_at in rows[:limit]:
+            summary = ConversationSummary.model_validate(conv)
+            if role is not None:
+                summary.last_message = MessagePreview(
+                    role=role, content=content, created_at=created_at
+                )
+            summaries.append(summary)
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor(summaries[-1].updated_at, summaries[-1].id)
+        return summaries, next_cursor
+
     @staticmethod
     async def update_conversation(
         db: AsyncSession,
         conversation_id: int,
         user_id: int,
         update_data: ConversationUpdate,
+        load: LoadProfile = "header",
     ) -> Optional[Conversation]:
         """
         Update a conversation.
@@ -128,12 +293,13 @@ class ConversationService:
             conversation_id: Conversation ID
             user_id: User ID for authorization
             update_data: Update data
+            load: Loading profile of the returned conversation
             
         Returns:
             Updated conversation if found, None otherwise
         """
         conversation = await ConversationService.get_conversation(
-            db, conversation_id, user_id
+            db, conversation_id, user_id, load=load
         )
         if not conversation:
             return None
@@ -164,13 +330,17 @@ class ConversationService:
         Returns:
             True if deleted, False otherwise
         """
-        conversation = await ConversationService.get_conversation(
-            db, conversation_id, user_id
+        owned = await db.scalar(
+            select(Conversation.id).where(
+                Conversation.id == conversation_id, Conversation.user_id == user_id
+            )
         )
-        if not conversation:
+        if owned is None:
             return False
 
-        await db.delete(conversation)
+        # Bulk deletes: the ORM cascade would load every message first
+        await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+        await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
         await db.commit()
         logger.info(f"Deleted conversation {conversation_id} for user {user_id}")
         return True
@@ -180,7 +350,7 @@ class ConversationService:
         db: AsyncSession, user_id: int, conversation_id: Optional[int] = None
     ) -> Conversation:
         """
-        Get existing conversation or create a new one.
+        Get existing conversation (header only) or create a new one.
         
         Args:
             db: Database session
@@ -192,7 +362,7 @@ class ConversationService:
         """
         if conversation_id:
             conversation = await ConversationService.get_conversation(
-                db, conversation_id, user_id
+                db, conversation_id, user_id, load="header"
             )
             if conversation:
                 return conversation
@@ -291,31 +461,87 @@ class MessageService:
         db: AsyncSession,
         conversation_id: int,
         limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
     ) -> List[Message]:
         """
-        Get all messages for a conversation.
+        Get messages for a conversation, with keyset pagination.
+
+        Pages are keyed on (conversation_id, created_at, id), so they stay
+        stable while new messages arrive and never scan skipped rows.
         
         Args:
             db: Database session
             conversation_id: Conversation ID
             limit: Optional limit on number of messages
+            after_id: Only messages after this message (next page)
+            before_id: Only the ``limit`` messages right before this message
+                (previous page)
             
         Returns:
             List of messages ordered by creation time
         """
-        stmt = select(Message).where(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at)
-        
+        stmt = select(Message).where(Message.conversation_id == conversation_id)
+
+        if after_id is not None:
+            stmt = stmt.where(MessageService._keyset_after(conversation_id, after_id))
+        if before_id is not None:
+            stmt = stmt.where(MessageService._keyset_before(conversation_id, before_id))
+            # Newest first so the limit keeps the messages closest to the cursor
+            stmt = stmt.order_by(desc(Message.created_at), desc(Message.id))
+        else:
+            stmt = stmt.order_by(Message.created_at, Message.id)
+
         if limit:
             stmt = stmt.limit(limit)
         
         result = await db.execute(stmt)
-        return list(result.scalars().all())
+        messages = list(result.scalars().all())
+        if before_id is not None:
+            messages.reverse()
+        return messages
+
+    @staticmethod
+    async def get_recent_messages(
+        db: AsyncSession, conversation_id: int, limit: int
+    ) -> List[Message]:
+        """Get the last ``limit`` messages of a conversation in creation order"""
+        stmt = (
+            select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(desc(Message.created_at), desc(Message.id))
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return list(reversed(result.scalars().all()))
+
+    @staticmethod
+    def _cursor(conversation_id: int, message_id: int):
+        return (
+            select(Message.created_at)
+            .where(Message.id == message_id, Message.conversation_id == conversation_id)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _keyset_after(conversation_id: int, message_id: int):
+        created_at = MessageService._cursor(conversation_id, message_id)
+        return or_(
+            Message.created_at > created_at,
+            and_(Message.created_at == created_at, Message.id > message_id),
+        )
+
+    @staticmethod
+    def _keyset_before(conversation_id: int, message_id: int):
+        created_at = MessageService._cursor(conversation_id, message_id)
+        return or_(
+            Message.created_at < created_at,
+            and_(Message.created_at == created_at, Message.id < message_id),
+        )
 
     @staticmethod
     async def format_messages_for_agent(
-        db: AsyncSession, conversation_id: int
+        db: AsyncSession, conversation_id: int, limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Format messages for agent consumption.
@@ -324,24 +550,150 @@ class MessageService:
         Args:
             db: Database session
             conversation_id: Conversation ID
+            limit: Only the last ``limit`` complete messages (all if None)
             
         Returns:
             List of formatted messages for agent
         """
-        messages = await MessageService.get_conversation_messages(db, conversation_id)
-        # Filter out incomplete messages (streaming messages that haven't finished)
-        # Only include complete messages in history
+        # Only the columns the agent reads; incomplete (still streaming)
+        # messages are excluded in SQL so the limit counts complete ones
+        stmt = (
+            select(Message.role, Message.content)
+            .where(
+                Message.conversation_id == conversation_id,
+                Message.is_complete.is_(True),
+            )
+            .order_by(desc(Message.created_at), desc(Message.id))
+        )
+        if limit:
+            stmt = stmt.limit(limit)
+        result = await db.execute(stmt)
         formatted = [
-            {
-                "role": msg.role,
-                "content": msg.content,
-            }
-            for msg in messages
-            if msg.is_complete  # Only include complete messages
+            {"role": role, "content": content} for role, content in result.all()
         ]
+        formatted.reverse()
         logger.debug(
-            f"Formatted {len(formatted)} complete messages out of {len(messages)} total "
+            f"Formatted {len(formatted)} complete messages "
             f"for conversation {conversation_id}"
         )
         return formatted
 
+
+@dataclass
+class StagedMessage:
+    """A message tracked by a MessageBatch; ``id`` is set once it is written"""
+
+    conversation_id: int
+    role: str
+    content: str
+    meta_data: Dict[str, Any] = field(default_factory=dict)
+    is_complete: bool = True
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    _dirty: Set[str] = field(default_factory=set, repr=False)
+
+
+class MessageBatch:
+    """
+    Unit of work for the messages of one chat turn.
+
+    Messages and their later updates are staged in memory and written by
+    ``commit()`` in a single transaction: all new messages with one
+    ``INSERT ... RETURNING``, and each changed message with one
+    ``UPDATE ... RETURNING``. Metadata is merged in memory, so updates never
+    re-select the row.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.messages: List[StagedMessage] = []
+
+    def add(
+        self,
+        conversation_id: int,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        is_complete: bool = True,
+    ) -> StagedMessage:
+        """Stage a new message"""
+        message = StagedMessage(
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            meta_data=dict(metadata or {}),
+            is_complete=is_complete,
+        )
+        self.messages.append(message)
+        return message
+
+    def update(
+        self,
+        message: StagedMessage,
+        content: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        is_complete: Optional[bool] = None,
+    ) -> StagedMessage:
+        """Stage changes to a message (metadata is merged, as in update_message)"""
+        if content is not None:
+            message.content = content
+            message._dirty.add("content")
+        if metadata is not None:
+            message.meta_data = {**message.meta_data, **metadata}
+            message._dirty.add("meta_data")
+        if is_complete is not None:
+            message.is_complete = is_complete
+            message._dirty.add("is_complete")
+        return message
+
+    async def commit(self) -> None:
+        """Write all staged inserts and updates in one transaction"""
+        new = [m for m in self.messages if m.id is None]
+        changed = [m for m in self.messages if m.id is not None and m._dirty]
+        if not new and not changed:
+            return
+
+        try:
+            if new:
+                result = await self.db.execute(
+                    insert(Message).returning(
+                        Message.id,
+                        Message.created_at,
+                        Message.updated_at,
+                        sort_by_parameter_order=True,
+                    ),
+                    [
+                        {
+                            "conversation_id": m.conversation_id,
+                            "role": m.role,
+                            "content": m.content,
+                            "meta_data": m.meta_data,
+                            "is_complete": m.is_complete,
+                        }
+                        for m in new
+                    ],
+                )
+                for message, row in zip(new, result.all()):
+                    message.id, message.created_at, message.updated_at = row
+                    message._dirty.clear()
+
+            for message in changed:
+                values = {name: getattr(message, name) for name in message._dirty}
+                result = await self.db.execute(
+                    update(Message)
+                    .where(Message.id == message.id)
+                    .values(**values)
+                    .returning(Message.updated_at)
+                )
+                message.updated_at = result.scalar_one_or_none()
+                message._dirty.clear()
+
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        logger.debug(
+            f"Message batch committed: {len(new)} inserted, {len(changed)} updated"
+        )
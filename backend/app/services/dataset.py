@@ -0,0 +1,358 @@
+"""
+Tabular datasets from chat attachments.
+
+CSV/TSV/XLSX/Parquet attachments are ingested in the background as soon as
+they are uploaded:
+
+- the format is sniffed from the extension and the first bytes
+- the file is converted to Parquet and profiled (types, nulls, ranges,
+  distinct counts, sample rows) with DuckDB, which streams the file under a
+  memory limit; XLSX is streamed row by row through an intermediate CSV
+- results are cached by content hash under ``chat_files/datasets/<sha256>/``,
+  so a file uploaded again is not profiled again
+
+The profile is added to the agent prompt, and the agent can plot the file
+by setting ``visual_request.dataset`` to its ID instead of inlining rows.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import duckdb
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("dataset")
+
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".tab": "tsv",
+    ".xlsx": "xlsx",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+
+def _sql_string(value: str) -> str:
+    """Quote a string literal (COPY targets cannot be parameters)"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class DatasetService:
+    """Background ingest, profiling and loading of uploaded tables."""
+
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def dataset_dir(dataset_id: str) -> Path:
+        return settings.static_root / "chat_files" / "datasets" / dataset_id
+
+    @staticmethod
+    def sniff_format(path: Path, filename: Optional[str] = None) -> Optional[str]:
+        """
+        csv / tsv / xlsx / parquet, or None for non-tabular files.
+
+        Uploads are stored under a generated name, so the extension is taken
+        from the original ``filename`` when given.
+        """
+        name = (filename or path.name).lower()
+        compressed = name.endswith(".gz")
+        if compressed:
+            name = name[:-3]
+        suffix = Path(name).suffix
+        fmt = _EXTENSIONS.get(suffix)
+        if fmt is not None or compressed:
+            return fmt
+
+        with open(path, "rb") as f:
+            head = f.read(64 * 1024)
+        if head.startswith(b"PAR1"):
+            return "parquet"
+        if head.startswith(b"PK\x03\x04") and suffix in ("", ".xls", ".xlsx"):
+            return "xlsx"
+        try:
+            text = head.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        lines = text.splitlines()[:20]
+        if len(lines) < 2:
+            return None
+        try:
+            dialect = csv.Sniffer().sniff("\n".join(lines), delimiters=",\t;")
+        except csv.Error:
+            return None
+        return "tsv" if dialect.delimiter == "\t" else "csv"
+
+    @staticmethod
+    def schedule(file_info: Dict[str, Any], user_id: int) -> Optional[asyncio.Task]:
+        """Start ingesting an uploaded file in the background"""
+        dataset_id = file_info.get("sha256")
+        if not dataset_id:
+            return None
+        DatasetService._grant(dataset_id, user_id)
+        task = DatasetService._tasks.get(dataset_id)
+        if task is None:
+            task = asyncio.create_task(DatasetService.profile(file_info))
+            DatasetService._tasks[dataset_id] = task
+            task.add_done_callback(
+                lambda _: DatasetService._tasks.pop(dataset_id, None)
+            )
+        return task
+
+    @staticmethod
+    async def profile(file_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Profile of an uploaded file (cached by hash), None if not tabular"""
+        dataset_id = file_info["sha256"]
+        cached = DatasetService.get_profile(dataset_id)
+        if cached is not None:
+            return cached
+        return await asyncio.to_thread(
+            DatasetService._ingest,
+            Path(file_info["file_path"]),
+            dataset_id,
+            file_info.get("filename") or "",
+        )
+
+    @staticmethod
+    async def wait_for(
+        files: List[Dict[str, Any]], user_id: int, timeout: Optional[float] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Profiles of the attached files that are ready within ``timeout``
+        seconds, keyed by dataset ID. Files that are still being ingested are
+        left out (they stay cached for the next turn).
+        """
+        timeout = settings.dataset_profile_wait if timeout is None else timeout
+        tasks = {}
+        for file_info in files:
+            task = DatasetService.schedule(file_info, user_id)
+            if task is not None:
+                tasks[file_info["sha256"]] = task
+        if not tasks:
+            return {}
+
+        await asyncio.wait(list(tasks.values()), timeout=timeout)
+        profiles = {}
+        for dataset_id, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                if task.result() is not None:
+                    profiles[dataset_id] = task.result()
+            elif task.done() and not task.cancelled():
+                logger.warning(f"Dataset ingest failed for {dataset_id}: {task.exception()}")
+        return profiles
+
+    @staticmethod
+    def get_profile(dataset_id: str) -> Optional[Dict[str, Any]]:
+        profile_path = DatasetService.dataset_dir(dataset_id) / "profile.json"
+        if not profile_path.exists():
+            return None
+        return json.loads(profile_path.read_text())
+
+    @staticmethod
+    def load_rows(dataset_id: str, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Rows of a dataset for rendering, at most settings.dataset_render_max_rows.
+
+        Raises:
+            ValueError: If the dataset does not exist or was not uploaded by the user
+        """
+        dataset_dir = DatasetService.dataset_dir(dataset_id)
+        parquet_path = dataset_dir / "data.parquet"
+        if not (dataset_dir / "users" / str(user_id)).exists() or not parquet_path.exists():
+            raise ValueError(f"Dataset not found: {dataset_id}")
+
+        parquet = pq.ParquetFile(parquet_path)
+        rows: List[Dict[str, Any]] = []
+        limit = settings.dataset_render_max_rows
+        for batch in parquet.iter_batches(batch_size=min(limit, 65536)):
+            rows.extend(batch.to_pylist())
+            if len(rows) >= limit:
+                logger.warning(
+                    f"Dataset {dataset_id} truncated to {limit} rows for rendering"
+                )
+                return rows[:limit]
+        return rows
+
+    @staticmethod
+    def format_for_prompt(
+        files: List[Dict[str, Any]], profiles: Dict[str, Dict[str, Any]]
+    ) -> str:
+        """Compact description of the attached datasets for the agent"""
+        sections = []
+        for file_info in files:
+            profile = profiles.get(file_info.get("sha256"))
+            if not profile:
+                continue
+            name = file_info.get("filename", "unknown")
+            if profile.get("error"):
+                sections.append(f"[数据集 {name}] 无法解析: {profile['error']}")
+                continue
+            lines = [
+                f"[数据集 {name}] dataset={profile['dataset_id']}, "
+                f"{profile['rows']} 行 × {len(profile['columns'])} 列 ({profile['format']})"
+            ]
+            for column in profile["columns"]:
+                parts = [f"{column['name']} ({column['type']})"]
+                if column.get("min") is not None:
+                    parts.append(f"range {column['min']} .. {column['max']}")
+                if column.get("mean") is not None:
+                    parts.append(f"mean {column['mean']}")
+                parts.append(f"~{column['distinct']} distinct")
+                if column.get("null_percent"):
+                    parts.append(f"{column['null_percent']}% null")
+                lines.append("- " + ", ".join(parts))
+            if profile.get("sample"):
+                lines.append(
+                    "sample: " + json.dumps(profile["sample"], ensure_ascii=False, default=str)
+                )
+            sections.append("\n".join(lines))
+        if not sections:
+            return ""
+        return (
+            "\n\n"
+            + "\n\n".join(sections)
+            + "\n\n(To plot an uploaded dataset, set visual_request.dataset to its "
+            "dataset ID and leave visual_request.data empty.)"
+        )
+
+    @staticmethod
+    def _grant(dataset_id: str, user_id: int) -> None:
+        users_dir = DatasetService.dataset_dir(dataset_id) / "users"
+        users_dir.mkdir(parents=True, exist_ok=True)
+        (users_dir / str(user_id)).touch()
+
+    @staticmethod
+    def _connect() -> duckdb.DuckDBPyConnection:
+        con = duckdb.connect()
+        con.execute(f"SET memory_limit = {_sql_string(settings.dataset_memory_limit)}")
+        con.execute(f"SET threads = {int(settings.dataset_threads)}")
+        con.execute("SET preserve_insertion_order = true")
+        return con
+
+    @staticmethod
+    def _ingest(path: Path, dataset_id: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Convert to Parquet and profile (runs in a worker thread)"""
+        fmt = DatasetService.sniff_format(path, filename)
+        if fmt is None:
+            return None
+
+        start = time.perf_counter()
+        dataset_dir = DatasetService.dataset_dir(dataset_id)
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+        parquet_path = dataset_dir / "data.parquet"
+        con = DatasetService._connect()
+        try:
+            part_path = dataset_dir / "data.parquet.part"
+            copy_to = f"TO {_sql_string(str(part_path))} (FORMAT PARQUET, COMPRESSION ZSTD)"
+            source = DatasetService._source_relation(path, fmt, dataset_dir)
+            try:
+                con.execute(f"COPY (SELECT * FROM {source}) {copy_to}")
+            except duckdb.ConversionException:
+                # Types were detected on a sample and a later row disagrees
+                source = DatasetService._source_relation(
+                    path, fmt, dataset_dir, all_varchar=True
+                )
+                con.execute(f"COPY (SELECT * FROM {source}) {copy_to}")
+            os.replace(part_path, parquet_path)
+            profile = DatasetService._profile_parquet(con, parquet_path)
+        except (duckdb.Error, OSError, ImportError) as e:
+            logger.warning(f"Could not ingest {filename or path.name} as {fmt}: {e}")
+            profile = {"error": str(e).splitlines()[0][:300]}
+        finally:
+            con.close()
+            (dataset_dir / "source.csv").unlink(missing_ok=True)
+
+        profile.update(
+            dataset_id=dataset_id,
+            filename=filename,
+            format=fmt,
+            source_bytes=path.stat().st_size,
+        )
+        if parquet_path.exists():
+            profile["parquet_path"] = str(parquet_path)
+            profile["parquet_bytes"] = parquet_path.stat().st_size
+        (dataset_dir / "profile.json").write_text(
+            json.dumps(profile, ensure_ascii=False, default=str)
+        )
+        logger.info(
+            f"Ingested {filename or path.name} ({fmt}) as dataset {dataset_id[:12]} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return profile
+
+    @staticmethod
+    def _source_relation(
+        path: Path, fmt: str, dataset_dir: Path, all_varchar: bool = False
+    ) -> str:
+        """FROM-clause table function that streams the source file"""
+        if fmt == "parquet":
+            return f"read_parquet({_sql_string(str(path))})"
+        if fmt == "xlsx":
+            csv_path = dataset_dir / "source.csv"
+            if not csv_path.exists():
+                DatasetService._xlsx_to_csv(path, csv_path)
+            path = csv_path
+        delimiter = "\\t" if fmt == "tsv" else ","
+        return (
+            f"read_csv({_sql_string(str(path))}, delim = '{delimiter}', header = true, "
+            f"sample_size = {int(settings.dataset_sniff_rows)}"
+            f"{', all_varchar = true' if all_varchar else ''})"
+        )
+
+    @staticmethod
+    def _xlsx_to_csv(path: Path, csv_path: Path) -> Path:
+        """Stream the first sheet of a workbook to CSV"""
+        try:
+            from openpyxl import load_workbook
+        except ImportError as e:
+            raise ImportError("XLSX attachments require the openpyxl package") from e
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            with open(csv_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                for row in sheet.iter_rows(values_only=True):
+                    writer.writerow(["" if v is None else v for v in row])
+        finally:
+            workbook.close()
+        return csv_path
+
+    @staticmethod
+    def _profile_parquet(
+        con: duckdb.DuckDBPyConnection, parquet_path: Path
+    ) -> Dict[str, Any]:
+        source = f"read_parquet({_sql_string(str(parquet_path))})"
+        summary = con.execute(f"SUMMARIZE SELECT * FROM {source}").fetchall()
+        names = [d[0] for d in con.description]
+        columns, rows = [], 0
+        for record in summary:
+            stats = dict(zip(names, record))
+            rows = int(stats["count"])
+            numeric = stats["avg"] is not None
+            columns.append(
+                {
+                    "name": stats["column_name"],
+                    "type": stats["column_type"],
+                    "min": stats["min"] if numeric else None,
+                    "max": stats["max"] if numeric else None,
+                    "mean": round(float(stats["avg"]), 4) if numeric else None,
+                    "distinct": int(stats["approx_unique"] or 0),
+                    "null_percent": float(stats["null_percentage"] or 0),
+                }
+            )
+        sample = con.execute(f"SELECT * FROM {source} LIMIT 3").fetchall()
+        column_names = [c["name"] for c in columns]
+        return {
+            "rows": rows,
+            "columns": columns,
+            "sample": [dict(zip(column_names, row)) for row in sample],
+        }
@@ -20,6 +20,8 @@ from app.schemas.visual import (
     VisualToolCommentCreate,
     VisualToolCommentResponse,
 )
+from app.services.visual_preflight import VisualPreflightService
+from app.utils.tracing import span
 from app.models.visual import (
     VisualTool,
     UserToolLike,
@@ -519,41 +521,66 @@ class VisualService:
                 "json": tool_output_dir / f"{file_prefix}_data.json",
             }
 
-            # 处理数据
-            # 所有数据统一保存为 JSON 文件（支持单表和多表格式）
-            # 如果没有传递数据，使用已存在的 JSON 文件（如果存在）
-            if data := params.get("data", []):
-                # 统一保存为 JSON 格式
-                # 单表格式（数组）和多表格式（对象）都直接保存为 JSON
-                params["data"] = VisualService._write_data_to_json(
-                    data, file_paths["json"]
-                )
-            elif file_paths["json"].exists():
-                # 没有传递数据，但 JSON 文件已存在，使用现有文件
-                params["data"] = str(file_paths["json"].resolve())
-            else:
-                # 既没有传递数据，也没有已存在的文件，返回错误
-                return VisualService._create_error_response(
-                    "No data provided and no existing data file found. Please provide data first.",
-                    chart_type,
-                    engine,
-                )
-
             # 合并 ggplot2 默认配置
             if not params.get("ggplot2"):
                 default_ggplot2 = settings.get_ggplot2_config(chart_type)
                 if default_ggplot2:
                     params["ggplot2"] = default_ggplot2
 
-            # 合并 heatmap 默认配置（从 meta.json 中读取）
-            # heatmap 配置通常已经在工具信息中，但如果参数中没有，可以从工具信息中获取
-            # 注意：这里不自动合并，因为 heatmap 配置应该由前端明确传递
+            # 预检：在启动 R 进程之前校验列映射、类型和必需参数，并自动修复常见问题
+            with span("render.preflight"):
+                if params.get("data"):
+                    tool_info = VisualService.get_tool_info(chart_type.replace("/", "_"))
+                    # 专用 plot.R 可能会在绘图前派生新列，此时只校验参数
+                    preflight = VisualPreflightService.validate(
+                        params,
+                        tool_info.params_schema if tool_info else None,
+                        check_mappings=script_path.name != "plot.R",
+                    )
+                    if not preflight.ok:
+                        data = params["data"]
+                        rows = data.get("matrix") if isinstance(data, dict) else data
+                        data_info = VisualService._analyze_data_format(rows)
+                        data_info["column_profile"] = preflight.column_profile
+                        return VisualService._create_error_response(
+                            f"Chart request failed validation: {preflight.error_details()['error_message']}",
+                            chart_type,
+                            engine,
+                            error_details=preflight.error_details(),
+                            data_info=data_info,
+                        )
+                    params = preflight.params
+
+            with span("render.write_inputs"):
+                # 处理数据
+                # 所有数据统一保存为 JSON 文件（支持单表和多表格式）
+                # 如果没有传递数据，使用已存在的 JSON 文件（如果存在）
+                if data := params.get("data", []):
+                    # 统一保存为 JSON 格式
+                    # 单表格式（数组）和多表格式（对象）都直接保存为 JSON
+                    params["data"] = VisualService._write_data_to_json(
+                        data, file_paths["json"]
+                    )
+                elif file_paths["json"].exists():
+                    # 没有传递数据，但 JSON 文件已存在，使用现有文件
+                    params["data"] = str(file_paths["json"].resolve())
+                else:
+                    # 既没有传递数据，也没有已存在的文件，返回错误
+                    return VisualService._create_error_response(
+                        "No data provided and no existing data file found. Please provide data first.",
+                        chart_type,
+                        engine,
+                    )
 
-            # 写入参数文件
-            file_paths["params"].write_text(
-                json.dumps(params, ensure_ascii=False, indent=2), encoding="utf-8"
-            )
-            logger.info(f"Parameters written to: {file_paths['params']}")
+                # 合并 heatmap 默认配置（从 meta.json 中读取）
+                # heatmap 配置通常已经在工具信息中，但如果参数中没有，可以从工具信息中获取
+                # 注意：这里不自动合并，因为 heatmap 配置应该由前端明确传递
+
+                # 写入参数文件
+                file_paths["params"].write_text(
+                    json.dumps(params, ensure_ascii=False, indent=2), encoding="utf-8"
+                )
+                logger.info(f"Parameters written to: {file_paths['params']}")
 
             # 设置环境变量
             env = {
@@ -565,30 +592,32 @@ class VisualService:
                 "R_SCRIPT_ROOT": str(settings.scripts_root.parent.resolve()),
             }
 
-            # 运行脚本
-            process = await asyncio.create_subprocess_exec(
-                interpreter_config["command"],
-                str(script_path),
-                env=env,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=str(script_path.parent),
-            )
-
-            # 等待完成
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), timeout=interpreter_config["timeout"]
-                )
-            except asyncio.TimeoutError:
-                process.kill()
-                await process.wait()
-                return VisualService._create_error_response(
-                    f"{engine.upper()} script execution timed out",
-                    chart_type,
-                    engine,
+            with span("render.r_process", chart_type=chart_type) as attrs:
+                # 运行脚本
+                process = await asyncio.create_subprocess_exec(
+                    interpreter_config["command"],
+                    str(script_path),
+                    env=env,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=str(script_path.parent),
                 )
 
+                # 等待完成
+                try:
+                    stdout, stderr = await asyncio.wait_for(
+                        process.communicate(), timeout=interpreter_config["timeout"]
+                    )
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    attrs["timeout"] = True
+                    return VisualService._create_error_response(
+                        f"{engine.upper()} script execution timed out",
+                        chart_type,
+                        engine,
+                    )
+
             # 记录脚本输出（包括 print 语句）
             if stdout:
                 stdout_text = (
@@ -0,0 +1,476 @@
+"""
+Pre-flight validation of chart requests.
+
+Checks a chart request against the tool's ``params_schema`` and its
+ggplot2 / heatmap configuration using a column profile of the data, before
+any R process is started. Trivial mismatches (column name case, numbers sent
+as strings) are fixed in place; anything else is reported in the same
+``error_details`` / ``data_info`` shape that ``ErrorRecoveryAgent`` consumes.
+"""
+
+import re
+from typing import Dict, Any, Optional, List
+
+from pydantic import BaseModel, Field
+
+from app.core.logging import get_logger
+
+logger = get_logger("visual_preflight")
+
+# Identifiers inside an aes() expression such as "-log10(qvalue)"
+_IDENTIFIER_RE = re.compile(r"(?<![A-Za-z0-9._])[A-Za-z.][A-Za-z0-9._]*")
+_STRING_LITERAL_RE = re.compile(r"\"[^\"]*\"|'[^']*'")
+_NUMBER_RE = re.compile(r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$")
+
+# R symbols that are never data columns
+_R_CONSTANTS = {"TRUE", "FALSE", "T", "F", "NA", "NULL", "Inf", "NaN", "pi"}
+
+# Functions whose argument must be numeric
+_NUMERIC_FUNCS = {"log", "log2", "log10", "log1p", "exp", "abs", "sqrt", "round", "scale"}
+_ARITHMETIC_OPS = "+-*/^"
+
+# Computed aesthetics reference stat variables, not data columns
+_COMPUTED_AES_MARKERS = ("after_stat(", "after_scale(", "stage(", "stat(", "..")
+
+_SCHEMA_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+class PreflightIssue(BaseModel):
+    """A problem found before rendering"""
+    error_type: str = Field(..., description="Same vocabulary as ErrorAnalysis.error_type")
+    field: str = Field(..., description="Param or mapping that caused the issue")
+    message: str = Field(..., description="Human-readable description")
+
+
+class PreflightResult(BaseModel):
+    """Outcome of a pre-flight check"""
+    ok: bool = Field(default=True, description="Whether the request can be rendered")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Params with auto-fixes applied")
+    issues: List[PreflightIssue] = Field(default_factory=list, description="Unfixable problems")
+    fixes_applied: List[str] = Field(default_factory=list, description="Automatic fixes")
+    column_profile: Dict[str, str] = Field(default_factory=dict, description="Column name -> kind")
+
+    def error_details(self) -> Dict[str, Any]:
+        """Error details in the shape VisualService returns for failed runs"""
+        return {
+            "error_type": "preflight",
+            "error_message": "; ".join(issue.message for issue in self.issues),
+            "issues": [issue.model_dump() for issue in self.issues],
+        }
+
+
+class VisualPreflightService:
+    """Validate and auto-fix chart requests without running R."""
+
+    @staticmethod
+    def profile_columns(rows: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Classify every column of a record list.
+
+        Returns a mapping of column name to one of ``numeric``,
+        ``numeric_string`` (numbers sent as strings), ``boolean``, ``string``
+        or ``empty`` (only nulls).
+        """
+        seen: Dict[str, set] = {}
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            for col, val in row.items():
+                kinds = seen.setdefault(col, set())
+                if val is None:
+                    continue
+                if isinstance(val, bool):
+                    kinds.add("boolean")
+                elif isinstance(val, (int, float)):
+                    kinds.add("numeric")
+                elif isinstance(val, str) and _NUMBER_RE.match(val):
+                    kinds.add("numeric_string")
+                elif isinstance(val, str) and val.strip() in ("", "NA", "NaN"):
+                    continue
+                else:
+                    kinds.add("string")
+
+        profile = {}
+        for col, kinds in seen.items():
+            if not kinds:
+                profile[col] = "empty"
+            elif kinds == {"numeric"}:
+                profile[col] = "numeric"
+            elif kinds <= {"numeric", "numeric_string"}:
+                profile[col] = "numeric_string"
+            elif kinds == {"boolean"}:
+                profile[col] = "boolean"
+            else:
+                profile[col] = "string"
+        return profile
+
+    @staticmethod
+    def _resolve_column(name: str, profile: Dict[str, str]) -> Optional[str]:
+        """Exact match first, then a unique case-insensitive match"""
+        if name in profile:
+            return name
+        matches = [col for col in profile if col.lower() == name.lower()]
+        return matches[0] if len(matches) == 1 else None
+
+    @staticmethod
+    def _coerce_numeric(rows: List[Dict[str, Any]], column: str) -> None:
+        """Convert numeric strings of a column to numbers in place"""
+        for row in rows:
+            val = row.get(column)
+            if isinstance(val, str):
+                if _NUMBER_RE.match(val):
+                    num = float(val)
+                    row[column] = int(num) if num.is_integer() and "." not in val else num
+                else:
+                    row[column] = None
+
+    @staticmethod
+    def _mapping_columns(expr: str) -> List[str]:
+        """Column identifiers referenced by an aes() value"""
+        if any(marker in expr for marker in _COMPUTED_AES_MARKERS):
+            return []
+        # build_aes() strips whitespace and treats a plain value as one column
+        if not re.search(r"[()*/+\-]", expr):
+            name = re.sub(r"\s+", "", expr)
+            if not name or name in _R_CONSTANTS or _NUMBER_RE.match(name):
+                return []
+            return [name]
+        columns = []
+        expr = _STRING_LITERAL_RE.sub('""', expr)
+        for match in _IDENTIFIER_RE.finditer(expr):
+            token = match.group()
+            rest = expr[match.end():].lstrip()
+            # Function names (log10, abs, ...) are followed by "("
+            if rest.startswith("(") or token in _R_CONSTANTS or _NUMBER_RE.match(token):
+                continue
+            columns.append(token)
+        return columns
+
+    @staticmethod
+    def _needs_numeric(expr: str, column: str) -> bool:
+        """Whether a column is used in arithmetic or a numeric function"""
+        expr = _STRING_LITERAL_RE.sub('""', expr)
+        pattern = rf"(?<![A-Za-z0-9._]){re.escape(column)}(?![A-Za-z0-9._])"
+        for match in re.finditer(pattern, expr):
+            before = expr[: match.start()].rstrip()
+            after = expr[match.end():].lstrip()
+            if (before and before[-1] in _ARITHMETIC_OPS) or (
+                after and after[0] in _ARITHMETIC_OPS
+            ):
+                return True
+            if before.endswith("("):
+                func = re.search(r"([A-Za-z0-9._]+)$", before[:-1].rstrip())
+                if func and func.group(1) in _NUMERIC_FUNCS:
+                    return True
+        return False
+
+    @staticmethod
+    def _check_mapping(
+        mapping: Dict[str, Any],
+        where: str,
+        rows: List[Dict[str, Any]],
+        profile: Dict[str, str],
+        result: PreflightResult,
+    ) -> None:
+        """Validate one aes() mapping, fixing column names and types in place"""
+        for aes_name, expr in list(mapping.items()):
+            if not isinstance(expr, str):
+                continue
+            field = f"{where}.{aes_name}"
+            is_expression = bool(re.search(r"[()*/+\-]", expr))
+            new_expr = expr
+            for column in VisualPreflightService._mapping_columns(expr):
+                resolved = VisualPreflightService._resolve_column(column, profile)
+                if resolved is None:
+                    result.issues.append(
+                        PreflightIssue(
+                            error_type="missing_column",
+                            field=field,
+                            message=f"Column '{column}' used in {field} not found in data "
+                            f"(available: {', '.join(profile)})",
+                        )
+                    )
+                    continue
+                if resolved != column and not is_expression:
+                    new_expr = resolved
+                    result.fixes_applied.append(
+                        f"{field}: renamed column '{column}' to '{resolved}'"
+                    )
+                elif resolved != column:
+                    new_expr = re.sub(
+                        rf"(?<![A-Za-z0-9._]){re.escape(column)}(?![A-Za-z0-9._])",
+                        resolved,
+                        new_expr,
+                    )
+                    result.fixes_applied.append(
+                        f"{field}: renamed column '{column}' to '{resolved}'"
+                    )
+                # Arithmetic and numeric functions need numbers
+                if is_expression and VisualPreflightService._needs_numeric(
+                    new_expr, resolved
+                ):
+                    column_type = profile[resolved]
+                    if column_type == "numeric_string":
+                        VisualPreflightService._coerce_numeric(rows, resolved)
+                        profile[resolved] = "numeric"
+                        result.fixes_applied.append(
+                            f"{field}: converted column '{resolved}' to numeric"
+                        )
+                    elif column_type in ("string", "boolean"):
+                        result.issues.append(
+                            PreflightIssue(
+                                error_type="type_mismatch",
+                                field=field,
+                                message=f"Column '{resolved}' in expression '{expr}' "
+                                f"must be numeric but is {column_type}",
+                            )
+                        )
+            mapping[aes_name] = new_expr
+
+    @staticmethod
+    def _check_schema(
+        params: Dict[str, Any],
+        schema: Dict[str, Any],
+        profile: Optional[Dict[str, str]],
+        result: PreflightResult,
+    ) -> None:
+        """Validate params against a tool's params_schema"""
+        for name, spec in schema.items():
+            if not isinstance(spec, dict) or name == "data":
+                continue
+            types = spec.get("type")
+            types = types if isinstance(types, list) else [types] if types else []
+            value = params.get(name)
+
+            if value is None:
+                if spec.get("required") and "null" not in types:
+                    result.issues.append(
+                        PreflightIssue(
+                            error_type="config_error",
+                            field=name,
+                            message=f"Required parameter '{name}' is missing",
+                        )
+                    )
+                continue
+
+            # Numbers sent as strings
+            if (
+                isinstance(value, str)
+                and ({"number", "integer"} & set(types))
+                and "string" not in types
+                and _NUMBER_RE.match(value)
+            ):
+                num = float(value)
+                params[name] = int(num) if "integer" in types and num.is_integer() else num
+                result.fixes_applied.append(f"{name}: converted '{value}' to a number")
+                value = params[name]
+
+            # Integral floats for integer params (e.g. width: 800.0)
+            if (
+                isinstance(value, float)
+                and "integer" in types
+                and "number" not in types
+                and value.is_integer()
+            ):
+                params[name] = int(value)
+                result.fixes_applied.append(f"{name}: converted {value} to an integer")
+                value = params[name]
+
+            expected = tuple(
+                t for type_name in types for t in _SCHEMA_TYPES.get(type_name, ())
+            )
+            if expected and (
+                not isinstance(value, expected)
+                or (isinstance(value, bool) and bool not in expected)
+            ):
+                result.issues.append(
+                    PreflightIssue(
+                        error_type="type_mismatch",
+                        field=name,
+                        message=f"Parameter '{name}' should be {'/'.join(types)}, "
+                        f"got {type(value).__name__}",
+                    )
+                )
+                continue
+
+            # *_col params name a data column
+            if profile and name.endswith("_col") and isinstance(value, str):
+                resolved = VisualPreflightService._resolve_column(value, profile)
+                if resolved is None:
+                    result.issues.append(
+                        PreflightIssue(
+                            error_type="missing_column",
+                            field=name,
+                            message=f"Column '{value}' for '{name}' not found in data "
+                            f"(available: {', '.join(profile)})",
+                        )
+                    )
+                elif resolved != value:
+                    params[name] = resolved
+                    result.fixes_applied.append(
+                        f"{name}: renamed column '{value}' to '{resolved}'"
+                    )
+
+    @staticmethod
+    def _check_ggplot2(
+        cfg: Dict[str, Any],
+        rows: List[Dict[str, Any]],
+        profile: Dict[str, str],
+        result: PreflightResult,
+    ) -> None:
+        """Validate global and per-layer aes() mappings"""
+        if isinstance(cfg.get("mapping"), dict):
+            VisualPreflightService._check_mapping(
+                cfg["mapping"], "ggplot2.mapping", rows, profile, result
+            )
+        for index, layer in enumerate(cfg.get("layers") or []):
+            if not isinstance(layer, dict) or not isinstance(layer.get("mapping"), dict):
+                continue
+            # Layers with their own data do not use the main table
+            if "data" in (layer.get("arguments") or {}):
+                continue
+            VisualPreflightService._check_mapping(
+                layer["mapping"],
+                f"ggplot2.layers[{index}].{layer.get('type', 'layer')}.mapping",
+                rows,
+                profile,
+                result,
+            )
+
+    @staticmethod
+    def _check_heatmap(
+        cfg: Dict[str, Any],
+        rows: List[Dict[str, Any]],
+        profile: Dict[str, str],
+        result: PreflightResult,
+    ) -> None:
+        """Validate the heatmap matrix: a row-name column plus numeric values"""
+        transform = cfg.get("transform") or {}
+        rownames = transform.get("rownames")
+        if isinstance(rownames, str):
+            resolved = VisualPreflightService._resolve_column(rownames, profile)
+            if resolved is None:
+                result.issues.append(
+                    PreflightIssue(
+                        error_type="missing_column",
+                        field="heatmap.transform.rownames",
+                        message=f"Row name column '{rownames}' not found in matrix data",
+                    )
+                )
+                return
+            if resolved != rownames:
+                transform["rownames"] = resolved
+                result.fixes_applied.append(
+                    f"heatmap.transform.rownames: renamed column '{rownames}' to '{resolved}'"
+                )
+            rownames = resolved
+
+        for column, column_type in profile.items():
+            if column != rownames and column_type == "numeric_string":
+                VisualPreflightService._coerce_numeric(rows, column)
+                profile[column] = "numeric"
+                result.fixes_applied.append(
+                    f"heatmap: converted column '{column}' to numeric"
+                )
+
+    @staticmethod
+    def _copy_for_fixes(params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copy the parts of ``params`` that the checks rewrite: top-level
+        params, aes() mappings and the heatmap transform. ``data`` is
+        shared; ``validate`` copies the rows itself before coercing them.
+        """
+        fixed = dict(params)
+        cfg = fixed.get("ggplot2")
+        if isinstance(cfg, dict):
+            cfg = fixed["ggplot2"] = dict(cfg)
+            if isinstance(cfg.get("mapping"), dict):
+                cfg["mapping"] = dict(cfg["mapping"])
+            if isinstance(cfg.get("layers"), list):
+                cfg["layers"] = [
+                    {**layer, "mapping": dict(layer["mapping"])}
+                    if isinstance(layer, dict) and isinstance(layer.get("mapping"), dict)
+                    else layer
+                    for layer in cfg["layers"]
+                ]
+        cfg = fixed.get("heatmap")
+        if isinstance(cfg, dict):
+            cfg = fixed["heatmap"] = dict(cfg)
+            if isinstance(cfg.get("transform"), dict):
+                cfg["transform"] = dict(cfg["transform"])
+        return fixed
+
+    @staticmethod
+    def validate(
+        params: Dict[str, Any],
+        params_schema: Optional[Dict[str, Any]] = None,
+        check_mappings: bool = True,
+    ) -> PreflightResult:
+        """
+        Validate a chart request before rendering.
+
+        Args:
+            params: Chart params as passed to VisualService.run_tool (``data``
+                still in-memory, ``ggplot2``/``heatmap`` config, tool params)
+            params_schema: The tool's params_schema from meta.json
+            check_mappings: Validate ggplot2 aes() mappings against the data.
+                Disable for tools with their own plot.R, which may derive
+                extra columns before building the plot.
+
+        Returns:
+            PreflightResult whose ``params`` is a fixed copy of the input
+        """
+        result = PreflightResult(params=VisualPreflightService._copy_for_fixes(params))
+        fixed = result.params
+        data = fixed.get("data")
+
+        # Locate the table the chart config refers to
+        rows: Optional[List[Dict[str, Any]]] = None
+        if isinstance(data, list) and data and isinstance(data[0], dict):
+            rows = data
+        elif isinstance(data, dict) and isinstance(data.get("matrix"), list):
+            rows = data["matrix"]
+        profile = VisualPreflightService.profile_columns(rows) if rows else None
+
+        # Numeric strings may be coerced in place: only then copy the rows,
+        # so the caller's data is never modified
+        if profile and "numeric_string" in profile.values():
+            rows = [dict(row) if isinstance(row, dict) else row for row in rows]
+            if isinstance(data, list):
+                data = fixed["data"] = rows
+            else:
+                data = fixed["data"] = {**data, "matrix": rows}
+
+        if params_schema:
+            VisualPreflightService._check_schema(fixed, params_schema, profile, result)
+
+        if profile is not None:
+            if (
+                check_mappings
+                and isinstance(fixed.get("ggplot2"), dict)
+                and isinstance(data, list)
+            ):
+                VisualPreflightService._check_ggplot2(
+                    fixed["ggplot2"], rows, profile, result
+                )
+            if isinstance(fixed.get("heatmap"), dict):
+                VisualPreflightService._check_heatmap(
+                    fixed["heatmap"], rows, profile, result
+                )
+
+        result.ok = not result.issues
+        result.column_profile = profile or {}
+        if result.fixes_applied:
+            logger.info(f"Pre-flight fixes: {result.fixes_applied}")
+        if result.issues:
+            logger.info(
+                f"Pre-flight rejected request: {[i.message for i in result.issues]}"
+            )
+        return result
@@ -0,0 +1,127 @@
+"""
+Result contract for analysis modules.
+
+``run_analysis`` in a module under scripts/analysis returns an
+``AnalysisResult``: the rows as a ``pyarrow.Table`` plus a JSON-able metadata
+dict (gene, cancer type, sample counts...). The table travels unchanged from
+the worker process (Arrow IPC) through the result cache (Parquet) to the
+chart input file (Arrow IPC file read by the R plot script). JSON rows are
+only built when the API response needs them.
+
+Modules that still return the older shapes (a records list, a JSON string
+or a dict with a ``data`` entry) are converted by ``AnalysisResult.coerce``.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Schema metadata key holding the result metadata
+METADATA_KEY = b"analysis_metadata"
+
+
+def _frame_to_table(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns: keep them as text
+        mixed = {c: str for c in df.columns if df[c].dtype == object}
+        return pa.Table.from_pandas(df.astype(mixed), preserve_index=False)
+
+
+@dataclass
+class AnalysisResult:
+    table: pa.Table
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    _rows: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+
+    @staticmethod
+    def from_frame(df: pd.DataFrame, **metadata: Any) -> "AnalysisResult":
+        return AnalysisResult(_frame_to_table(df), metadata)
+
+    @staticmethod
+    def coerce(result: Any) -> "AnalysisResult":
+        """
+        Convert whatever a module's run_analysis returned.
+
+        Raises:
+            ValueError: If the module reported an error or the shape is unknown
+        """
+        if isinstance(result, AnalysisResult):
+            return result
+        if isinstance(result, pa.Table):
+            return AnalysisResult(result)
+
+        if isinstance(result, str):
+            # 如果是字符串，尝试解析为 JSON
+            try:
+                result = orjson.loads(result)
+            except orjson.JSONDecodeError:
+                # 如果无法解析，可能是错误消息
+                raise ValueError(f"Analysis returned error: {result}")
+
+        metadata: Dict[str, Any] = {}
+        if isinstance(result, dict):
+            # 如果是字典，检查是否有错误
+            if "error" in result:
+                raise ValueError(result.get("error", "Analysis failed"))
+            if result.get("data"):
+                metadata = {k: v for k, v in result.items() if k != "data"}
+                result = result["data"]
+                if isinstance(result, str):
+                    result = orjson.loads(result)
+        elif result is None:
+            result = []
+        elif not isinstance(result, list):
+            result = [result]
+
+        if isinstance(result, list):
+            return AnalysisResult.from_frame(pd.DataFrame(result), **metadata)
+        if isinstance(result, dict):
+            return AnalysisResult.from_frame(pd.DataFrame([result]), **metadata)
+        raise ValueError(f"Unsupported data format: {type(result)}")
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Records for the JSON response (built on first use)"""
+        if self._rows is None:
+            self._rows = self.table.to_pylist()
+        return self._rows
+
+    def to_table(self) -> pa.Table:
+        """The table with the metadata embedded in its schema"""
+        schema_metadata = dict(self.table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = orjson.dumps(self.metadata, default=str)
+        return self.table.replace_schema_metadata(schema_metadata)
+
+    @staticmethod
+    def from_table(table: pa.Table) -> "AnalysisResult":
+        """Inverse of to_table"""
+        schema_metadata = dict(table.schema.metadata or {})
+        metadata = orjson.loads(schema_metadata.pop(METADATA_KEY, b"{}"))
+        return AnalysisResult(
+            table.replace_schema_metadata(schema_metadata or None), metadata
+        )
+
+    def to_ipc(self) -> bytes:
+        table = self.to_table()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def from_ipc(data: bytes) -> "AnalysisResult":
+        return AnalysisResult.from_table(pa.ipc.open_stream(data).read_all())
+
+    def write_chart_input(self, path: Path) -> None:
+        """Write the rows as the Arrow IPC file the plot script reads"""
+        feather.write_feather(self.table, str(path), compression="uncompressed")
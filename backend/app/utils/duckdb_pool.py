@@ -0,0 +1,141 @@
+"""
+Process-wide DuckDB connections for the analysis scripts.
+
+The TCGA loaders used to open a connection (or the implicit global one) for
+every query and read Parquet files by path, so each call re-read file
+footers and could only be parameterised through f-strings. This module keeps
+a single in-memory database with a cursor per worker thread. Each Parquet
+file is registered once as a view in the shared catalog, and queries run with
+bound parameters.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("duckdb_pool")
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a column or table name for interpolation into SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def select_list(columns: Optional[Iterable[str]]) -> str:
+    """``*`` or a quoted column list"""
+    if not columns:
+        return "*"
+    columns = list(columns)
+    if columns == ["*"]:
+        return "*"
+    return ", ".join(quote_identifier(c) for c in columns)
+
+
+class DuckDBPool:
+    """Shared DuckDB database with one cursor per thread and cached Parquet views."""
+
+    _database: Optional[duckdb.DuckDBPyConnection] = None
+    _local = threading.local()
+    _lock = threading.Lock()
+    # resolved path -> (quoted view name, (mtime_ns, size)) at registration
+    _views: Dict[str, Tuple[str, Tuple[int, int]]] = {}
+    _generation: int = 0
+
+    @staticmethod
+    def _open() -> duckdb.DuckDBPyConnection:
+        con = duckdb.connect(":memory:")
+        con.execute(
+            "SET memory_limit = ?", [settings.analysis_duckdb_memory_limit]
+        )
+        con.execute("SET threads = ?", [int(settings.analysis_duckdb_threads)])
+        # Keep Parquet footers and row group statistics across queries
+        con.execute("SET parquet_metadata_cache = true")
+        logger.info(
+            f"Opened DuckDB pool (memory_limit={settings.analysis_duckdb_memory_limit}, "
+            f"threads={settings.analysis_duckdb_threads})"
+        )
+        return con
+
+    @staticmethod
+    def _root() -> duckdb.DuckDBPyConnection:
+        if DuckDBPool._database is None:
+            with DuckDBPool._lock:
+                if DuckDBPool._database is None:
+                    DuckDBPool._database = DuckDBPool._open()
+        return DuckDBPool._database
+
+    @staticmethod
+    def cursor() -> duckdb.DuckDBPyConnection:
+        """This thread's cursor on the shared database"""
+        local = DuckDBPool._local
+        if (
+            getattr(local, "cursor", None) is None
+            or local.generation != DuckDBPool._generation
+        ):
+            root = DuckDBPool._root()
+            with DuckDBPool._lock:
+                local.cursor = root.cursor()
+                local.generation = DuckDBPool._generation
+        return local.cursor
+
+    @staticmethod
+    def view(path: Path) -> str:
+        """
+        Name of a view over a Parquet file, registering it on first use.
+
+        The view is replaced when the file's mtime or size changes, so
+        regenerated data files are picked up without a restart.
+        """
+        resolved = str(Path(path).resolve())
+        stat = Path(resolved).stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = DuckDBPool._views.get(resolved)
+        if cached is not None and cached[1] == signature:
+            return cached[0]
+
+        name = quote_identifier(
+            "pq_" + hashlib.sha1(resolved.encode()).hexdigest()[:16]
+        )
+        root = DuckDBPool._root()
+        with DuckDBPool._lock:
+            cached = DuckDBPool._views.get(resolved)
+            if cached is None or cached[1] != signature:
+                literal = "'" + resolved.replace("'", "''") + "'"
+                cursor = root.cursor()
+                try:
+                    cursor.execute(
+                        f"CREATE OR REPLACE VIEW {name} AS "
+                        f"SELECT * FROM read_parquet({literal})"
+                    )
+                finally:
+                    cursor.close()
+                DuckDBPool._views[resolved] = (name, signature)
+        return name
+
+    @staticmethod
+    def query_df(sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        """Run a statement with bound ``?`` parameters and return a DataFrame"""
+        return DuckDBPool.cursor().execute(sql, list(params)).df()
+
+    @staticmethod
+    def query_arrow(sql: str, params: Sequence[Any] = ()) -> pa.Table:
+        """Run a statement with bound ``?`` parameters and return an Arrow table"""
+        return DuckDBPool.cursor().execute(sql, list(params)).to_arrow_table()
+
+    @staticmethod
+    def close() -> None:
+        """Close the shared database; threads reconnect lazily"""
+        with DuckDBPool._lock:
+            if DuckDBPool._database is not None:
+                DuckDBPool._database.close()
+            DuckDBPool._database = None
+            DuckDBPool._views.clear()
+            DuckDBPool._generation += 1
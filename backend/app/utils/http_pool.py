@@ -0,0 +1,167 @@
+"""
+Process-wide pooled HTTP clients for LLM providers.
+
+Every ``get_llm`` call used to build a fresh ChatOpenAI / ChatAnthropic /
+ChatOllama instance with its own HTTP client, so TLS handshakes and TCP
+setup were repeated per agent and per message. This module keeps one
+keep-alive connection pool per (provider, base_url) and records how often
+connections are actually reused.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("http_pool")
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package"""
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+@dataclass
+class PoolStats:
+    """Connection reuse counters for one pool"""
+
+    provider: str
+    base_url: str
+    http2: bool = False
+    requests: int = 0
+    connections_opened: int = 0
+    tls_handshakes: int = 0
+    errors: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "provider": self.provider,
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "errors": self.errors,
+            "reused_requests": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+class _MeteredTransport(httpx.AsyncHTTPTransport):
+    """AsyncHTTPTransport that counts requests and new connections"""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._stats.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self._stats.tls_handshakes += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.requests += 1
+        request.extensions = {**request.extensions, "trace": self._trace}
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self._stats.errors += 1
+            raise
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Handle on a pooled transport for a client we don't own. Closing that
+    client must not close the pool for every other instance.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass  # The pool is closed by HTTPClientPool.aclose_all
+
+
+class HTTPClientPool:
+    """Registry of pooled async HTTP clients keyed by (provider, base_url)."""
+
+    _clients: Dict[Tuple[str, str], httpx.AsyncClient] = {}
+    _transports: Dict[Tuple[str, str], _MeteredTransport] = {}
+    _stats: Dict[Tuple[str, str], PoolStats] = {}
+
+    @staticmethod
+    def _create(provider: str, base_url: str) -> None:
+        key = (provider, base_url)
+        http2 = settings.llm_http2 and _http2_available()
+        stats = PoolStats(provider=provider, base_url=base_url, http2=http2)
+        transport = _MeteredTransport(
+            stats,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_keepalive,
+                keepalive_expiry=settings.llm_http_keepalive_expiry,
+            ),
+            retries=1,  # retry failed connects, not requests
+        )
+        client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(settings.llm_http_timeout, connect=5.0),
+            follow_redirects=True,
+        )
+        HTTPClientPool._clients[key] = client
+        HTTPClientPool._transports[key] = transport
+        HTTPClientPool._stats[key] = stats
+        logger.info(
+            f"Created LLM HTTP pool for {provider} ({base_url}), http2={http2}"
+        )
+
+    @staticmethod
+    def _ensure(provider: str, base_url: Optional[str]) -> Tuple[str, str]:
+        key = (provider, (base_url or "").rstrip("/"))
+        client = HTTPClientPool._clients.get(key)
+        if client is None or client.is_closed:
+            HTTPClientPool._create(*key)
+        return key
+
+    @staticmethod
+    def get_async_client(provider: str, base_url: Optional[str]) -> httpx.AsyncClient:
+        """Shared AsyncClient for a provider endpoint (OpenAI-compatible, Anthropic)"""
+        return HTTPClientPool._clients[HTTPClientPool._ensure(provider, base_url)]
+
+    @staticmethod
+    def get_async_transport(
+        provider: str, base_url: Optional[str]
+    ) -> httpx.AsyncHTTPTransport:
+        """Shared transport, for SDKs that build their own AsyncClient (Ollama)"""
+        return _SharedTransport(
+            HTTPClientPool._transports[HTTPClientPool._ensure(provider, base_url)]
+        )
+
+    @staticmethod
+    def stats() -> List[Dict[str, Any]]:
+        """Connection reuse metrics for every pool"""
+        return [stats.to_dict() for stats in HTTPClientPool._stats.values()]
+
+    @staticmethod
+    async def aclose_all() -> None:
+        """Close all pooled connections (application shutdown)"""
+        for client in HTTPClientPool._clients.values():
+            if not client.is_closed:
+                await client.aclose()
+        HTTPClientPool._clients.clear()
+        HTTPClientPool._transports.clear()
+        HTTPClientPool._stats.clear()
@@ -0,0 +1,352 @@
+"""
+Response cache for repeated LLM calls.
+
+Title generation, error recovery for recurring error signatures and answers
+to common knowledge questions are often sent verbatim more than once.
+``CachedChatModel`` sits in front of the model returned by ``get_llm`` and
+serves those calls from ``LLMResponseCache``:
+
+- exact match: key is a hash of model parameters, prompt messages and call
+  options
+- semantic match (opt-in per call): prompts that differ only in the user's
+  text are matched when the embedding similarity of that text passes
+  ``settings.llm_cache_semantic_threshold``
+
+Entries expire after a TTL and the cache is LRU-bounded. Calls are not
+cached unless the call site opts in through the run config (the default is
+``settings.llm_cache_default_mode``, "off"), e.g.::
+
+    await chain.ainvoke(inputs, config=cache_config("exact"))
+    await llm.ainvoke(messages, config=cache_config("semantic", query=text))
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.utils.llm_wrapper import DelegatingChatModel
+
+logger = get_logger("llm_cache")
+
+CACHE_MODES = ("off", "exact", "semantic")
+
+
+def cache_config(
+    mode: str = "exact", query: Optional[str] = None, ttl: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run config selecting the cache mode for one call.
+
+    Args:
+        mode: "off", "exact" or "semantic"
+        query: Text compared by embedding in semantic mode (usually the raw
+            user message rather than the whole formatted prompt)
+        ttl: Per-call TTL in seconds, defaults to settings.llm_cache_ttl
+    """
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unsupported cache mode: {mode}")
+    metadata: Dict[str, Any] = {"llm_cache": mode}
+    if query is not None:
+        metadata["llm_cache_query"] = query
+    if ttl is not None:
+        metadata["llm_cache_ttl"] = ttl
+    return {"metadata": metadata}
+
+
+def _digest(payload: Any) -> str:
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _serialize_messages(messages: Sequence[BaseMessage]) -> List[List[Any]]:
+    return [[message.type, message.content] for message in messages]
+
+
+@dataclass
+class _Entry:
+    result: ChatResult
+    expires_at: float
+    group: str
+    embedding: Optional[np.ndarray] = None
+    hits: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class LLMResponseCache:
+    """Process-wide TTL + LRU cache of chat results."""
+
+    _entries: "OrderedDict[str, _Entry]" = OrderedDict()
+    _embedder: Optional[Callable[[str], Sequence[float]]] = None
+    _stats: Dict[str, int] = {
+        "hits": 0,
+        "semantic_hits": 0,
+        "misses": 0,
+        "stores": 0,
+        "evictions": 0,
+        "expired": 0,
+    }
+
+    @staticmethod
+    def set_embedder(embedder: Optional[Callable[[str], Sequence[float]]]) -> None:
+        """Register a text -> vector function used for semantic matching"""
+        LLMResponseCache._embedder = embedder
+
+    @staticmethod
+    async def embed(text: Optional[str]) -> Optional[np.ndarray]:
+        embedder = LLMResponseCache._embedder
+        if embedder is None or not text:
+            return None
+        try:
+            vector = np.asarray(
+                await asyncio.to_thread(embedder, text), dtype=np.float32
+            )
+        except Exception as e:
+            logger.warning(f"Embedding for semantic cache failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def _expire(now: float) -> None:
+        expired = [k for k, e in LLMResponseCache._entries.items() if e.expires_at <= now]
+        for key in expired:
+            del LLMResponseCache._entries[key]
+        LLMResponseCache._stats["expired"] += len(expired)
+
+    @staticmethod
+    def get(
+        key: str, group: str, embedding: Optional[np.ndarray] = None
+    ) -> Optional[ChatResult]:
+        """Exact lookup by key; semantic lookup within ``group`` if an embedding is given"""
+        now = time.monotonic()
+        entries = LLMResponseCache._entries
+        entry = entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            del entries[key]
+            LLMResponseCache._stats["expired"] += 1
+            entry = None
+
+        if entry is None and embedding is not None:
+            LLMResponseCache._expire(now)
+            best_key, best_score = None, settings.llm_cache_semantic_threshold
+            for candidate_key, candidate in entries.items():
+                if candidate.group != group or candidate.embedding is None:
+                    continue
+                score = float(np.dot(candidate.embedding, embedding))
+                if score >= best_score:
+                    best_key, best_score = candidate_key, score
+            if best_key is not None:
+                key, entry = best_key, entries[best_key]
+                LLMResponseCache._stats["semantic_hits"] += 1
+
+        if entry is None:
+            LLMResponseCache._stats["misses"] += 1
+            return None
+
+        entries.move_to_end(key)
+        entry.hits += 1
+        LLMResponseCache._stats["hits"] += 1
+        return entry.result.model_copy(deep=True)
+
+    @staticmethod
+    def put(
+        key: str,
+        group: str,
+        result: ChatResult,
+        ttl: Optional[float] = None,
+        embedding: Optional[np.ndarray] = None,
+    ) -> None:
+        ttl = settings.llm_cache_ttl if ttl is None else ttl
+        if ttl <= 0 or settings.llm_cache_max_entries <= 0:
+            return
+        entries = LLMResponseCache._entries
+        entries[key] = _Entry(
+            result=result.model_copy(deep=True),
+            expires_at=time.monotonic() + ttl,
+            group=group,
+            embedding=embedding,
+        )
+        entries.move_to_end(key)
+        LLMResponseCache._stats["stores"] += 1
+        while len(entries) > settings.llm_cache_max_entries:
+            entries.popitem(last=False)
+            LLMResponseCache._stats["evictions"] += 1
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        lookups = LLMResponseCache._stats["hits"] + LLMResponseCache._stats["misses"]
+        return {
+            **LLMResponseCache._stats,
+            "entries": len(LLMResponseCache._entries),
+            "max_entries": settings.llm_cache_max_entries,
+            "semantic_enabled": LLMResponseCache._embedder is not None,
+            "hit_ratio": (
+                round(LLMResponseCache._stats["hits"] / lookups, 4) if lookups else 0.0
+            ),
+        }
+
+    @staticmethod
+    def clear() -> None:
+        LLMResponseCache._entries.clear()
+        for name in LLMResponseCache._stats:
+            LLMResponseCache._stats[name] = 0
+
+
+class CachedChatModel(DelegatingChatModel):
+    """Chat model wrapper that serves repeated prompts from LLMResponseCache."""
+
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.inner._llm_type}"
+
+    def _policy(self, run_manager) -> Dict[str, Any]:
+        return self._policy_from(getattr(run_manager, "metadata", None) or {})
+
+    @staticmethod
+    def _policy_from(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        mode = metadata.get("llm_cache", settings.llm_cache_default_mode)
+        if not settings.llm_cache_enabled or mode not in CACHE_MODES:
+            mode = "off"
+        return {
+            "mode": mode,
+            "query": metadata.get("llm_cache_query"),
+            "ttl": metadata.get("llm_cache_ttl"),
+        }
+
+    def _keys(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        kwargs: Dict[str, Any],
+        query: Optional[str],
+    ) -> tuple:
+        params = {
+            "llm_type": self.inner._llm_type,
+            **self.inner._identifying_params,
+            "stop": stop,
+            **kwargs,
+        }
+        serialized = _serialize_messages(messages)
+        key = _digest([params, serialized])
+        # Semantic matches must share everything except the user's text
+        if query:
+            serialized = [
+                [kind, content.replace(query, "") if isinstance(content, str) else content]
+                for kind, content in serialized
+            ]
+        else:
+            serialized = serialized[:-1]
+        return key, _digest([params, serialized])
+
+    async def _lookup(self, policy, messages, stop, kwargs):
+        key, group = self._keys(messages, stop, kwargs, policy["query"])
+        embedding = None
+        if policy["mode"] == "semantic":
+            text = policy["query"]
+            if text is None and messages and isinstance(messages[-1].content, str):
+                text = messages[-1].content
+            embedding = await LLMResponseCache.embed(text)
+        return key, group, embedding, LLMResponseCache.get(key, group, embedding)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Sync calls are not used by the agents; pass straight through
+        return self.inner._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        policy = self._policy(run_manager)
+        if policy["mode"] == "off":
+            return await self.inner._agenerate(messages, stop=stop, **kwargs)
+
+        key, group, embedding, cached = await self._lookup(
+            policy, messages, stop, kwargs
+        )
+        if cached is not None:
+            return cached
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        LLMResponseCache.put(key, group, result, policy["ttl"], embedding)
+        return result
+
+    async def astream(
+        self,
+        input: LanguageModelInput,
+        config: Optional[RunnableConfig] = None,
+        *,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[AIMessageChunk]:
+        # _astream gets no run manager, so hand it the policy from the config
+        metadata = ensure_config(config).get("metadata") or {}
+        async for chunk in super().astream(
+            input,
+            config,
+            stop=stop,
+            _llm_cache_policy=self._policy_from(metadata),
+            **kwargs,
+        ):
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        policy = kwargs.pop("_llm_cache_policy", None) or self._policy(run_manager)
+        key = group = embedding = None
+        if policy["mode"] != "off":
+            key, group, embedding, cached = await self._lookup(
+                policy, messages, stop, kwargs
+            )
+            if cached is not None:
+                # Replay the whole answer as a single chunk
+                chunk = ChatGenerationChunk(
+                    message=AIMessageChunk(content=cached.generations[0].message.content)
+                )
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                return
+
+        parts: List[str] = []
+        async for chunk in self.inner._astream(messages, stop=stop, **kwargs):
+            if isinstance(chunk.message.content, str):
+                parts.append(chunk.message.content)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+        if key is not None and parts:
+            result = ChatResult(
+                generations=[ChatGeneration(message=AIMessage(content="".join(parts)))]
+            )
+            LLMResponseCache.put(key, group, result, policy["ttl"], embedding)
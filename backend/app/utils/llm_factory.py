@@ -9,6 +9,9 @@ from langchain_core.language_models.chat_models import BaseChatModel
 
 from app.core.logging import get_logger
 from app.core.config import settings
+from app.utils.http_pool import HTTPClientPool
+from app.utils.llm_cache import CachedChatModel
+from app.utils.llm_scheduler import ScheduledChatModel
 
 logger = get_logger("llm_factory")
 
@@ -100,6 +103,8 @@ def get_llm(
             base_url = settings.deepseek_base_url
         elif source == "Qwen":
             base_url = settings.qwen_base_url
+        elif source == "Ollama":
+            base_url = settings.ollama_base_url
         else:
             base_url = settings.llm_base_url
 
@@ -145,6 +150,28 @@ def get_llm(
                 # Default to DeepSeek if no pattern matches
                 source = "DeepSeek"
 
+    llm = _create_llm(source, model, temperature, base_url, api_key, max_tokens)
+    if llm is not None and settings.llm_scheduler_enabled:
+        # Rate limits, concurrency, retries and hedging are coordinated per provider
+        llm = ScheduledChatModel(inner=llm, provider=source)
+    if llm is not None and settings.llm_cache_enabled:
+        # Repeated prompts are answered from the cache without scheduling a request
+        llm = CachedChatModel(inner=llm)
+    return llm
+
+
+def _create_llm(
+    source: str,
+    model: str,
+    temperature: float,
+    base_url: Optional[str],
+    api_key: Optional[str],
+    max_tokens: Optional[int],
+) -> Optional[BaseChatModel]:
+    """Instantiate the chat model for a resolved source"""
+    # The SDKs' own retries would multiply with LLMScheduler's
+    max_retries = 0 if settings.llm_scheduler_enabled else 2
+
     # Create appropriate model based on source
     try:
         if source == "OpenAI":
@@ -156,6 +183,10 @@ def get_llm(
                 temperature=temperature,
                 api_key=openai_api_key,
                 max_tokens=max_tokens or 4000,
+                max_retries=max_retries,
+                http_async_client=HTTPClientPool.get_async_client(
+                    source, "https://api.openai.com/v1"
+                ),
             )
 
         elif source == "Anthropic":
@@ -164,12 +195,15 @@ def get_llm(
             anthropic_api_key = (
                 api_key if api_key != "EMPTY" else settings.anthropic_api_key
             )
-            return ChatAnthropic(
+            llm = ChatAnthropic(
                 model=model,
                 temperature=temperature,
                 max_tokens=max_tokens or 8192,
                 api_key=anthropic_api_key,
+                max_retries=max_retries,
             )
+            _use_pooled_anthropic_client(llm)
+            return llm
 
         elif source == "Gemini":
             from langchain_openai import ChatOpenAI
@@ -180,14 +214,31 @@ def get_llm(
                 temperature=temperature,
                 api_key=gemini_api_key,
                 base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+                max_retries=max_retries,
+                http_async_client=HTTPClientPool.get_async_client(
+                    source, "https://generativelanguage.googleapis.com/v1beta/openai/"
+                ),
             )
 
         elif source == "Ollama":
             from langchain_ollama import ChatOllama
 
+            # The generic default applies when the source was auto-detected
+            ollama_base_url = (
+                base_url
+                if base_url and base_url != settings.llm_base_url
+                else settings.ollama_base_url
+            )
+            # ollama builds its own AsyncClient, so share the transport (and pool)
             return ChatOllama(
                 model=model,
                 temperature=temperature,
+                base_url=ollama_base_url,
+                async_client_kwargs={
+                    "transport": HTTPClientPool.get_async_transport(
+                        source, ollama_base_url
+                    )
+                },
             )
 
         elif source == "Qwen":
@@ -226,6 +277,10 @@ def get_llm(
                 api_key=qwen_api_key,
                 base_url=qwen_base_url,
                 max_tokens=max_tokens or 8192,
+                max_retries=max_retries,
+                http_async_client=HTTPClientPool.get_async_client(
+                    source, qwen_base_url
+                ),
             )
 
         elif source == "DeepSeek":
@@ -264,6 +319,10 @@ def get_llm(
                 api_key=deepseek_api_key,
                 base_url=deepseek_base_url,
                 max_tokens=max_tokens or 8192,
+                max_retries=max_retries,
+                http_async_client=HTTPClientPool.get_async_client(
+                    source, deepseek_base_url
+                ),
             )
 
         elif source == "Custom":
@@ -281,6 +340,8 @@ def get_llm(
                 api_key=custom_api_key,
                 base_url=base_url,
                 max_tokens=max_tokens or 8192,
+                max_retries=max_retries,
+                http_async_client=HTTPClientPool.get_async_client(source, base_url),
             )
 
         else:
@@ -294,6 +355,34 @@ def get_llm(
         return None
 
 
+def _use_pooled_anthropic_client(llm: BaseChatModel) -> None:
+    """
+    Point a ChatAnthropic instance at the shared connection pool.
+
+    ChatAnthropic has no http_async_client field; its async SDK client is a
+    cached property, so we prime that cache with a client built on the pool.
+    """
+    import httpx
+    import anthropic
+
+    # Newer SDKs ship their own httpx fork and reject httpx clients; those
+    # already share one cached client per base_url inside langchain-anthropic.
+    if not issubclass(anthropic.DefaultAsyncHttpxClient, httpx.AsyncClient):
+        logger.debug("Anthropic SDK does not use httpx; keeping its cached client")
+        return
+
+    try:
+        client_params = llm._client_params
+        llm.__dict__["_async_client"] = anthropic.AsyncClient(
+            **client_params,
+            http_client=HTTPClientPool.get_async_client(
+                "Anthropic", client_params.get("base_url")
+            ),
+        )
+    except Exception as e:
+        logger.warning(f"Could not attach pooled HTTP client to ChatAnthropic: {e}")
+
+
 def get_default_llm_config() -> dict:
     """Get default LLM configuration"""
     return {
@@ -0,0 +1,375 @@
+"""
+Provider-aware scheduling for LLM requests.
+
+All LLM calls (VisualAgent, ErrorRecoveryAgent, title generation) go through
+``ScheduledChatModel``, which hands each request to the ``LLMScheduler`` of its
+provider. The scheduler applies:
+
+- a token-bucket request rate limit per provider
+- a cap on concurrent in-flight requests per provider
+- retry with full-jitter exponential backoff on 429 / 5xx / connection errors,
+  honouring ``Retry-After`` and pausing the whole bucket while rate limited
+- optional hedging: a duplicate request is sent when the first one is slower
+  than the provider's observed p95 latency, and the first result wins
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.utils.llm_wrapper import DelegatingChatModel
+
+logger = get_logger("llm_scheduler")
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status of an SDK / httpx error, if any"""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header, if the provider sent one"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections"""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(exc).__name__
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError)) or name in {
+        "APIConnectionError",
+        "APITimeoutError",
+        "ConnectError",
+        "ReadTimeout",
+        "ConnectTimeout",
+        "RemoteProtocolError",
+        "ReadError",
+    }
+
+
+class TokenBucket:
+    """Async token bucket; ``pause`` blocks every caller (e.g. after a 429)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def try_acquire(self) -> bool:
+        # A pause applies even when rate limiting is disabled
+        if time.monotonic() < self.paused_until:
+            return False
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LLMScheduler:
+    """Rate limits, concurrency, retries and hedging for one provider."""
+
+    _schedulers: Dict[str, "LLMScheduler"] = {}
+
+    def __init__(
+        self,
+        provider: str,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_min_samples: Optional[int] = None,
+    ):
+        limits = settings.llm_provider_limits.get(provider, {})
+
+        def pick(value, key, default):
+            return value if value is not None else limits.get(key, default)
+
+        self.provider = provider
+        self.bucket = TokenBucket(
+            rate=pick(rate, "rate", settings.llm_rate_limit),
+            capacity=pick(burst, "burst", settings.llm_rate_burst),
+        )
+        self.max_concurrency = pick(
+            max_concurrency, "max_concurrency", settings.llm_max_concurrency
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.max_retries = pick(max_retries, "max_retries", settings.llm_max_retries)
+        self.base_delay = pick(base_delay, "base_delay", settings.llm_retry_base_delay)
+        self.max_delay = pick(max_delay, "max_delay", settings.llm_retry_max_delay)
+        self.hedge = pick(hedge, "hedge", settings.llm_hedge_enabled)
+        self.hedge_min_samples = pick(
+            hedge_min_samples, "hedge_min_samples", settings.llm_hedge_min_samples
+        )
+        self.latencies: deque = deque(maxlen=500)
+        self.stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+            "in_flight": 0,
+        }
+
+    @classmethod
+    def for_provider(cls, provider: str) -> "LLMScheduler":
+        """Process-wide scheduler for a provider"""
+        if provider not in cls._schedulers:
+            cls._schedulers[provider] = cls(provider)
+        return cls._schedulers[provider]
+
+    @classmethod
+    def all_stats(cls) -> List[Dict[str, Any]]:
+        return [scheduler.snapshot() for scheduler in cls._schedulers.values()]
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop all schedulers (settings reload, tests)"""
+        cls._schedulers.clear()
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            **self.stats,
+            "max_concurrency": self.max_concurrency,
+            "p50_latency": self._percentile(0.5),
+            "p95_latency": self._percentile(0.95),
+        }
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        """Full-jitter exponential backoff, at least Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    async def _attempt(
+        self, call: Callable[[], Awaitable[Any]], acquire: bool = True
+    ) -> Any:
+        """One rate-limited, concurrency-capped call"""
+        if acquire:
+            await self.bucket.acquire()
+        async with self.semaphore:
+            self.stats["in_flight"] += 1
+            start = time.monotonic()
+            try:
+                result = await call()
+            finally:
+                self.stats["in_flight"] -= 1
+            self.latencies.append(time.monotonic() - start)
+            return result
+
+    async def _hedged(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Send a duplicate after p95 latency; return whichever finishes first"""
+        threshold = self._percentile(0.95)
+        primary = asyncio.ensure_future(self._attempt(call))
+        if (
+            not self.hedge
+            or threshold is None
+            or len(self.latencies) < self.hedge_min_samples
+        ):
+            return await primary
+
+        backup: Optional[asyncio.Future] = None
+        # The first wait is inside the try too: a caller cancelled before the
+        # hedge fires must not leave the primary holding a concurrency slot
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            # Never hedge past the rate limit
+            if done or not self.bucket.try_acquire():
+                return await primary
+
+            self.stats["hedges_sent"] += 1
+            backup = asyncio.ensure_future(self._attempt(call, acquire=False))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedges_won"] += 1
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def run(self, call: Callable[[], Awaitable[Any]], hedge: bool = True) -> Any:
+        """
+        Run a non-streaming request with rate limiting, retries and hedging.
+
+        Args:
+            call: Zero-argument factory returning a fresh awaitable per attempt
+            hedge: Allow a duplicate request for slow calls
+        """
+        self.stats["requests"] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await (self._hedged(call) if hedge else self._attempt(call))
+                self.stats["succeeded"] += 1
+                return result
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                await self._before_retry(attempt, e)
+
+    async def stream(
+        self, call: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Run a streaming request. Retries only happen before the first chunk;
+        a concurrency slot is held until the stream ends.
+        """
+        self.stats["requests"] += 1
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            started = False
+            try:
+                async with self.semaphore:
+                    self.stats["in_flight"] += 1
+                    try:
+                        async for chunk in call():
+                            started = True
+                            yield chunk
+                    finally:
+                        self.stats["in_flight"] -= 1
+                self.stats["succeeded"] += 1
+                return
+            except Exception as e:
+                if started or not is_retryable(e) or attempt >= self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                await self._before_retry(attempt, e)
+
+    async def _before_retry(self, attempt: int, exc: BaseException) -> None:
+        delay = self._backoff(attempt, exc)
+        if _status_code(exc) == 429:
+            self.stats["rate_limited"] += 1
+            # Everyone on this provider backs off, not just this caller
+            self.bucket.pause(delay)
+        self.stats["retries"] += 1
+        logger.warning(
+            f"LLM request to {self.provider} failed ({type(exc).__name__}: {exc}); "
+            f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+
+class ScheduledChatModel(DelegatingChatModel):
+    """Chat model wrapper that routes every request through an LLMScheduler."""
+
+    provider: str
+
+    @property
+    def _llm_type(self) -> str:
+        return f"scheduled-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"provider": self.provider, **self.inner._identifying_params}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Sync calls are not used by the agents; pass straight through
+        return self.inner._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        scheduler = LLMScheduler.for_provider(self.provider)
+        return await scheduler.run(
+            lambda: self.inner._agenerate(messages, stop=stop, **kwargs)
+        )
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        scheduler = LLMScheduler.for_provider(self.provider)
+        async for chunk in scheduler.stream(
+            lambda: self.inner._astream(messages, stop=stop, **kwargs)
+        ):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
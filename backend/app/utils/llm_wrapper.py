@@ -0,0 +1,53 @@
+"""
+Base class for chat models that wrap the model returned by a provider.
+
+``ScheduledChatModel`` and ``CachedChatModel`` sit in front of the provider
+model. Tool binding and structured output are built by the provider model
+(each provider has its own request format) and then pointed back at the
+wrapper, so bound calls still go through scheduling and caching.
+"""
+
+from typing import Any, Dict, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import (
+    Runnable,
+    RunnableBinding,
+    RunnableParallel,
+    RunnableSequence,
+)
+from langchain_core.runnables.passthrough import RunnableAssign
+
+
+class DelegatingChatModel(BaseChatModel):
+    """Chat model that forwards requests to ``inner``."""
+
+    inner: BaseChatModel
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        return self._rewrap(self.inner.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        return self._rewrap(self.inner.with_structured_output(schema, **kwargs))
+
+    def _rewrap(self, runnable: Runnable) -> Runnable:
+        """Replace ``inner`` with this wrapper in a runnable built by ``inner``"""
+        if runnable is self.inner:
+            return self
+        if isinstance(runnable, RunnableBinding):
+            return runnable.model_copy(update={"bound": self._rewrap(runnable.bound)})
+        if isinstance(runnable, RunnableSequence):
+            return RunnableSequence(
+                *[self._rewrap(step) for step in runnable.steps], name=runnable.name
+            )
+        if isinstance(runnable, RunnableParallel):
+            return RunnableParallel(
+                {key: self._rewrap(step) for key, step in runnable.steps__.items()}
+            )
+        if isinstance(runnable, RunnableAssign):
+            return runnable.model_copy(update={"mapper": self._rewrap(runnable.mapper)})
+        return runnable
@@ -0,0 +1,184 @@
+"""
+Span-style latency tracing for the chat pipeline.
+
+A chat turn opens a ``Trace`` (``start_trace``); code along the way wraps its
+stages in ``span("stage.name")``. Each span is
+
+- appended to the current trace, so the whole turn can be returned to the
+  client as a ``timings`` event when debugging
+- recorded in a per-stage in-memory histogram (``LatencyMetrics``) that is
+  exported by the metrics endpoint
+
+Spans outside a trace still feed the histograms.
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000,
+)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class StageHistogram:
+    """Fixed-bucket histogram plus a window of recent samples for quantiles"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.recent: deque = deque(maxlen=1000)
+
+    def observe(self, ms: float) -> None:
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.recent.append(ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, running = {}, 0
+        for bound, n in zip(list(BUCKETS_MS) + ["+Inf"], self.buckets):
+            running += n
+            cumulative[str(bound)] = running
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 2),
+            "mean_ms": round(self.sum_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+
+class LatencyMetrics:
+    """Process-wide per-stage latency histograms."""
+
+    _histograms: Dict[str, StageHistogram] = {}
+
+    @staticmethod
+    def observe(stage: str, ms: float) -> None:
+        histogram = LatencyMetrics._histograms.get(stage)
+        if histogram is None:
+            histogram = LatencyMetrics._histograms[stage] = StageHistogram()
+        histogram.observe(ms)
+
+    @staticmethod
+    def snapshot() -> Dict[str, Dict[str, Any]]:
+        return {
+            stage: histogram.to_dict()
+            for stage, histogram in sorted(LatencyMetrics._histograms.items())
+        }
+
+    @staticmethod
+    def prometheus() -> str:
+        """Histograms in Prometheus text exposition format"""
+        name = "omicsagent_stage_latency_ms"
+        lines = [
+            f"# HELP {name} Chat pipeline stage latency in milliseconds",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, histogram in sorted(LatencyMetrics._histograms.items()):
+            running = 0
+            for bound, n in zip(list(BUCKETS_MS) + ["+Inf"], histogram.buckets):
+                running += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {running}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum_ms:.3f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def reset() -> None:
+        LatencyMetrics._histograms.clear()
+
+
+class Trace:
+    """Spans of one chat turn, offsets relative to the start of the turn"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.total_ms: Optional[float] = None
+
+    def add(self, stage: str, start: float, ms: float, attrs: Dict[str, Any]) -> None:
+        self.spans.append(
+            {
+                "name": stage,
+                "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round(ms, 2),
+                **({"attrs": attrs} if attrs else {}),
+            }
+        )
+
+    def finish(self) -> float:
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self.started) * 1000
+            LatencyMetrics.observe(self.name, self.total_ms)
+        return self.total_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.total_ms
+        if total is None:
+            total = (time.perf_counter() - self.started) * 1000
+        return {
+            "trace": self.name,
+            "total_ms": round(total, 2),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+def start_trace(name: str) -> Trace:
+    """Start a trace for the current task (and tasks it creates)"""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record(stage: str, seconds: float, start: Optional[float] = None, **attrs) -> None:
+    """Record an externally measured duration (e.g. time to first token)"""
+    ms = seconds * 1000
+    LatencyMetrics.observe(stage, ms)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, start if start is not None else time.perf_counter() - seconds, ms, attrs)
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block. Yields a dict for attributes discovered inside the block,
+    e.g. ``s["rows"] = len(data)``.
+    """
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        LatencyMetrics.observe(stage, ms)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, start, ms, attrs)
@@ -1,10 +1,342 @@
+"""
+DepMap 数据分析工具
+
+提供以下分析功能：
+1. correlation - 两个特征（表达、基因依赖性、拷贝数）在细胞系间的相关性
+2. dependency - 基因依赖性（或表达）最强的细胞系
+3. synthetic_lethality - 锚定基因低表达时依赖性增强的伙伴基因
+4. drug_association - 基因表达与药物反应的关联
+
+数据目录结构（除 models 外均为宽表：model_id 列加每个基因或药物一列）：
+{data_root}/
+└── depmap/
+    ├── models.parquet                # model_id, cell_line_name, cancer_type
+    ├── crispr_gene_effect.parquet    # CRISPR 基因效应（Chronos）
+    ├── rnai_gene_effect.parquet      # RNAi 基因效应（DEMETER2）
+    ├── expression.parquet            # log2(TPM + 1)
+    ├── copy_number.parquet
+    └── drug_{panel}_{metric}.parquet # 如 drug_prism_auc.parquet
+
+宽表有上万列，DuckDB 每次查询都要绑定全部列（一次约 1 秒），因此宽表
+用缓存的 pyarrow.ParquetFile 按列投影读取；癌种条件在 DuckDB 中对窄表
+models 求值，再作为行选择应用到宽表上；min_samples 先用各列的非缺失计数
+筛掉列再读取。读出的列按 (文件, 癌种, 列名) 缓存在进程内 LRU 中，文件
+更新后不再命中。
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
+from scipy import stats
+
+from app.core.config import settings
+from app.utils.analysis_result import AnalysisResult
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.tcga.correlation import (
+    METHODS,
+    benjamini_hochberg,
+    correlate_with,
+)
+
+logger = logging.getLogger(__name__)
+
+MODELS_FILE = "models.parquet"
+DEPENDENCY_FILES = {
+    "CRISPR": "crispr_gene_effect.parquet",
+    "RNAi": "rnai_gene_effect.parquet",
+}
+FEATURE_FILES = {
+    "expression": "expression.parquet",
+    "copy_number": "copy_number.parquet",
+}
+SYNTHETIC_LETHALITY_METHODS = ("rank_product", "wilcoxon")
+
+# 基因效应低于该值视为依赖
+DEPENDENCY_THRESHOLD = -0.5
+# 锚定基因表达处于该分位数及以下的细胞系视为锚定基因缺失
+ANCHOR_LOSS_QUANTILE = 0.25
+# 合成致死检验中每组至少需要的细胞系数
+MIN_GROUP_SIZE = 3
+
+
+def get_depmap_data_dir() -> Path:
+    """
+    获取 DepMap 数据目录路径
+
+    与 TCGA 相同：优先使用配置的 data_root/depmap，相对路径相对于项目
+    根目录解析，无法读取配置时使用项目根目录/data/depmap
+    """
+    base_dir = Path(__file__).parent.parent.parent.parent.parent.parent
+    try:
+        data_dir_str = settings.get_depmap_data_dir()
+        if not data_dir_str:
+            return (base_dir / "data" / "depmap").resolve()
+        data_dir = Path(data_dir_str)
+        if data_dir.is_absolute():
+            return data_dir.resolve()
+        return (base_dir / data_dir).resolve()
+    except Exception as e:
+        logger.warning(f"Error getting data dir from config: {e}, using default")
+        return (base_dir / "data" / "depmap").resolve()
+
+
+# 全局数据目录（延迟初始化）
+_DATA_DIR: Optional[Path] = None
+
+
+def get_data_dir() -> Path:
+    """获取数据目录（带缓存）"""
+    global _DATA_DIR
+    if _DATA_DIR is None:
+        _DATA_DIR = get_depmap_data_dir()
+        if not _DATA_DIR.exists():
+            logger.warning(f"DepMap data directory not found at {_DATA_DIR}")
+    return _DATA_DIR
+
+
+class _SliceCache:
+    """进程内的 DepMap 列缓存（LRU，按字节数限制）"""
+
+    _entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+    _sizes: Dict[Tuple, int] = {}
+    _bytes: int = 0
+    _lock = threading.Lock()
+    _stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def get(key: Tuple) -> Any:
+        with _SliceCache._lock:
+            value = _SliceCache._entries.get(key)
+            if value is None:
+                _SliceCache._stats["misses"] += 1
+                return None
+            _SliceCache._entries.move_to_end(key)
+            _SliceCache._stats["hits"] += 1
+            return value
+
+    @staticmethod
+    def put(key: Tuple, value: Any, nbytes: int) -> None:
+        limit = settings.depmap_slice_cache_bytes
+        if nbytes > limit:
+            return
+        with _SliceCache._lock:
+            if key in _SliceCache._entries:
+                _SliceCache._bytes -= _SliceCache._sizes.pop(key)
+                del _SliceCache._entries[key]
+            _SliceCache._entries[key] = value
+            _SliceCache._sizes[key] = nbytes
+            _SliceCache._bytes += nbytes
+            while _SliceCache._bytes > limit:
+                evicted, _ = _SliceCache._entries.popitem(last=False)
+                _SliceCache._bytes -= _SliceCache._sizes.pop(evicted)
+                _SliceCache._stats["evictions"] += 1
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        with _SliceCache._lock:
+            return {
+                **_SliceCache._stats,
+                "entries": len(_SliceCache._entries),
+                "bytes": _SliceCache._bytes,
+            }
+
+    @staticmethod
+    def clear() -> None:
+        with _SliceCache._lock:
+            _SliceCache._entries.clear()
+            _SliceCache._sizes.clear()
+            _SliceCache._bytes = 0
+            for name in _SliceCache._stats:
+                _SliceCache._stats[name] = 0
+
+
+def _signature(path: Path) -> Tuple[str, int, int]:
+    stat = path.stat()
+    return (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def _slice_key(filename: str, cancer_type: str) -> Tuple:
+    """文件与癌种对应的缓存键前缀；按癌种过滤时 models 的变化也使其失效"""
+    data_dir = get_data_dir()
+    key = _signature(data_dir / filename) + (cancer_type,)
+    if cancer_type != "all":
+        key += _signature(data_dir / MODELS_FILE)
+    return key
+
+
+def _parquet_file(filename: str) -> pq.ParquetFile:
+    """
+    打开的 Parquet 文件（按文件签名缓存）
+
+    DepMap 矩阵有上万列，解析文件尾部的元数据本身就要数百毫秒；缓存打开的
+    文件后，读取少数几列只需毫秒级。
+    """
+    path = get_data_dir() / filename
+    key = _signature(path) + ("file",)
+    parquet_file = _SliceCache.get(key)
+    if parquet_file is None:
+        parquet_file = pq.ParquetFile(path)
+        _SliceCache.put(key, parquet_file, parquet_file.metadata.serialized_size)
+    return parquet_file
+
+
+def _schema(filename: str) -> List[str]:
+    """文件的列名"""
+    return _parquet_file(filename).schema_arrow.names
+
+
+def _missing(filename: str, names: Sequence[str]) -> Optional[str]:
+    """文件不存在或缺少所需列时的错误信息"""
+    if not (get_data_dir() / filename).exists():
+        return f"DepMap data not found: {filename}"
+    schema = set(_schema(filename))
+    absent = [n for n in names if n not in schema]
+    if absent:
+        return f"Not found in {filename}: {', '.join(absent)}"
+    return None
+
+
+def _rows(filename: str, cancer_type: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    癌种过滤后的行：(按 model_id 排序的 model_ids, 对应的行号)
+
+    癌种条件在 DuckDB 中对窄表 models 求值，得到的 model_id 集合作为行
+    选择应用到宽表上。
+    """
+    prefix = _slice_key(filename, cancer_type)
+    rows = _SliceCache.get(prefix + ("rows",))
+    if rows is None:
+        model_ids = (
+            _parquet_file(filename)
+            .read(columns=["model_id"])
+            .column(0)
+            .to_numpy(zero_copy_only=False)
+        )
+        selected = np.arange(len(model_ids))
+        if cancer_type != "all":
+            models = DuckDBPool.view(get_data_dir() / MODELS_FILE)
+            members = DuckDBPool.query_df(
+                f"SELECT model_id FROM {models} WHERE cancer_type = ?", [cancer_type]
+            )["model_id"]
+            selected = np.flatnonzero(np.isin(model_ids, members.to_numpy()))
+        selected = selected[np.argsort(model_ids[selected], kind="stable")]
+        rows = (model_ids[selected], selected)
+        _SliceCache.put(prefix + ("rows",), rows, rows[0].nbytes + selected.nbytes)
+    return rows
+
+
+def _load_columns(
+    filename: str, columns: Sequence[str], cancer_type: str = "all"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    读取宽表中的若干列
+
+    只读取缓存中没有的列（列投影，其余列的数据页不读），再按癌种选出行。
+
+    Returns:
+        (model_ids, values)：values 为 (n_models, len(columns)) 的 float64
+        矩阵，行按 model_id 排序，缺失值为 NaN
+    """
+    model_ids, selected = _rows(filename, cancer_type)
+    prefix = _slice_key(filename, cancer_type)
+    cached = {c: _SliceCache.get(prefix + ("column", c)) for c in columns}
+    missing = [c for c, values in cached.items() if values is None]
+    if missing:
+        table = _parquet_file(filename).read(columns=missing)
+        for c in missing:
+            values = pc.cast(table.column(c), pa.float64()).to_numpy(
+                zero_copy_only=False
+            )[selected]
+            cached[c] = values
+            _SliceCache.put(prefix + ("column", c), values, values.nbytes)
+
+    if not columns:
+        return model_ids, np.empty((len(model_ids), 0))
+    return model_ids, np.column_stack([cached[c] for c in columns])
+
+
+# 统计非缺失值个数时每次读取的列数
+COUNT_BATCH_COLUMNS = 1000
+
+
+def _non_null_counts(filename: str, cancer_type: str = "all") -> pd.Series:
+    """
+    各数据列（癌种过滤后）的非缺失值个数（NaN 与 null 都算缺失）
+
+    按批读取列，只保留计数；结果缓存后，min_samples 不满足的列不会再被读取。
+    """
+    prefix = _slice_key(filename, cancer_type)
+    counts = _SliceCache.get(prefix + ("counts",))
+    if counts is None:
+        _, selected = _rows(filename, cancer_type)
+        names = [c for c in _schema(filename) if c != "model_id"]
+        parquet_file = _parquet_file(filename)
+        values = []
+        for start in range(0, len(names), COUNT_BATCH_COLUMNS):
+            table = parquet_file.read(
+                columns=names[start : start + COUNT_BATCH_COLUMNS]
+            )
+            for column in table.columns:
+                column = pc.cast(column, pa.float64()).to_numpy(zero_copy_only=False)
+                values.append(np.count_nonzero(~np.isnan(column[selected])))
+        counts = pd.Series(values, index=names, dtype=np.int64)
+        _SliceCache.put(prefix + ("counts",), counts, counts.memory_usage(deep=True))
+    return counts
+
+
+def _align(
+    left: Tuple[np.ndarray, np.ndarray], right: Tuple[np.ndarray, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """两个 _load_columns 结果按共同的 model_id 对齐"""
+    model_ids, i, j = np.intersect1d(
+        left[0], right[0], assume_unique=True, return_indices=True
+    )
+    return model_ids, left[1][i], right[1][j]
+
+
+def _model_info(model_ids: np.ndarray) -> pd.DataFrame:
+    """细胞系注释（model_id, cell_line_name, cancer_type），与 model_ids 同序"""
+    path = get_data_dir() / MODELS_FILE
+    key = _signature(path) + ("model_info",)
+    models = _SliceCache.get(key)
+    if models is None:
+        models = DuckDBPool.query_df(
+            "SELECT model_id, cell_line_name, cancer_type "
+            f"FROM {DuckDBPool.view(path)}"
+        ).set_index("model_id")
+        _SliceCache.put(key, models, int(models.memory_usage(deep=True).sum()))
+    return models.reindex(model_ids).rename_axis("model_id").reset_index()
+
+
+def _feature_file(feature_type: str, dataset: str = "CRISPR") -> str:
+    if feature_type == "dependency":
+        if dataset not in DEPENDENCY_FILES:
+            raise ValueError(f"Invalid dependency dataset: {dataset}")
+        return DEPENDENCY_FILES[dataset]
+    if feature_type not in FEATURE_FILES:
+        raise ValueError(f"Invalid feature type: {feature_type}")
+    return FEATURE_FILES[feature_type]
+
+
+def _nanmean(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按列的均值与有效值个数（全缺失的列均值为 NaN，不告警）"""
+    observed = ~np.isnan(values)
+    n = observed.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(observed, values, 0.0).sum(axis=0) / n
+    return mean, n
 
 
 def correlation(
-    data: pd.DataFrame,
     feature_type_x: str,
     feature_type_y: str,
     feature_x: str,
@@ -12,68 +344,358 @@ def correlation(
     method: str = "pearson",
     cancer_type: str = "all",
     min_samples: int = 50,
-) -> pd.DataFrame:
+) -> Dict[str, Any]:
     """
-    Calculate the correlation between two features.
+    两个特征在细胞系间的相关性
+
     Args:
-        data: pd.DataFrame
-        feature_type_x: str, the type of the feature on the x-axis
-        feature_type_y: str, the type of the feature on the y-axis
-        feature_x: str, the feature on the x-axis
-        feature_y: str, the feature on the y-axis
-        method: str, the method of the correlation
-        cancer_type: str, the cancer type
-        min_samples: int, the minimum number of samples
+        feature_type_x: x 轴特征类型（expression, dependency, copy_number）
+        feature_type_y: y 轴特征类型
+        feature_x: x 轴基因
+        feature_y: y 轴基因
+        method: 相关性方法（pearson, spearman, kendall）
+        cancer_type: 癌种，all 表示全部细胞系
+        min_samples: 两个特征都有值的细胞系数下限
+
     Returns:
-        pd.DataFrame, the correlation between the two features
+        AnalysisResult: 每个细胞系一行（model_id, cell_line_name, cancer_type,
+        x, y）；元数据含 r、p_value 与 n_samples
     """
-    if cancer_type != "all":
-        data = data[data["cancer_type"] == cancer_type]
-    if min_samples > 0:
-        data = data[data["samples"] >= min_samples]
-    return data.corr(method=method)
+    if method not in METHODS:
+        raise ValueError(f"Invalid correlation method: {method}")
+    file_x = _feature_file(feature_type_x)
+    file_y = _feature_file(feature_type_y)
+    for filename, feature in ((file_x, feature_x), (file_y, feature_y)):
+        error = _missing(filename, [feature])
+        if error:
+            return {"error": error}
+
+    model_ids, x, y = _align(
+        _load_columns(file_x, [feature_x], cancer_type),
+        _load_columns(file_y, [feature_y], cancer_type),
+    )
+    x, y = x[:, 0], y[:, 0]
+    both = ~np.isnan(x) & ~np.isnan(y)
+    if both.sum() < max(min_samples, 3):
+        return {
+            "error": f"Insufficient samples ({int(both.sum())}, "
+            f"need at least {max(min_samples, 3)})"
+        }
+    r, p, n = correlate_with(x, y[:, None], method)
+
+    data = _model_info(model_ids[both])
+    data["x"] = x[both]
+    data["y"] = y[both]
+    return AnalysisResult.from_frame(
+        data,
+        feature_type_x=feature_type_x,
+        feature_type_y=feature_type_y,
+        feature_x=feature_x,
+        feature_y=feature_y,
+        method=method,
+        cancer_type=cancer_type,
+        r=float(r[0]),
+        p_value=float(p[0]),
+        n_samples=int(n[0]),
+    )
 
 
 def dependency(
-    data: pd.DataFrame,
     feature_type: str,
     gene: str,
     dataset: str = "CRISPR",
     cancer_type: str = "all",
     top_n: int = 25,
-):
-    if cancer_type != "all":
-        data = data[data["cancer_type"] == cancer_type]
+) -> Dict[str, Any]:
+    """
+    基因依赖性最强（基因效应最低）的细胞系
+
+    Args:
+        feature_type: dependency 按基因效应升序；expression 或 copy_number
+            按数值降序
+        gene: 基因名称
+        dataset: 依赖性数据集（CRISPR, RNAi）
+        cancer_type: 癌种，all 表示全部细胞系
+        top_n: 返回的细胞系数，不大于 0 时返回全部
+
+    Returns:
+        AnalysisResult: rank, model_id, cell_line_name, cancer_type, value；
+        元数据含全部细胞系的汇总与按癌种的汇总（by_cancer_type）
+    """
+    filename = _feature_file(feature_type, dataset)
+    error = _missing(filename, [gene])
+    if error:
+        return {"error": error}
+
+    model_ids, values = _load_columns(filename, [gene], cancer_type)
+    values = values[:, 0]
+    observed = ~np.isnan(values)
+    if not observed.any():
+        return {"error": f"No {feature_type} data for {gene} in {cancer_type}"}
+
+    data = _model_info(model_ids[observed])
+    data["value"] = values[observed]
+    data = data.sort_values(
+        "value", ascending=feature_type == "dependency", kind="stable"
+    ).reset_index(drop=True)
+    data.insert(0, "rank", np.arange(1, len(data) + 1))
+
+    metadata = {
+        "gene": gene,
+        "feature_type": feature_type,
+        "dataset": dataset if feature_type == "dependency" else None,
+        "cancer_type": cancer_type,
+        "n_cell_lines": len(data),
+        "mean": float(data["value"].mean()),
+        "median": float(data["value"].median()),
+        "by_cancer_type": data.groupby("cancer_type")["value"]
+        .agg(["count", "mean", "median"])
+        .reset_index()
+        .to_dict("list"),
+    }
+    if feature_type == "dependency":
+        metadata["dependency_threshold"] = DEPENDENCY_THRESHOLD
+        metadata["n_dependent"] = int((data["value"] < DEPENDENCY_THRESHOLD).sum())
     if top_n > 0:
         data = data.head(top_n)
-    return data
+    return AnalysisResult.from_frame(data, **metadata)
+
+
+def _rank_product_pvalues(delta: np.ndarray) -> np.ndarray:
+    """
+    秩乘积检验的单侧 p 值
+
+    delta 为 (n_lines, n_genes)：每个缺失细胞系中各基因效应减去完整组
+    均值。每个细胞系内对基因按 delta 升序求秩，r / (N + 1) 在零假设下
+    近似服从均匀分布，-log 之和服从 Gamma(k)，k 为该基因的有效细胞系数。
+    """
+    ranks = stats.rankdata(delta, axis=1, nan_policy="omit")
+    per_line = np.sum(~np.isnan(delta), axis=1, keepdims=True)
+    scores = -np.log(ranks / (per_line + 1))
+    k = np.sum(~np.isnan(scores), axis=0)
+    return np.where(k > 0, stats.gamma.sf(np.nansum(scores, axis=0), k), np.nan)
 
 
 def synthetic_lethality(
-    data: pd.DataFrame,
     anchor_gene: str,
     partner_search_space: str = "genome_wide",
     method: str = "rank_product",
     cancer_type: str = "all",
     min_effect_size: float = 0.3,
     fdr: float = 0.1,
-):
-    if cancer_type != "all":
-        data = data[data["cancer_type"] == cancer_type]
-    if min_effect_size > 0:
-        data = data[data["effect_size"] >= min_effect_size]
-    if fdr > 0:
-        data = data[data["fdr"] <= fdr]
-    return data
+) -> Dict[str, Any]:
+    """
+    合成致死伙伴基因
+
+    锚定基因表达处于最低四分位的细胞系视为缺失组，其余为完整组；伙伴
+    基因在缺失组中的 CRISPR 基因效应显著低于完整组时报告为候选。
+
+    Args:
+        anchor_gene: 锚定基因
+        partner_search_space: genome_wide 或逗号分隔的基因列表
+        method: rank_product 或 wilcoxon（单侧 Mann-Whitney U）
+        cancer_type: 癌种，all 表示全部细胞系
+        min_effect_size: 效应量（完整组均值减缺失组均值）下限
+        fdr: Benjamini-Hochberg q 值上限
+
+    Returns:
+        AnalysisResult: 满足阈值的伙伴基因（gene, effect_size, mean_loss,
+        mean_intact, n_loss, n_intact, p_value, fdr），按 p 值升序
+    """
+    if method not in SYNTHETIC_LETHALITY_METHODS:
+        raise ValueError(f"Invalid synthetic lethality method: {method}")
+    expression_file = FEATURE_FILES["expression"]
+    effect_file = DEPENDENCY_FILES["CRISPR"]
+    error = _missing(expression_file, [anchor_gene]) or _missing(effect_file, [])
+    if error:
+        return {"error": error}
+
+    if partner_search_space == "genome_wide":
+        partners = [c for c in _schema(effect_file) if c != "model_id"]
+    elif partner_search_space in ("cancer_genes", "pathway"):
+        raise ValueError(
+            f"Partner search space {partner_search_space} is not available; "
+            "use genome_wide or a comma-separated gene list"
+        )
+    else:
+        partners = [g.strip() for g in partner_search_space.split(",") if g.strip()]
+        error = _missing(effect_file, partners)
+        if error:
+            return {"error": error}
+    partners = [g for g in dict.fromkeys(partners) if g != anchor_gene]
+
+    model_ids, anchor, effects = _align(
+        _load_columns(expression_file, [anchor_gene], cancer_type),
+        _load_columns(effect_file, partners, cancer_type),
+    )
+    observed = ~np.isnan(anchor[:, 0])
+    anchor, effects = anchor[observed, 0], effects[observed]
+    if len(anchor) == 0:
+        return {"error": f"No expression data for {anchor_gene} in {cancer_type}"}
+    threshold = float(np.quantile(anchor, ANCHOR_LOSS_QUANTILE))
+    loss = anchor <= threshold
+    if loss.sum() < MIN_GROUP_SIZE or (~loss).sum() < MIN_GROUP_SIZE:
+        return {"error": "Insufficient cell lines in the anchor loss or intact group"}
+
+    lost, intact = effects[loss], effects[~loss]
+    mean_loss, n_loss = _nanmean(lost)
+    mean_intact, n_intact = _nanmean(intact)
+    tested = (n_loss >= MIN_GROUP_SIZE) & (n_intact >= MIN_GROUP_SIZE)
+    p = np.full(len(partners), np.nan)
+    if tested.any():
+        if method == "rank_product":
+            p[tested] = _rank_product_pvalues(lost[:, tested] - mean_intact[tested])
+        else:
+            nan_policy = "omit" if np.isnan(effects[:, tested]).any() else "propagate"
+            p[tested] = stats.mannwhitneyu(
+                lost[:, tested],
+                intact[:, tested],
+                axis=0,
+                alternative="less",
+                nan_policy=nan_policy,
+            ).pvalue
+    q = benjamini_hochberg(p)
+    effect_size = mean_intact - mean_loss
+
+    with np.errstate(invalid="ignore"):
+        hits = np.flatnonzero(tested & (effect_size >= min_effect_size) & (q <= fdr))
+    hits = hits[np.argsort(p[hits], kind="stable")]
+    data = pd.DataFrame(
+        {
+            "gene": [partners[i] for i in hits],
+            "effect_size": effect_size[hits],
+            "mean_loss": mean_loss[hits],
+            "mean_intact": mean_intact[hits],
+            "n_loss": n_loss[hits],
+            "n_intact": n_intact[hits],
+            "p_value": p[hits],
+            "fdr": q[hits],
+        }
+    )
+    return AnalysisResult.from_frame(
+        data,
+        anchor_gene=anchor_gene,
+        partner_search_space=partner_search_space,
+        method=method,
+        cancer_type=cancer_type,
+        anchor_threshold=threshold,
+        n_loss=int(loss.sum()),
+        n_intact=int((~loss).sum()),
+        n_partners_tested=int(tested.sum()),
+        n_hits=len(data),
+    )
 
 
 def drug_association(
-    data: pd.DataFrame,
     gene: str,
     drug_panel: str = "PRISM",
     response_metric: str = "AUC",
     cancer_type: str = "all",
     min_samples: int = 30,
-):
-    if cancer_type != "all":
-        data = data[data["cancer_type"] == cancer_type]
+    method: str = "pearson",
+) -> Dict[str, Any]:
+    """
+    基因表达与药物反应的关联
+
+    先用各药物的非空计数去掉筛选细胞系不足 min_samples 的药物，再读取
+    其余药物，与基因表达逐药物计算相关（pairwise-complete）。
+
+    Args:
+        gene: 基因名称
+        drug_panel: 药物筛选（PRISM, GDSC1, GDSC2, CTRPv2）
+        response_metric: 反应指标（AUC, IC50 等）
+        cancer_type: 癌种，all 表示全部细胞系
+        min_samples: 与表达都有值的细胞系数下限
+        method: 相关性方法（pearson, spearman, kendall）
+
+    Returns:
+        AnalysisResult: 每个药物一行（drug, r, p_value, fdr, n_samples），
+        按 p 值升序
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid correlation method: {method}")
+    expression_file = FEATURE_FILES["expression"]
+    drug_file = f"drug_{drug_panel.lower()}_{response_metric.lower()}.parquet"
+    error = _missing(expression_file, [gene]) or _missing(drug_file, [])
+    if error:
+        return {"error": error}
+
+    counts = _non_null_counts(drug_file, cancer_type)
+    drugs = counts.index[counts >= min_samples].tolist()
+    if not drugs:
+        return {"error": f"No drugs screened in at least {min_samples} cell lines"}
+
+    model_ids, expression, responses = _align(
+        _load_columns(expression_file, [gene], cancer_type),
+        _load_columns(drug_file, drugs, cancer_type),
+    )
+    r, p, n = correlate_with(
+        expression[:, 0], responses, method, min_samples=max(min_samples, 3)
+    )
+    q = benjamini_hochberg(p)
+    order = np.argsort(p, kind="stable")
+    order = order[~np.isnan(p[order])]
+    data = pd.DataFrame(
+        {
+            "drug": [drugs[i] for i in order],
+            "r": r[order],
+            "p_value": p[order],
+            "fdr": q[order],
+            "n_samples": n[order],
+        }
+    )
+    return AnalysisResult.from_frame(
+        data,
+        gene=gene,
+        drug_panel=drug_panel,
+        response_metric=response_metric,
+        method=method,
+        cancer_type=cancer_type,
+        n_cell_lines=len(model_ids),
+        n_drugs_tested=len(data),
+    )
+
+
+def data_fingerprint(sub_tool: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    结果缓存使用的数据指纹（见 app/services/analysis_cache.py）
+
+    由数据目录下所有 Parquet 文件的路径、mtime 与大小组成。数据目录不存在
+    时返回 None，不缓存。
+    """
+    data_dir = get_data_dir()
+    if not data_dir.exists():
+        return None
+    signature = []
+    for path in sorted(data_dir.glob("*.parquet")):
+        stat = path.stat()
+        signature.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha1("\n".join(signature).encode()).hexdigest()
+
+
+# 主函数：根据子工具名称调用相应的分析函数
+def run_analysis(sub_tool: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    运行 DepMap 分析
+
+    Args:
+        sub_tool: 子工具名称
+        params: 参数字典
+
+    Returns:
+        Dict: 分析结果
+    """
+    try:
+        if sub_tool == "correlation":
+            return correlation(**params)
+        elif sub_tool == "dependency":
+            return dependency(**params)
+        elif sub_tool == "synthetic_lethality":
+            return synthetic_lethality(**params)
+        elif sub_tool == "drug_association":
+            return drug_association(**params)
+        else:
+            return {"error": f"Unknown sub-tool: {sub_tool}"}
+    except Exception as e:
+        logger.error(f"Error running {sub_tool}: {str(e)}", exc_info=True)
+        return {"error": str(e)}
@@ -0,0 +1,187 @@
+"""
+表达相关性的向量化计算
+
+pairwise_correlation 对矩阵的所有列两两计算相关系数、p 值与有效样本数，
+缺失值按 pairwise-complete 处理：每一对基因只使用两者都有值的样本。
+
+- pearson：以矩阵乘法一次得到所有列对的和、平方和与交叉积
+- spearman：先对每列求秩，再对秩做 pearson；两列缺失样本不同的列对
+  需要在共同样本上重新求秩，这些列对逐对用 scipy 计算
+- kendall：没有矩阵形式，逐对用 scipy.stats.kendalltau（tau-b）
+
+correlate_with 计算一个向量与矩阵每一列的相关（一对多），同样按列对
+使用共同样本，spearman 在每一列对的共同样本上求秩。
+
+benjamini_hochberg 用于全基因组扫描等多重检验的 FDR 校正。
+"""
+
+from typing import Tuple
+
+import numpy as np
+from scipy import stats
+
+METHODS = ("pearson", "spearman", "kendall")
+
+
+def correlation_pvalues(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """相关系数的双侧 p 值（t 分布近似，自由度 n - 2）"""
+    r = np.asarray(r, dtype=np.float64)
+    df = np.asarray(n, dtype=np.float64) - 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt(df / np.maximum(1 - r * r, 0))
+        p = 2 * stats.t.sf(np.abs(t), df)
+    return np.where(df > 0, p, np.nan)
+
+
+def _pearson(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """values (n_samples, n_columns)，可含 NaN；返回 (r, n)"""
+    observed = ~np.isnan(values)
+    # 先按列均值中心化，减少平方和相减时的精度损失
+    centered = np.where(observed, values - np.nanmean(values, axis=0), 0.0)
+    mask = observed.astype(np.float64)
+    n = mask.T @ mask
+    if observed.all():
+        sums = np.zeros_like(n)
+        squares = np.broadcast_to(np.sum(centered**2, axis=0), n.shape)
+    else:
+        # sums[i, j]：列 i 在列 j 也有值的样本上的和
+        sums = centered.T @ mask
+        squares = (centered**2).T @ mask
+    cross = centered.T @ centered
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = cross - sums * sums.T / n
+        var_x = squares - sums**2 / n
+        r = cov / np.sqrt(var_x * var_x.T)
+    return np.clip(r, -1.0, 1.0), n
+
+
+def pairwise_correlation(
+    values: np.ndarray, method: str = "pearson", min_samples: int = 3
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    所有列对的相关系数矩阵
+
+    Args:
+        values: (n_samples, n_columns) 矩阵，NaN 表示缺失
+        method: pearson, spearman 或 kendall
+        min_samples: 有效样本数少于该值的列对结果为 NaN
+
+    Returns:
+        (r, p_value, n)：三个 (n_columns, n_columns) 矩阵
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid correlation method: {method}")
+    values = np.asarray(values, dtype=np.float64)
+    k = values.shape[1]
+
+    if method == "kendall":
+        observed = ~np.isnan(values)
+        n = observed.T.astype(np.float64) @ observed
+        r = np.eye(k)
+        p = np.zeros((k, k))
+        for i in range(k):
+            for j in range(i + 1, k):
+                both = observed[:, i] & observed[:, j]
+                if both.sum() < max(min_samples, 2):
+                    r[i, j] = r[j, i] = p[i, j] = p[j, i] = np.nan
+                    continue
+                result = stats.kendalltau(values[both, i], values[both, j])
+                r[i, j] = r[j, i] = result.statistic
+                p[i, j] = p[j, i] = result.pvalue
+    else:
+        if method == "spearman":
+            ranked = stats.rankdata(values, axis=0, nan_policy="omit")
+            r, n = _pearson(ranked)
+            _rerank_partial_pairs(values, r, n)
+        else:
+            r, n = _pearson(values)
+        p = correlation_pvalues(r, n)
+
+    np.fill_diagonal(r, np.where(np.diag(n) >= min_samples, 1.0, np.nan))
+    np.fill_diagonal(p, np.where(np.diag(n) >= min_samples, 0.0, np.nan))
+    too_few = n < min_samples
+    r[too_few] = np.nan
+    p[too_few] = np.nan
+    return r, p, n.astype(np.int64)
+
+
+def _rerank_partial_pairs(values: np.ndarray, r: np.ndarray, n: np.ndarray) -> None:
+    """
+    秩是在每列自身的有效样本上求的；两列的有效样本不同时，共同样本上的
+    秩需要重新计算。就地修正这些列对的 r。
+    """
+    counts = np.diag(n)
+    partial = (n < counts[:, None]) | (n < counts[None, :])
+    for i, j in zip(*np.nonzero(np.triu(partial, 1))):
+        both = ~np.isnan(values[:, i]) & ~np.isnan(values[:, j])
+        if both.sum() < 3:
+            r[i, j] = r[j, i] = np.nan
+            continue
+        r[i, j] = r[j, i] = stats.spearmanr(values[both, i], values[both, j]).statistic
+
+
+def correlate_with(
+    x: np.ndarray, values: np.ndarray, method: str = "pearson", min_samples: int = 3
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量与矩阵每一列的相关系数
+
+    Args:
+        x: (n_samples,) 向量，NaN 表示缺失
+        values: (n_samples, n_columns) 矩阵，NaN 表示缺失
+        method: pearson, spearman 或 kendall
+        min_samples: 有效样本数少于该值的列结果为 NaN
+
+    Returns:
+        (r, p_value, n)：三个 (n_columns,) 向量
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid correlation method: {method}")
+    x = np.asarray(x, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    both = ~np.isnan(values) & ~np.isnan(x)[:, None]
+    n = both.sum(axis=0)
+
+    if method == "kendall":
+        r = np.full(values.shape[1], np.nan)
+        p = np.full(values.shape[1], np.nan)
+        for j in np.flatnonzero(n >= max(min_samples, 2)):
+            result = stats.kendalltau(x[both[:, j]], values[both[:, j], j])
+            r[j], p[j] = result.statistic, result.pvalue
+    else:
+        xs = np.where(both, x[:, None], np.nan)
+        ys = np.where(both, values, np.nan)
+        if method == "spearman":
+            xs = stats.rankdata(xs, axis=0, nan_policy="omit")
+            ys = stats.rankdata(ys, axis=0, nan_policy="omit")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xs = np.nan_to_num(xs - np.nanmean(xs, axis=0))
+            ys = np.nan_to_num(ys - np.nanmean(ys, axis=0))
+            r = np.sum(xs * ys, axis=0) / np.sqrt(
+                np.sum(xs**2, axis=0) * np.sum(ys**2, axis=0)
+            )
+        r = np.clip(r, -1.0, 1.0)
+        p = correlation_pvalues(r, n)
+
+    too_few = n < min_samples
+    r[too_few] = np.nan
+    p[too_few] = np.nan
+    return r, p, n.astype(np.int64)
+
+
+def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+    """Benjamini-Hochberg 校正的 q 值（NaN 保持为 NaN，不计入检验数）"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    q = np.full_like(p_values, np.nan)
+    tested = ~np.isnan(p_values)
+    p = p_values[tested]
+    if len(p) == 0:
+        return q
+    order = np.argsort(p)
+    scaled = p[order] * len(p) / np.arange(1, len(p) + 1)
+    # 从大到小取累计最小值，保证 q 值单调
+    adjusted = np.minimum.accumulate(scaled[::-1])[::-1]
+    ranked = np.empty_like(adjusted)
+    ranked[order] = np.minimum(adjusted, 1.0)
+    q[tested] = ranked
+    return q
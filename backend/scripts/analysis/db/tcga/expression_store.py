@@ -0,0 +1,313 @@
+"""
+TCGA 表达矩阵的基因主序存储
+
+rsem_gene_tpm.parquet 以样本为行、基因为列，单基因查询也要付出宽表
+列元数据的开销。本模块为每个表达 Parquet 文件生成一个同目录的伴随存储：
+
+    rsem_gene_tpm.genes/
+    ├── values.f32       # float32，形状 (n_genes, n_samples)，每个基因一段连续向量
+    ├── samples.parquet  # 非数值列（patient、sample_type 等），与向量同序
+    └── index.json       # 基因 → 行号索引、矩阵形状与源文件签名
+
+查询时通过 np.memmap 按偏移直接读取一个基因的向量。源 Parquet 的
+mtime 或大小变化后存储视为过期，加载函数自动回退到 Parquet。
+
+全基因组扫描使用按样本类型标准化的矩阵（首次使用时生成，随存储一起重建）：
+
+    rsem_gene_tpm.genes/
+    ├── zscore_01.npy        # float32，(n_genes, 肿瘤样本数)，每行均值 0、方差 1
+    └── zscore_01.std.npy    # 每个基因的标准差，0 表示常数行
+
+存储可能在处理请求时按需构建，多个分析进程会同时遇到同一个缺失的存储：
+构建在同目录的锁文件（.rsem_gene_tpm.genes.lock）上加排他锁，拿到锁后先
+检查别的进程是否已经建好；每次构建写入带进程号的临时目录。
+
+构建：
+    python -m scripts.analysis.db.tcga.expression_store [BRCA LUAD ...]
+"""
+
+import fcntl
+import logging
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+STORE_SUFFIX = ".genes"
+# 构建时每次读取的基因列数
+BUILD_COLUMN_BATCH = 512
+# 标准化时每次处理的基因行数
+ZSCORE_ROW_BATCH = 1024
+
+
+def store_dir(parquet_path: Path) -> Path:
+    """表达 Parquet 文件对应的基因主序存储目录"""
+    return parquet_path.with_suffix(STORE_SUFFIX)
+
+
+def _signature(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ExpressionStore:
+    """一个表达文件的基因主序 float32 矩阵（内存映射）"""
+
+    _open_stores: Dict[str, "ExpressionStore"] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path: Path, index: Dict):
+        self.path = path
+        self.genes: List[str] = index["genes"]
+        self.offsets: Dict[str, int] = {g: i for i, g in enumerate(self.genes)}
+        self.source_signature = tuple(index["source_signature"])
+        self.values = np.memmap(
+            path / "values.f32",
+            dtype=np.float32,
+            mode="r",
+            shape=(index["n_genes"], index["n_samples"]),
+        )
+        self.samples = pq.read_table(path / "samples.parquet").to_pandas()
+        self._zscores: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @staticmethod
+    def for_parquet(parquet_path: Path) -> Optional["ExpressionStore"]:
+        """打开与 Parquet 文件一致的存储；不存在或已过期时返回 None"""
+        path = store_dir(parquet_path)
+        if not (path / "index.json").exists() or not parquet_path.exists():
+            return None
+        key = str(path.resolve())
+        signature = _signature(parquet_path)
+        store = ExpressionStore._open_stores.get(key)
+        if store is None or store.source_signature != signature:
+            with ExpressionStore._lock:
+                store = ExpressionStore._open_stores.get(key)
+                if store is None or store.source_signature != signature:
+                    index = orjson.loads((path / "index.json").read_bytes())
+                    if tuple(index["source_signature"]) != signature:
+                        return None
+                    store = ExpressionStore(path, index)
+                    ExpressionStore._open_stores[key] = store
+        return store
+
+    def has_genes(self, genes: Sequence[str]) -> bool:
+        return all(g in self.offsets for g in genes)
+
+    def gene(self, gene: str) -> np.ndarray:
+        """一个基因在所有样本上的表达向量（只读视图）"""
+        return self.values[self.offsets[gene]]
+
+    def frame(
+        self, columns: Sequence[str], sample_type: Optional[str] = None
+    ) -> pd.DataFrame:
+        """按列名组装 DataFrame，样本列来自 samples.parquet，基因列来自矩阵"""
+        mask = None
+        if sample_type is not None:
+            mask = (self.samples["sample_type"] == sample_type).to_numpy()
+        data = {}
+        for c in columns:
+            if c in self.offsets:
+                vector = self.gene(c)
+                data[c] = np.asarray(vector[mask] if mask is not None else vector)
+            else:
+                series = self.samples[c]
+                data[c] = (series[mask] if mask is not None else series).to_numpy()
+        return pd.DataFrame(data, columns=list(columns))
+
+
+    def sample_mask(self, sample_type: Optional[str]) -> np.ndarray:
+        if sample_type is None:
+            return np.ones(len(self.samples), dtype=bool)
+        return (self.samples["sample_type"] == sample_type).to_numpy()
+
+    def zscores(
+        self, sample_type: Optional[str] = "01"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按基因标准化的表达矩阵（只含 sample_type 的样本）
+
+        缺失值标准化后记为 0（即以均值填补）。首次调用时分块计算并写入
+        存储目录，之后以内存映射方式打开。
+
+        Returns:
+            (zscores, std)：(n_genes, n_selected) 的 float32 内存映射矩阵，
+            与每个基因的标准差（0 表示该基因在这些样本中为常数）
+        """
+        key = sample_type or "all"
+        cached = self._zscores.get(key)
+        if cached is not None:
+            return cached
+        with ExpressionStore._lock:
+            cached = self._zscores.get(key)
+            if cached is None:
+                matrix_path = self.path / f"zscore_{key}.npy"
+                std_path = self.path / f"zscore_{key}.std.npy"
+                if not matrix_path.exists() or not std_path.exists():
+                    self._write_zscores(
+                        self.sample_mask(sample_type), matrix_path, std_path
+                    )
+                cached = (np.load(matrix_path, mmap_mode="r"), np.load(std_path))
+                self._zscores[key] = cached
+        return cached
+
+    def _write_zscores(
+        self, mask: np.ndarray, matrix_path: Path, std_path: Path
+    ) -> None:
+        n_genes = self.values.shape[0]
+        part = matrix_path.with_name(f".{matrix_path.name}.{os.getpid()}.part")
+        zscores = np.lib.format.open_memmap(
+            part, mode="w+", dtype=np.float32, shape=(n_genes, int(mask.sum()))
+        )
+        stds = np.zeros(n_genes, dtype=np.float64)
+        for start in range(0, n_genes, ZSCORE_ROW_BATCH):
+            block = self.values[start : start + ZSCORE_ROW_BATCH][:, mask]
+            block = block.astype(np.float64)
+            observed = ~np.isnan(block)
+            count = np.maximum(observed.sum(axis=1, keepdims=True), 1)
+            mean = np.nansum(block, axis=1, keepdims=True) / count
+            centered = np.where(observed, block - mean, 0.0)
+            std = np.sqrt((centered**2).sum(axis=1, keepdims=True) / count)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                z = np.where(std > 0, centered / std, 0.0)
+            zscores[start : start + len(block)] = z
+            stds[start : start + len(block)] = std[:, 0]
+        zscores.flush()
+        del zscores
+        std_part = std_path.with_name(f".{std_path.name}.{os.getpid()}.part.npy")
+        np.save(std_part, stds)
+        os.replace(std_part, std_path)
+        os.replace(part, matrix_path)
+        logger.info(f"Wrote standardized matrix {matrix_path}")
+
+
+@contextmanager
+def _build_lock(parquet_path: Path) -> Iterator[None]:
+    """跨进程的构建锁（flock 同目录的锁文件）"""
+    target = store_dir(parquet_path)
+    with open(target.with_name(f".{target.name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build_store(parquet_path: Path) -> Path:
+    """
+    从宽表 Parquet 构建基因主序存储
+
+    按基因列分批读取并写入对应的矩阵行，峰值内存约为
+    BUILD_COLUMN_BATCH 个基因列的大小。在构建锁内进行；拿到锁时存储
+    已由其他进程建好则直接返回。
+    """
+    with _build_lock(parquet_path):
+        if ExpressionStore.for_parquet(parquet_path) is not None:
+            return store_dir(parquet_path)
+        return _build(parquet_path)
+
+
+def _build(parquet_path: Path) -> Path:
+    """写入带进程号的临时目录，完成后整体替换存储目录"""
+    parquet_file = pq.ParquetFile(parquet_path)
+    schema = parquet_file.schema_arrow
+    genes = [
+        f.name
+        for f in schema
+        if pa.types.is_floating(f.type) or pa.types.is_integer(f.type)
+    ]
+    sample_columns = [f.name for f in schema if f.name not in set(genes)]
+    n_samples = parquet_file.metadata.num_rows
+    if not genes or n_samples == 0:
+        raise ValueError(f"No numeric columns or rows to store in {parquet_path}")
+    signature = _signature(parquet_path)
+
+    target = store_dir(parquet_path)
+    part = target.with_name(f".{target.name}.{os.getpid()}.part")
+    shutil.rmtree(part, ignore_errors=True)
+    part.mkdir(parents=True)
+    try:
+        _write_store(parquet_file, part, genes, sample_columns, signature)
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(part, target)
+    except OSError:
+        # 锁不可用的文件系统上仍可能并发构建：目标已被别的进程替换成
+        # 一致的存储时视为构建成功
+        if ExpressionStore.for_parquet(parquet_path) is None:
+            raise
+        logger.info(f"Gene-major store for {parquet_path} was built concurrently")
+        return target
+    finally:
+        shutil.rmtree(part, ignore_errors=True)
+    logger.info(
+        f"Built gene-major store for {parquet_path} "
+        f"({len(genes)} genes x {n_samples} samples)"
+    )
+    return target
+
+
+def _write_store(
+    parquet_file: pq.ParquetFile,
+    part: Path,
+    genes: List[str],
+    sample_columns: List[str],
+    signature: Tuple[int, int],
+) -> None:
+    n_samples = parquet_file.metadata.num_rows
+    values = np.memmap(
+        part / "values.f32",
+        dtype=np.float32,
+        mode="w+",
+        shape=(len(genes), n_samples),
+    )
+    for start in range(0, len(genes), BUILD_COLUMN_BATCH):
+        batch = genes[start : start + BUILD_COLUMN_BATCH]
+        table = parquet_file.read(columns=batch)
+        for i, name in enumerate(batch):
+            column = table.column(name).to_numpy(zero_copy_only=False)
+            values[start + i] = column.astype(np.float32)
+    values.flush()
+    del values
+
+    pq.write_table(
+        parquet_file.read(columns=sample_columns), part / "samples.parquet"
+    )
+    (part / "index.json").write_bytes(
+        orjson.dumps(
+            {
+                "genes": genes,
+                "n_genes": len(genes),
+                "n_samples": n_samples,
+                "source_signature": list(signature),
+            }
+        )
+    )
+
+
+def build_all(data_dir: Path, cancer_types: Sequence[str]) -> List[Path]:
+    """为各癌种的表达文件构建（或刷新过期的）存储"""
+    built = []
+    for ct in cancer_types:
+        for filename in ("rsem_gene_tpm.parquet", "gtex_rsem_gene_tpm.parquet"):
+            path = data_dir / ct / filename
+            if path.exists() and ExpressionStore.for_parquet(path) is None:
+                built.append(build_store(path))
+    return built
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from scripts.analysis.db.tcga.tcga import TCGA_CANCER_TYPES, get_data_dir
+
+    build_all(get_data_dir(), sys.argv[1:] or TCGA_CANCER_TYPES)
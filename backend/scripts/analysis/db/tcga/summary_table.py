@@ -0,0 +1,313 @@
+"""
+泛癌表达汇总表
+
+泛癌与肿瘤/正常概览请求远多于原始数据请求。本模块为每个
+基因 × 癌种 × 样本组（Tumor / Normal / GTEx）预先计算
+n、均值、中位数、四分位数、最小值与最大值，以及肿瘤相对正常的 log2FC，
+写入数据目录下的一个 Parquet 文件：
+
+    <data_dir>/expression_summary.parquet
+
+文件按 (gene, cancer_type, sample_group) 排序，行组统计信息使按基因的
+查询只读取一个行组。文件元数据记录每个癌种源文件的 mtime 与大小；重新
+运行时只重算源文件变化的癌种，其余癌种的行原样保留。
+
+表达值已是 log2 尺度，log2FC 为肿瘤组与正常组均值之差。正常组优先使用
+TCGA 癌旁正常样本，不足 MIN_NORMAL_SAMPLES 个时使用 GTEx。
+
+构建：
+    python -m scripts.analysis.db.tcga.summary_table [BRCA LUAD ...]
+"""
+
+import logging
+import os
+import sys
+import threading
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILENAME = "expression_summary.parquet"
+# 每个癌种参与汇总的源文件与其中的样本组
+SOURCES = {
+    "rsem_gene_tpm.parquet": {"01": "Tumor", "11": "Normal"},
+    "gtex_rsem_gene_tpm.parquet": None,  # 所有样本归为 GTEx
+}
+SAMPLE_GROUPS = ["Tumor", "Normal", "GTEx"]
+STAT_COLUMNS = ["mean", "median", "q1", "q3", "min", "max"]
+QUANTILES = [0.0, 0.25, 0.5, 0.75, 1.0]
+MIN_NORMAL_SAMPLES = 3
+# 汇总时每次读取的基因列数
+SUMMARY_COLUMN_BATCH = 512
+ROW_GROUP_SIZE = 4096
+# 文件元数据中记录源文件签名的键
+SOURCES_KEY = b"summary_sources"
+
+SCHEMA = pa.schema(
+    [
+        pa.field("gene", pa.string()),
+        pa.field("cancer_type", pa.string()),
+        pa.field("sample_group", pa.string()),
+        pa.field("n", pa.int32()),
+        pa.field("mean", pa.float32()),
+        pa.field("median", pa.float32()),
+        pa.field("q1", pa.float32()),
+        pa.field("q3", pa.float32()),
+        pa.field("min", pa.float32()),
+        pa.field("max", pa.float32()),
+        pa.field("log2fc", pa.float32()),
+        pa.field("log2fc_reference", pa.string()),
+    ]
+)
+
+
+def summary_path(data_dir: Path) -> Path:
+    return data_dir / SUMMARY_FILENAME
+
+
+def source_signature(data_dir: Path, cancer_type: str) -> Optional[List[List]]:
+    """癌种源文件的 (文件名, mtime_ns, 大小)；没有表达文件时返回 None"""
+    if not (data_dir / cancer_type / "rsem_gene_tpm.parquet").exists():
+        return None
+    signature = []
+    for filename in SOURCES:
+        path = data_dir / cancer_type / filename
+        if path.exists():
+            stat = path.stat()
+            signature.append([filename, stat.st_mtime_ns, stat.st_size])
+    return signature
+
+
+_sources_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, List]]] = {}
+_lock = threading.Lock()
+
+
+def read_sources(path: Path) -> Dict[str, List]:
+    """汇总表记录的各癌种源文件签名（按汇总文件的 mtime 缓存）"""
+    stat = path.stat()
+    key = str(path.resolve())
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _sources_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    metadata = pq.read_schema(path).metadata or {}
+    sources = orjson.loads(metadata.get(SOURCES_KEY, b"{}"))
+    with _lock:
+        _sources_cache[key] = (signature, sources)
+    return sources
+
+
+def _group_stats(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """values 形状 (n_samples, n_genes)，逐基因忽略 NaN 计算统计量"""
+    n = np.sum(~np.isnan(values), axis=0)
+    if values.shape[0] == 0:
+        empty = np.full(values.shape[1], np.nan)
+        return {"n": n, **{k: empty for k in STAT_COLUMNS}}
+    # np.nanquantile 逐列处理，只用于含 NaN 的列
+    q = np.empty((len(QUANTILES), values.shape[1]))
+    has_nan = n < values.shape[0]
+    q[:, ~has_nan] = np.quantile(values[:, ~has_nan], QUANTILES, axis=0)
+    with warnings.catch_warnings():
+        # 全为 NaN 的基因得到 NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if has_nan.any():
+            q[:, has_nan] = np.nanquantile(values[:, has_nan], QUANTILES, axis=0)
+        mean = np.nanmean(values, axis=0)
+    return {
+        "n": n,
+        "mean": mean,
+        "min": q[0],
+        "q1": q[1],
+        "median": q[2],
+        "q3": q[3],
+        "max": q[4],
+    }
+
+
+def summarize_cancer_type(
+    data_dir: Path, cancer_type: str, genes: Optional[Sequence[str]] = None
+) -> pa.Table:
+    """
+    一个癌种的汇总行
+
+    Args:
+        data_dir: 数据根目录
+        cancer_type: 癌种
+        genes: 只汇总这些基因（默认表达文件中的全部数值列）
+
+    Returns:
+        pa.Table: SCHEMA 形状的汇总行（未排序）
+    """
+    expression = pq.ParquetFile(data_dir / cancer_type / "rsem_gene_tpm.parquet")
+    schema = expression.schema_arrow
+    numeric = [
+        f.name
+        for f in schema
+        if pa.types.is_floating(f.type) or pa.types.is_integer(f.type)
+    ]
+    if genes is not None:
+        numeric_set = set(numeric)
+        numeric = [g for g in genes if g in numeric_set]
+
+    # 每个样本组：(源文件, 行掩码)
+    groups: Dict[str, Tuple[pq.ParquetFile, np.ndarray]] = {}
+    sample_type = expression.read(columns=["sample_type"]).column(0).to_numpy(
+        zero_copy_only=False
+    )
+    for code, label in SOURCES["rsem_gene_tpm.parquet"].items():
+        groups[label] = (expression, sample_type == code)
+    gtex_path = data_dir / cancer_type / "gtex_rsem_gene_tpm.parquet"
+    gtex = pq.ParquetFile(gtex_path) if gtex_path.exists() else None
+    if gtex is not None:
+        groups["GTEx"] = (gtex, np.ones(gtex.metadata.num_rows, dtype=bool))
+        gtex_columns = set(gtex.schema_arrow.names)
+
+    batches = []
+    for start in range(0, len(numeric), SUMMARY_COLUMN_BATCH):
+        batch = numeric[start : start + SUMMARY_COLUMN_BATCH]
+        matrices = {expression: _read_matrix(expression, batch)}
+        if gtex is not None:
+            matrices[gtex] = _read_matrix(gtex, batch, available=gtex_columns)
+        stats = {
+            label: _group_stats(matrices[source][mask])
+            for label, (source, mask) in groups.items()
+        }
+        batches.append(_batch_table(cancer_type, batch, stats))
+
+    if not batches:
+        return SCHEMA.empty_table()
+    return pa.concat_tables(batches)
+
+
+def _read_matrix(
+    parquet_file: pq.ParquetFile,
+    columns: List[str],
+    available: Optional[set] = None,
+) -> np.ndarray:
+    """(n_rows, len(columns)) 的 float64 矩阵，缺失的列为 NaN"""
+    present = [j for j, c in enumerate(columns) if available is None or c in available]
+    table = parquet_file.read(columns=[columns[j] for j in present])
+    matrix = np.full((parquet_file.metadata.num_rows, len(columns)), np.nan)
+    for i, j in enumerate(present):
+        matrix[:, j] = table.column(i).to_numpy(zero_copy_only=False)
+    return matrix
+
+
+def _batch_table(
+    cancer_type: str, genes: List[str], stats: Dict[str, Dict[str, np.ndarray]]
+) -> pa.Table:
+    tumor = stats["Tumor"]
+    # log2FC 参照：癌旁正常样本足够时用 TCGA Normal，否则用 GTEx
+    use_tcga = stats["Normal"]["n"] >= MIN_NORMAL_SAMPLES
+    use_gtex = np.zeros_like(use_tcga)
+    reference_mean = stats["Normal"]["mean"]
+    if "GTEx" in stats:
+        use_gtex = ~use_tcga & (stats["GTEx"]["n"] >= MIN_NORMAL_SAMPLES)
+        reference_mean = np.where(use_gtex, stats["GTEx"]["mean"], reference_mean)
+    log2fc = np.where(use_tcga | use_gtex, tumor["mean"] - reference_mean, np.nan)
+    reference = np.select([use_tcga, use_gtex], ["Normal", "GTEx"], "").astype(object)
+    reference[reference == ""] = None
+
+    columns: Dict[str, list] = {name: [] for name in SCHEMA.names}
+    for label in SAMPLE_GROUPS:
+        if label not in stats:
+            continue
+        group = stats[label]
+        keep = group["n"] > 0
+        columns["gene"].append(np.asarray(genes, dtype=object)[keep])
+        columns["cancer_type"].append(np.full(keep.sum(), cancer_type, dtype=object))
+        columns["sample_group"].append(np.full(keep.sum(), label, dtype=object))
+        for name in ["n"] + STAT_COLUMNS:
+            columns[name].append(group[name][keep])
+        columns["log2fc"].append(log2fc[keep])
+        columns["log2fc_reference"].append(reference[keep])
+
+    arrays = []
+    for field in SCHEMA:
+        values = np.concatenate(columns[field.name])
+        if pa.types.is_floating(field.type):
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def build_summary(
+    data_dir: Path, cancer_types: Sequence[str], force: bool = False
+) -> List[str]:
+    """
+    构建或增量更新汇总表
+
+    Args:
+        data_dir: 数据根目录
+        cancer_types: 需要检查更新的癌种（没有表达文件的跳过）
+        force: 忽略已有签名，全部重算
+
+    Returns:
+        List[str]: 本次重新汇总的癌种
+    """
+    path = summary_path(data_dir)
+    existing = None
+    sources: Dict[str, List] = {}
+    if path.exists() and not force:
+        existing = pq.read_table(path)
+        sources = read_sources(path)
+
+    # 源文件已删除的癌种从表中移除
+    removed = [ct for ct in sources if source_signature(data_dir, ct) is None]
+    current = {ct: sig for ct, sig in sources.items() if ct not in removed}
+    stale = []
+    for ct in cancer_types:
+        signature = source_signature(data_dir, ct)
+        if signature is not None and sources.get(ct) != signature:
+            stale.append(ct)
+            current[ct] = signature
+    if existing is not None and not stale and not removed:
+        return []
+
+    tables = []
+    if existing is not None:
+        keep = pc.invert(
+            pc.is_in(existing["cancer_type"], pa.array(stale + removed, pa.string()))
+        )
+        tables.append(existing.filter(keep).cast(SCHEMA))
+    for ct in stale:
+        tables.append(summarize_cancer_type(data_dir, ct))
+        logger.info(f"Summarized expression for {ct}")
+
+    table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+    table = table.sort_by(
+        [("gene", "ascending"), ("cancer_type", "ascending"), ("sample_group", "ascending")]
+    )
+    table = table.replace_schema_metadata(
+        {SOURCES_KEY: orjson.dumps({ct: current[ct] for ct in sorted(current)})}
+    )
+
+    part = path.with_name(f".{path.name}.part")
+    pq.write_table(
+        table,
+        part,
+        row_group_size=ROW_GROUP_SIZE,
+        compression="zstd",
+        write_statistics=True,
+    )
+    os.replace(part, path)
+    logger.info(
+        f"Wrote {path} ({table.num_rows} rows; rebuilt {', '.join(stale) or 'none'})"
+    )
+    return stale
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from scripts.analysis.db.tcga.tcga import TCGA_CANCER_TYPES, get_data_dir
+
+    build_summary(get_data_dir(), sys.argv[1:] or TCGA_CANCER_TYPES)
@@ -0,0 +1,471 @@
+"""
+生存统计的向量化计算（不依赖 R）
+
+- kaplan_meier：Kaplan-Meier 曲线，Greenwood 方差与 log 变换置信区间
+  （与 R survfit 的默认设置一致）
+- logrank_test：两组 log-rank 检验
+- cox_ph / cox_binary：单协变量 Cox 比例风险模型，结点按 Efron 近似处理
+  （与 R coxph 的默认设置一致），Wald 置信区间与 p 值
+- scan_genes：对一批基因按阈值分为高/低表达组，同时完成 log-rank 与 Cox
+
+批量计算的做法：随访数据按时间只排序一次（EventTimes），分组或协变量是
+(n_samples, n_columns) 矩阵。风险集上的求和由沿样本轴的反向累加得到，
+同一时间点上的求和是相邻时间点风险集求和之差，所有列同时计算。
+
+矩阵中的缺失值（NaN）不属于任何分组，该列的风险集中也不计入这些样本。
+
+最优阈值（cutpoint="optimal"）在 [min_fraction, 1 - min_fraction] 分位数
+范围内的候选阈值中选取 log-rank 统计量最大者，与 survminer::surv_cutpoint
+的思路相同；所得 p 值未对阈值选择做校正，偏乐观。
+"""
+
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+CUTPOINT_METHODS = ("median", "mean", "optimal")
+# 最优阈值搜索的候选分位数个数
+CUTPOINT_CANDIDATES = 33
+COX_MAX_ITER = 20
+# 与 R coxph 相同：对数偏似然的相对变化小于该值时收敛
+COX_EPS = 1e-9
+
+
+class EventTimes:
+    """按时间排序一次的随访数据，供多批分组/协变量矩阵复用"""
+
+    def __init__(self, time: np.ndarray, event: np.ndarray):
+        time = np.asarray(time, dtype=np.float64)
+        self.order = np.argsort(time, kind="stable")
+        self.time = time[self.order]
+        self.event = np.asarray(event, dtype=np.float64)[self.order]
+        self.n = len(time)
+        # 每个不同时间点在排序后数组中的起始位置
+        self.starts = np.flatnonzero(np.r_[True, np.diff(self.time) != 0])
+        self.block_time = self.time[self.starts]
+        self.n_events = self.per_time(self.event)
+        # 有事件发生的时间点
+        self.event_blocks = np.flatnonzero(self.n_events > 0)
+
+    def sorted(self, values: np.ndarray) -> np.ndarray:
+        """按时间顺序重排样本（第 0 维）"""
+        return np.asarray(values)[self.order]
+
+    def at_risk(self, values: np.ndarray) -> np.ndarray:
+        """已排序矩阵在每个时间点的风险集求和（时间 >= t 的样本）"""
+        if self.n == 0:
+            return values[:0]
+        # 布尔矩阵按 int32 计数，比默认的 int64 / float64 累加快
+        dtype = np.int32 if values.dtype == bool else None
+        return np.cumsum(values[::-1], axis=0, dtype=dtype)[::-1][self.starts]
+
+    def per_time(self, values: np.ndarray) -> np.ndarray:
+        """已排序矩阵在每个时间点上的求和（相邻时间点风险集求和之差）"""
+        at_risk = self.at_risk(values)
+        return at_risk - np.concatenate([at_risk[1:], np.zeros_like(at_risk[:1])])
+
+
+def kaplan_meier(
+    time: np.ndarray, event: np.ndarray, confidence: float = 0.95
+) -> pd.DataFrame:
+    """
+    Kaplan-Meier 生存曲线
+
+    Returns:
+        pd.DataFrame: 每个不同时间点一行（time, n_risk, n_event, n_censor,
+        survival, std_err, lower, upper）；std_err 为累积风险的标准误，
+        生存率为 0 之后置信区间为空
+    """
+    times = EventTimes(time, event)
+    if times.n == 0:
+        return pd.DataFrame(
+            columns=["time", "n_risk", "n_event", "n_censor", "survival"]
+            + ["std_err", "lower", "upper"]
+        )
+    n_risk = (times.n - times.starts).astype(np.float64)
+    n_event = np.asarray(times.n_events)
+    n_total = np.diff(np.r_[times.starts, times.n])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        survival = np.cumprod(1 - n_event / n_risk)
+        std_err = np.sqrt(np.cumsum(n_event / (n_risk * (n_risk - n_event))))
+        z = stats.norm.ppf(1 - (1 - confidence) / 2)
+        lower = survival * np.exp(-z * std_err)
+        upper = np.minimum(survival * np.exp(z * std_err), 1.0)
+    undefined = survival <= 0
+    std_err[undefined] = np.nan
+    lower[undefined] = np.nan
+    upper[undefined] = np.nan
+    return pd.DataFrame(
+        {
+            "time": times.block_time,
+            "n_risk": n_risk.astype(np.int64),
+            "n_event": n_event.astype(np.int64),
+            "n_censor": (n_total - n_event).astype(np.int64),
+            "survival": survival,
+            "std_err": std_err,
+            "lower": lower,
+            "upper": upper,
+        }
+    )
+
+
+def _as_matrix(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _as_mask(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=bool)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _group_counts(
+    times: EventTimes, groups: np.ndarray, observed: Optional[np.ndarray]
+) -> Tuple[np.ndarray, ...]:
+    """
+    有事件的时间点上全部有效样本与第一组的风险集人数、事件数
+
+    Returns:
+        (n_risk, deaths, risk1, deaths1)：float64，行对应 times.event_blocks
+    """
+    in_group = times.sorted(_as_mask(groups))
+    events = times.event[:, None] > 0
+    if observed is None:
+        n_risk = (times.n - times.starts)[:, None]
+        deaths = times.n_events[:, None]
+    else:
+        valid = times.sorted(_as_mask(observed))
+        in_group = in_group & valid
+        n_risk = times.at_risk(valid)
+        deaths = times.per_time(valid & events)
+    risk1 = times.at_risk(in_group)
+    deaths1 = times.per_time(in_group & events)
+    return tuple(
+        c[times.event_blocks].astype(np.float64)
+        for c in (n_risk, deaths, risk1, deaths1)
+    )
+
+
+def _logrank(counts: Tuple[np.ndarray, ...]) -> Dict[str, np.ndarray]:
+    n_risk, deaths, risk1, deaths1 = counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(n_risk > 0, risk1 / n_risk, 0.0)
+        expected = np.sum(deaths * share, axis=0)
+        ties = np.where(n_risk > 1, (n_risk - deaths) / (n_risk - 1), 1.0)
+        variance = np.sum(deaths * share * (1 - share) * ties, axis=0)
+        observed1 = deaths1.sum(axis=0)
+        chi2 = np.where(variance > 0, (observed1 - expected) ** 2 / variance, np.nan)
+    return {
+        "chi2": chi2,
+        "p_value": stats.chi2.sf(chi2, 1),
+        "observed": observed1,
+        "expected": expected,
+    }
+
+
+def logrank_test(
+    times: EventTimes,
+    groups: np.ndarray,
+    observed: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    两组 log-rank 检验，对 groups 的每一列同时计算
+
+    Args:
+        times: 随访数据
+        groups: (n_samples,) 或 (n_samples, n_columns)，True 为第一组
+        observed: 与 groups 同形状，False 的样本不参与该列的检验
+
+    Returns:
+        Dict: chi2、p_value，以及第一组的实际/期望事件数 observed、expected
+    """
+    return _logrank(_group_counts(times, groups, observed))
+
+
+def _tie_rows(
+    times: EventTimes, deaths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Efron 近似把同一时间点的 d 个事件展开为 d 行，第 l 行从风险集中扣除
+    l/d 的事件权重。行按全部样本的事件数展开；deaths 为每列在有事件的
+    时间点上的有效事件数，每列只有前 d 行参与。
+
+    Returns:
+        (event_block, tie_fraction, tie_active)：每行所属的时间点，
+        以及 (n_rows, n_columns) 的 l/d 与参与标记
+    """
+    n_events = times.n_events[times.event_blocks].astype(np.int64)
+    event_block = np.repeat(np.arange(len(n_events)), n_events)
+    first = np.repeat(np.cumsum(n_events) - n_events, n_events)
+    tie_index = (np.arange(len(event_block)) - first)[:, None]
+    column_events = deaths[event_block]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tie_fraction = np.where(column_events > 0, tie_index / column_events, 0.0)
+    return event_block, tie_fraction, tie_index < column_events
+
+
+def _newton(
+    evaluate: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, ...]],
+    n_columns: int,
+    confidence: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Newton-Raphson，各列同时迭代、分别收敛；对数偏似然下降的列步长减半
+
+    Args:
+        evaluate: (beta, columns) -> (对数偏似然, 得分, 信息量)，beta 与
+            返回值都只含 columns 指定的列
+    """
+    beta = np.zeros(n_columns)
+    todo = np.arange(n_columns)
+    loglik, score, information = evaluate(beta, todo)
+    for _ in range(COX_MAX_ITER):
+        if len(todo) == 0:
+            break
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(
+                information[todo] > 0, score[todo] / information[todo], 0.0
+            )
+        candidate = beta[todo] + step
+        new = list(evaluate(candidate, todo))
+        for _ in range(10):
+            worse = np.flatnonzero(new[0] < loglik[todo] - 1e-12)
+            if len(worse) == 0:
+                break
+            candidate[worse] = (beta[todo[worse]] + candidate[worse]) / 2
+            for k, value in enumerate(evaluate(candidate[worse], todo[worse])):
+                new[k][worse] = value
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.abs(new[0] - loglik[todo]) / np.maximum(
+                np.abs(new[0]), 1e-300
+            )
+        beta[todo] = candidate
+        loglik[todo], score[todo], information[todo] = new
+        # 收敛（或无法计算）的列不再迭代
+        todo = todo[change > COX_EPS]
+
+    # 单调似然（某组没有事件）时系数发散，风险比为 inf
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        se = np.where(information > 0, 1 / np.sqrt(information), np.nan)
+        z = stats.norm.ppf(1 - (1 - confidence) / 2)
+        coef = np.where(np.isnan(se), np.nan, beta)
+        return {
+            "coef": coef,
+            "se": se,
+            "hazard_ratio": np.exp(coef),
+            "lower": np.exp(coef - z * se),
+            "upper": np.exp(coef + z * se),
+            "p_value": 2 * stats.norm.sf(np.abs(coef / se)),
+        }
+
+
+def cox_ph(
+    times: EventTimes,
+    covariates: np.ndarray,
+    observed: Optional[np.ndarray] = None,
+    confidence: float = 0.95,
+) -> Dict[str, np.ndarray]:
+    """
+    单协变量 Cox 比例风险模型，对 covariates 的每一列分别拟合
+
+    每次迭代对 (n_samples, n_columns) 的权重矩阵做反向累加；二分类协变量
+    用 cox_binary 更快。
+
+    Args:
+        times: 随访数据
+        covariates: (n_samples,) 或 (n_samples, n_columns)
+        observed: 与 covariates 同形状，False 的样本不参与该列的拟合
+
+    Returns:
+        Dict: coef、se、hazard_ratio、lower、upper、p_value（Wald 检验）
+    """
+    x = times.sorted(_as_matrix(covariates))
+    if observed is None:
+        valid = np.ones_like(x)
+    else:
+        valid = times.sorted(_as_matrix(observed)).astype(np.float64)
+    x = np.where(valid > 0, x, 0.0)
+    # 按列中心化避免 exp 溢出，系数不变
+    center = np.sum(x * valid, axis=0) / np.maximum(valid.sum(axis=0), 1)
+    x = (x - center) * valid
+    events = times.event[:, None] * valid
+    blocks = times.event_blocks
+    event_block, tie_fraction, tie_active = _tie_rows(
+        times, times.per_time(events)[blocks]
+    )
+
+    def evaluate(beta: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, ...]:
+        xs, dead = x[:, columns], events[:, columns]
+        risk = np.exp(np.clip(beta * xs, -700, 700)) * valid[:, columns]
+        weights = [risk, risk * xs, risk * xs * xs]
+        # 风险集求和 S 与同一时间点事件样本的求和 D，只保留有事件的时间点
+        s = [times.at_risk(w)[blocks][event_block] for w in weights]
+        d = [times.per_time(w * dead)[blocks][event_block] for w in weights]
+        fraction = tie_fraction[:, columns]
+        a, b, c = (s[k] - fraction * d[k] for k in range(3))
+        active = tie_active[:, columns] & (a > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(active, b / a, 0.0)
+            log_a = np.where(active, np.log(a), 0.0)
+            loglik = np.sum(dead * beta * xs, axis=0) - log_a.sum(axis=0)
+            score = np.sum(dead * xs, axis=0) - ratio.sum(axis=0)
+            information = np.sum(np.where(active, c / a, 0.0) - ratio**2, axis=0)
+        return loglik, score, information
+
+    return _newton(evaluate, x.shape[1], confidence)
+
+
+def _cox_binary(
+    times: EventTimes, counts: Tuple[np.ndarray, ...], confidence: float
+) -> Dict[str, np.ndarray]:
+    n_risk, deaths, risk1, deaths1 = np.broadcast_arrays(*counts)
+    event_block, tie_fraction, tie_active = _tie_rows(times, deaths)
+    # 展开到 Efron 行：风险集中扣除 l/d 的事件后两组的剩余人数
+    rest1 = risk1[event_block] - tie_fraction * deaths1[event_block]
+    rest0 = (n_risk - risk1)[event_block] - tie_fraction * (deaths - deaths1)[
+        event_block
+    ]
+    events1 = deaths1.sum(axis=0)
+
+    def evaluate(beta: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, ...]:
+        theta = np.exp(np.clip(beta, -700, 700))
+        b = rest1[:, columns] * theta
+        a = rest0[:, columns] + b
+        active = tie_active[:, columns] & (a > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(active, b / a, 0.0)
+            log_a = np.where(active, np.log(a), 0.0)
+        loglik = beta * events1[columns] - log_a.sum(axis=0)
+        score = events1[columns] - ratio.sum(axis=0)
+        information = np.sum(ratio - ratio**2, axis=0)
+        return loglik, score, information
+
+    return _newton(evaluate, risk1.shape[1], confidence)
+
+
+def cox_binary(
+    times: EventTimes,
+    groups: np.ndarray,
+    observed: Optional[np.ndarray] = None,
+    confidence: float = 0.95,
+) -> Dict[str, np.ndarray]:
+    """
+    二分类协变量（第一组 vs 第二组）的 Cox 模型，结果与 cox_ph 相同
+
+    协变量只有两个取值时偏似然只依赖每个时间点两组的风险集人数与事件数，
+    这些计数与 log-rank 共用，迭代只在有事件的时间点上进行，与样本数无关。
+    """
+    return _cox_binary(times, _group_counts(times, groups, observed), confidence)
+
+
+def _cutpoints(
+    times: EventTimes,
+    values: np.ndarray,
+    observed: Optional[np.ndarray],
+    method: str,
+    min_fraction: float,
+) -> np.ndarray:
+    """每列的分组阈值（表达值大于阈值为高表达组）"""
+    # 没有缺失值时用更快的非 nan 版本
+    complete = observed is None
+    if method == "median":
+        return np.median(values, axis=0) if complete else np.nanmedian(values, axis=0)
+    if method == "mean":
+        return np.mean(values, axis=0) if complete else np.nanmean(values, axis=0)
+
+    # optimal：候选阈值取实际出现的表达值，每列 CUTPOINT_CANDIDATES 个
+    grid = np.linspace(min_fraction, 1 - min_fraction, CUTPOINT_CANDIDATES)
+    quantile = np.quantile if complete else np.nanquantile
+    candidates = quantile(values, grid, axis=0, method="inverted_cdf")
+    k, m = candidates.shape
+    # (n_samples, k * m)：第 j 个候选阈值下的第 i 列位于 j * m + i
+    high = (values[:, None, :] > candidates[None]).reshape(len(values), k * m)
+    if complete:
+        n_valid = np.full(m, len(values))
+    else:
+        n_valid = observed.sum(axis=0)
+        observed = np.broadcast_to(
+            observed[:, None, :], (len(values), k, m)
+        ).reshape(len(values), k * m)
+    chi2 = logrank_test(times, high, observed)["chi2"].reshape(k, m)
+    n_high = high.sum(axis=0).reshape(k, m)
+    balanced = (n_high >= min_fraction * n_valid) & (
+        n_valid - n_high >= min_fraction * n_valid
+    )
+    chi2 = np.where(balanced & ~np.isnan(chi2), chi2, -1.0)
+    best = np.argmax(chi2, axis=0)
+    return candidates[best, np.arange(m)]
+
+
+def scan_genes(
+    times: EventTimes,
+    values: np.ndarray,
+    cutpoint: str = "median",
+    min_fraction: float = 0.1,
+) -> Dict[str, np.ndarray]:
+    """
+    一批基因的高/低表达组生存比较
+
+    Args:
+        times: 随访数据
+        values: (n_samples, n_genes) 表达矩阵，样本顺序与 times 构造时一致
+        cutpoint: 分组阈值（median, mean, optimal）
+        min_fraction: 每组样本数占比下限；optimal 只在该范围内搜索阈值，
+            分组不满足该下限的基因结果为空
+
+    Returns:
+        Dict: 每个基因一个值 - cutpoint、n_high、n_low、chi2、logrank_p，
+        以及高表达组相对低表达组的 hazard_ratio、hr_lower、hr_upper、cox_p
+    """
+    if cutpoint not in CUTPOINT_METHODS:
+        raise ValueError(f"Invalid cutpoint method: {cutpoint}")
+    values = _as_matrix(values)
+    observed = ~np.isnan(values)
+    n_valid = observed.sum(axis=0)
+    if observed.all():
+        observed = None
+    with np.errstate(invalid="ignore"):
+        thresholds = _cutpoints(times, values, observed, cutpoint, min_fraction)
+        high = values > thresholds
+    n_high = high.sum(axis=0)
+    min_size = np.maximum(min_fraction * n_valid, 1)
+    balanced = (n_high >= min_size) & (n_valid - n_high >= min_size)
+
+    counts = _group_counts(times, high, observed)
+    logrank = _logrank(counts)
+    cox = _cox_binary(times, counts, confidence=0.95)
+    result = {
+        "cutpoint": thresholds,
+        "n_high": n_high,
+        "n_low": n_valid - n_high,
+        "chi2": logrank["chi2"],
+        "logrank_p": logrank["p_value"],
+        "hazard_ratio": cox["hazard_ratio"],
+        "hr_lower": cox["lower"],
+        "hr_upper": cox["upper"],
+        "cox_p": cox["p_value"],
+    }
+    for key in ("chi2", "logrank_p", "hazard_ratio", "hr_lower", "hr_upper", "cox_p"):
+        result[key] = np.where(balanced, result[key], np.nan)
+    return result
+
+
+def summarize_groups(
+    time: np.ndarray,
+    event: np.ndarray,
+    high: Union[np.ndarray, pd.Series],
+) -> Dict[str, float]:
+    """单个基因的 log-rank p 值与高表达组的风险比（含置信区间）"""
+    times = EventTimes(time, event)
+    counts = _group_counts(times, np.asarray(high, dtype=np.float64), None)
+    logrank = _logrank(counts)
+    cox = _cox_binary(times, counts, confidence=0.95)
+    return {
+        "logrank_p": float(logrank["p_value"][0]),
+        "hazard_ratio": float(cox["hazard_ratio"][0]),
+        "hr_lower": float(cox["lower"][0]),
+        "hr_upper": float(cox["upper"][0]),
+        "cox_p": float(cox["p_value"][0]),
+    }
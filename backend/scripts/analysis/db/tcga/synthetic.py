@@ -0,0 +1,357 @@
+"""
+合成 TCGA 形态数据集
+
+CI 与开发环境没有真实的 TCGA Parquet 文件，加载函数只能返回空表。本模块按
+tcga.py 读取的布局为若干癌种生成形态相近的数据：
+
+    <data_dir>/<cancer_type>/
+    ├── rsem_gene_tpm.parquet        # 样本 × 基因宽表（patient, sample, sample_type, 基因列...）
+    ├── gtex_rsem_gene_tpm.parquet   # 对应组织的 GTEx 正常样本，同样的基因列
+    ├── clinical.parquet             # 每个患者一行，列同 CLINICAL_COLUMNS
+    ├── mc3_maf.parquet              # 每个突变一行（Hugo_Symbol, Variant_Classification...）
+    └── gistic2_thresholded.parquet  # 样本 × 基因的 GISTIC2 阈值化拷贝数（-2..2）
+
+表达值为 log2(TPM + 1) 尺度，基因之间通过少量潜在因子相关；部分基因在肿瘤中
+上调或下调，PROGNOSTIC_GENES 的表达影响生存时间。相同的参数与 seed 生成
+相同的文件。
+
+生成：
+    python -m scripts.analysis.db.tcga.synthetic /tmp/tcga --genes 2000 --samples 500 BRCA LUAD
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# 始终包含的常用基因，其余基因名为 GENE00001 形式
+KNOWN_GENES = [
+    "TP53",
+    "EGFR",
+    "BRCA1",
+    "BRCA2",
+    "KRAS",
+    "PTEN",
+    "MYC",
+    "PIK3CA",
+    "CDKN2A",
+    "ERBB2",
+    "ESR1",
+    "GAPDH",
+    "ACTB",
+    "CD8A",
+    "CD274",
+    "MKI67",
+]
+
+# 表达与生存时间相关的基因（高表达 → 风险升高）
+PROGNOSTIC_GENES = {"MKI67": 0.4, "MYC": 0.25, "ESR1": -0.3}
+
+# 突变频率高于背景的驱动基因
+DRIVER_MUTATION_RATES = {"TP53": 0.35, "PIK3CA": 0.25, "KRAS": 0.15, "PTEN": 0.08}
+BACKGROUND_MUTATION_RATE = 0.02
+
+MUTATION_CLASSES = [
+    ("Missense_Mutation", 0.6),
+    ("Silent", 0.15),
+    ("Nonsense_Mutation", 0.08),
+    ("Frame_Shift_Del", 0.06),
+    ("Frame_Shift_Ins", 0.03),
+    ("Splice_Site", 0.04),
+    ("In_Frame_Del", 0.02),
+    ("3'UTR", 0.02),
+]
+
+STAGES = ["Stage I", "Stage II", "Stage III", "Stage IV"]
+
+# 宽表每个行组的样本数
+ROW_GROUP_SAMPLES = 1024
+N_FACTORS = 8
+
+
+def gene_names(n_genes: int) -> List[str]:
+    """n_genes 个基因名：先是 KNOWN_GENES，不足部分按序号补齐"""
+    names = KNOWN_GENES[:n_genes]
+    names += [f"GENE{i:05d}" for i in range(1, n_genes - len(names) + 1)]
+    return names
+
+
+class _ExpressionModel:
+    """一个癌种的表达分布：基因均值、因子载荷与肿瘤/正常差异"""
+
+    def __init__(self, genes: List[str], rng: np.random.Generator):
+        n = len(genes)
+        self.genes = genes
+        self.log_mean = rng.normal(2.0, 1.5, n).astype(np.float32)
+        self.loadings = rng.normal(0, 0.35, (N_FACTORS, n)).astype(np.float32)
+        self.noise = rng.uniform(0.3, 0.8, n).astype(np.float32)
+        # 约 10% 的基因在肿瘤中差异表达
+        self.tumor_shift = np.where(
+            rng.random(n) < 0.1, rng.normal(0, 1.2, n), 0
+        ).astype(np.float32)
+
+    def sample(self, tumor: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """(len(tumor), n_genes) 的 log2(TPM + 1) 值，tumor 为每个样本是否肿瘤"""
+        n = len(tumor)
+        factors = rng.standard_normal((n, N_FACTORS), dtype=np.float32)
+        values = factors @ self.loadings + self.log_mean
+        values += rng.standard_normal((n, len(self.genes)), dtype=np.float32) * self.noise
+        values[tumor] += self.tumor_shift
+        return np.maximum(values, 0, out=values)
+
+
+def _write_wide(
+    path: Path,
+    sample_columns: Dict[str, List[str]],
+    genes: List[str],
+    draw,
+    dtype: pa.DataType = pa.float32(),
+) -> None:
+    """按行组分批写入样本 × 基因宽表，draw(start, stop) 返回该批的矩阵"""
+    n = len(next(iter(sample_columns.values())))
+    schema = pa.schema(
+        [pa.field(c, pa.string()) for c in sample_columns]
+        + [pa.field(g, dtype) for g in genes]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, n, ROW_GROUP_SAMPLES):
+            stop = min(start + ROW_GROUP_SAMPLES, n)
+            # 转置为基因主序，每列一段连续内存
+            matrix = np.ascontiguousarray(draw(start, stop).T)
+            arrays = [pa.array(v[start:stop]) for v in sample_columns.values()]
+            arrays += [pa.array(column, type=dtype) for column in matrix]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def generate_cancer_type(
+    data_dir: Path,
+    cancer_type: str,
+    genes: List[str],
+    n_samples: int,
+    normal_fraction: float = 0.1,
+    n_gtex: int = 100,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """
+    为一个癌种写入全部数据文件
+
+    Args:
+        data_dir: 数据根目录
+        cancer_type: 癌种代码（目录名）
+        genes: 基因列
+        n_samples: 肿瘤样本（患者）数
+        normal_fraction: 同时有癌旁正常样本的患者比例
+        n_gtex: GTEx 正常样本数
+        seed: 随机种子
+
+    Returns:
+        Dict: 各文件的行数
+    """
+    rng = np.random.default_rng(seed)
+    directory = data_dir / cancer_type
+    directory.mkdir(parents=True, exist_ok=True)
+    model = _ExpressionModel(genes, rng)
+
+    patients = [f"TCGA-{cancer_type[:2]}-{i:06d}" for i in range(n_samples)]
+    n_normal = int(n_samples * normal_fraction)
+
+    # 表达：肿瘤样本在前，癌旁正常样本在后；逐行组生成，
+    # 只保留预后基因的肿瘤表达用于生成生存时间
+    is_tumor = np.arange(n_samples + n_normal) < n_samples
+    prognostic = [g for g in PROGNOSTIC_GENES if g in genes]
+    prognostic_idx = [genes.index(g) for g in prognostic]
+    prognostic_values = np.zeros((n_samples + n_normal, len(prognostic)))
+
+    def draw_expression(start: int, stop: int) -> np.ndarray:
+        values = model.sample(is_tumor[start:stop], rng)
+        prognostic_values[start:stop] = values[:, prognostic_idx]
+        return values
+
+    _write_wide(
+        directory / "rsem_gene_tpm.parquet",
+        {
+            "patient": patients + patients[:n_normal],
+            "sample": [f"{p}-01A" for p in patients]
+            + [f"{p}-11A" for p in patients[:n_normal]],
+            "sample_type": ["01"] * n_samples + ["11"] * n_normal,
+        },
+        genes,
+        draw_expression,
+    )
+
+    gtex_ids = [f"GTEX-{cancer_type[:2]}{i:05d}" for i in range(n_gtex)]
+    _write_wide(
+        directory / "gtex_rsem_gene_tpm.parquet",
+        {"patient": gtex_ids, "sample": gtex_ids, "sample_type": ["GTEx"] * n_gtex},
+        genes,
+        lambda start, stop: model.sample(np.zeros(stop - start, dtype=bool), rng),
+    )
+
+    n_rows = {
+        "expression": n_samples + n_normal,
+        "gtex": n_gtex,
+        "clinical": n_samples,
+    }
+    _write_clinical(
+        directory,
+        cancer_type,
+        patients,
+        dict(zip(prognostic, prognostic_values[:n_samples].T)),
+        rng,
+    )
+    n_rows["mutation"] = _write_mutations(directory, patients, genes, rng)
+    _write_wide(
+        directory / "gistic2_thresholded.parquet",
+        {"patient": patients, "sample": [f"{p}-01A" for p in patients]},
+        genes,
+        lambda start, stop: rng.choice(
+            np.array([-2, -1, 0, 1, 2], dtype=np.int8),
+            (stop - start, len(genes)),
+            p=[0.03, 0.12, 0.7, 0.12, 0.03],
+        ),
+        dtype=pa.int8(),
+    )
+    n_rows["cnv"] = n_samples
+    return n_rows
+
+
+def _write_clinical(
+    directory: Path,
+    cancer_type: str,
+    patients: List[str],
+    prognostic: Dict[str, np.ndarray],
+    rng: np.random.Generator,
+) -> None:
+    n = len(patients)
+    risk = np.zeros(n)
+    for gene, x in prognostic.items():
+        risk += PROGNOSTIC_GENES[gene] * (x - x.mean()) / (x.std() or 1.0)
+    stage = rng.integers(0, len(STAGES), n)
+    risk += 0.3 * stage
+
+    columns = {
+        "patient_barcode": patients,
+        "type": [cancer_type] * n,
+        "age": rng.integers(25, 90, n),
+        "gender": rng.choice(["FEMALE", "MALE"], n).tolist(),
+    }
+    # 指数分布事件时间 + 均匀删失
+    for endpoint, base_days in (("OS", 1800), ("DFI", 1500), ("PFI", 1200), ("DFS", 1400)):
+        event_time = rng.exponential(base_days * np.exp(-risk))
+        censor_time = rng.uniform(30, 4000, n)
+        event = (event_time <= censor_time).astype(np.int64)
+        time = np.round(np.minimum(event_time, censor_time), 1)
+        # 少量随访缺失
+        missing = rng.random(n) < 0.03
+        columns[endpoint] = pa.array(event, mask=missing)
+        columns[f"{endpoint}_time"] = pa.array(time, mask=missing)
+    columns["T"] = [f"T{s + 1}" for s in rng.integers(0, 4, n)]
+    columns["N"] = [f"N{s}" for s in rng.integers(0, 3, n)]
+    columns["M"] = [f"M{s}" for s in (stage == 3).astype(int)]
+    columns["stage"] = [STAGES[s] for s in stage]
+    columns["grade"] = [f"G{g}" for g in rng.integers(1, 4, n)]
+    pq.write_table(pa.table(columns), directory / "clinical.parquet")
+
+
+def _write_mutations(
+    directory: Path,
+    patients: List[str],
+    genes: List[str],
+    rng: np.random.Generator,
+) -> int:
+    rates = np.array(
+        [DRIVER_MUTATION_RATES.get(g, BACKGROUND_MUTATION_RATE) for g in genes],
+        dtype=np.float32,
+    )
+    patient_idx, gene_idx = [], []
+    for start in range(0, len(patients), ROW_GROUP_SAMPLES):
+        stop = min(start + ROW_GROUP_SAMPLES, len(patients))
+        hits = rng.random((stop - start, len(genes)), dtype=np.float32) < rates
+        rows, cols = np.nonzero(hits)
+        patient_idx.append(rows + start)
+        gene_idx.append(cols)
+    patient_idx = np.concatenate(patient_idx)
+    gene_idx = np.concatenate(gene_idx)
+    classes, weights = zip(*MUTATION_CLASSES)
+    weights = np.asarray(weights) / np.sum(weights)
+    classification = rng.choice(classes, len(patient_idx), p=weights)
+    patient_ids = np.asarray(patients)[patient_idx]
+    symbols = np.asarray(genes)[gene_idx]
+    pq.write_table(
+        pa.table(
+            {
+                "patient": patient_ids,
+                "Tumor_Sample_Barcode": np.char.add(patient_ids, "-01A"),
+                "Hugo_Symbol": symbols,
+                "gene": symbols,
+                "Variant_Classification": classification,
+                "mutation_type": classification,
+                "Start_Position": rng.integers(1, 2_000_000, len(patient_idx)),
+            }
+        ),
+        directory / "mc3_maf.parquet",
+    )
+    return len(patient_idx)
+
+
+def generate_dataset(
+    data_dir: Path,
+    cancer_types: Sequence[str] = ("BRCA", "LUAD"),
+    n_genes: int = 2000,
+    n_samples: int = 500,
+    normal_fraction: float = 0.1,
+    n_gtex: int = 100,
+    seed: int = 0,
+    genes: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    为多个癌种生成合成数据集
+
+    Returns:
+        Dict: 癌种 → 各文件的行数
+    """
+    data_dir = Path(data_dir)
+    genes = list(genes) if genes else gene_names(n_genes)
+    summary = {}
+    for i, ct in enumerate(cancer_types):
+        summary[ct] = generate_cancer_type(
+            data_dir,
+            ct,
+            genes,
+            n_samples,
+            normal_fraction=normal_fraction,
+            n_gtex=n_gtex,
+            seed=seed + i,
+        )
+        logger.info(
+            f"Generated {ct}: {len(genes)} genes, {summary[ct]['expression']} samples"
+        )
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="生成合成 TCGA 数据集")
+    parser.add_argument("data_dir", type=Path)
+    parser.add_argument("cancer_types", nargs="*", default=["BRCA", "LUAD"])
+    parser.add_argument("--genes", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--normal-fraction", type=float, default=0.1)
+    parser.add_argument("--gtex", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_dataset(
+        args.data_dir,
+        args.cancer_types,
+        n_genes=args.genes,
+        n_samples=args.samples,
+        normal_fraction=args.normal_fraction,
+        n_gtex=args.gtex,
+        seed=args.seed,
+    )
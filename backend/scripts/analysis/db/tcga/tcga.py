@@ -11,15 +11,40 @@ TCGA 数据分析工具
 7. pan_cancer_expression - 泛癌表达分析
 8. expression_correlation - 表达相关性分析
 9. pathway_analysis - 通路分析
+10. expression_summary - 泛癌表达汇总（预计算汇总表）
+11. expression_correlation_matrix - 多基因相关性矩阵
+12. coexpression_scan - 全基因组共表达扫描
+13. survival_scan - 多基因生存扫描
 """
 
-import duckdb as ddb
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from typing import Dict, Any, List, Optional, Union
 import logging
 from pathlib import Path
 
+from app.utils.analysis_result import AnalysisResult
+from app.utils.duckdb_pool import DuckDBPool, select_list
+from scripts.analysis.db.tcga import summary_table
+from scripts.analysis.db.tcga.correlation import (
+    benjamini_hochberg,
+    correlation_pvalues,
+    pairwise_correlation,
+)
+from scripts.analysis.db.tcga.expression_store import ExpressionStore, build_store
+from scripts.analysis.db.tcga.survival import (
+    CUTPOINT_CANDIDATES,
+    CUTPOINT_METHODS,
+    EventTimes,
+    kaplan_meier,
+    scan_genes,
+    summarize_groups,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -99,6 +124,22 @@ VARIANT_TYPES = [
 ]
 
 
+# 样本类型编码
+SAMPLE_TYPE_LABELS = {"01": "Tumor", "11": "Normal"}
+
+CNV_CATEGORIES = ["amplification", "deletion", "normal"]
+
+# 临床分组比较对应 clinical.parquet 中的列
+CLINICAL_COMPARISONS = {
+    "pathologic_stage": "stage",
+    "pathologic_t": "T",
+    "pathologic_n": "N",
+    "pathologic_m": "M",
+    "pathologic_grade": "grade",
+    "gender": "gender",
+}
+
+
 # 从配置文件读取数据路径
 def get_tcga_data_dir() -> Path:
     """
@@ -218,8 +259,7 @@ def _load_tcga_data(
         logger.warning(f"No data files found for {cancer_type}, using mock data")
         return pd.DataFrame()
 
-    # 使用 DuckDB 读取 parquet 文件
-    conn = ddb.connect()
+    # 使用共享的 DuckDB 连接池读取 parquet 文件
     all_data = []
 
     try:
@@ -229,23 +269,22 @@ def _load_tcga_data(
                 logger.warning(f"File not found: {file_path}")
                 continue
 
-            # 将路径转换为绝对路径字符串
-            file_path_str = str(file_path.resolve())
-
-            # 读取 parquet 文件
-            query = f"SELECT * FROM read_parquet('{file_path_str}')"
+            query = f"SELECT * FROM {DuckDBPool.view(file_path)}"
+            params: List[Any] = []
 
             # 如果是 expression 数据且有基因筛选，添加 WHERE 条件
             if data_type == "expression" and gene:
                 # 假设表达数据有 'gene' 或 'gene_id' 列
-                query += f" WHERE gene = '{gene}' OR gene_id = '{gene}'"
+                query += " WHERE gene = ? OR gene_id = ?"
+                params = [gene, gene]
 
             # 如果是 mutation 数据且有基因筛选
             elif data_type == "mutation" and gene:
-                query += f" WHERE Hugo_Symbol = '{gene}' OR gene = '{gene}'"
+                query += " WHERE Hugo_Symbol = ? OR gene = ?"
+                params = [gene, gene]
 
             # 执行查询并获取 DataFrame
-            df = conn.execute(query).df()
+            df = DuckDBPool.query_df(query, params)
 
             if len(df) > 0:
                 df["cancer_type"] = ct
@@ -262,21 +301,22 @@ def _load_tcga_data(
     except Exception as e:
         logger.error(f"Error loading TCGA data: {str(e)}", exc_info=True)
         return pd.DataFrame()
-    finally:
-        conn.close()
 
 
 def _load_expression_data(
-    cancer_type: str = "all", columns: List[str] = None, sample_type: str = "all"
+    cancer_type: str = "all",
+    columns: List[str] = None,
+    sample_type: str = "all",
+    filename: str = "rsem_gene_tpm.parquet",
 ) -> pd.DataFrame:
     """
-    加载表达数据（使用 DuckDB 读取 Parquet 文件）
+    加载表达数据
+
+    指定了列且存在最新的基因主序存储（见 expression_store.py）时直接按
+    偏移读取基因向量，否则使用 DuckDB 读取 Parquet 文件。
     """
     data_dir = get_data_dir()
-    filename = "rsem_gene_tpm.parquet"
     path = data_dir / cancer_type / filename
-    if columns is None:
-        columns = ["*"]
     if sample_type != "all":
         if sample_type == "tumor":
             sample_type = "01"
@@ -284,10 +324,26 @@ def _load_expression_data(
             sample_type = "11"
         else:
             raise ValueError(f"Invalid sample type: {sample_type}")
-        query = f"SELECT {', '.join(columns)} FROM '{path}' WHERE sample_type == '{sample_type}'"
-    else:
-        query = f"SELECT {', '.join(columns)} FROM '{path}'"
-    return ddb.query(query).df()
+
+    if columns and columns != ["*"]:
+        store = ExpressionStore.for_parquet(path)
+        if store is not None and _store_covers(store, columns, sample_type):
+            return store.frame(
+                columns, sample_type=None if sample_type == "all" else sample_type
+            )
+
+    query = f"SELECT {select_list(columns)} FROM {DuckDBPool.view(path)}"
+    if sample_type != "all":
+        return DuckDBPool.query_df(f"{query} WHERE sample_type = ?", [sample_type])
+    return DuckDBPool.query_df(query)
+
+
+def _store_covers(store: ExpressionStore, columns: List[str], sample_type: str) -> bool:
+    """基因主序存储是否包含查询需要的全部列"""
+    sample_columns = set(store.samples.columns)
+    if sample_type != "all" and "sample_type" not in sample_columns:
+        return False
+    return all(c in store.offsets or c in sample_columns for c in columns)
 
 
 def _load_survival_data(
@@ -299,13 +355,64 @@ def _load_survival_data(
     data_dir = get_data_dir()
     filename = "clinical.parquet"
     path = data_dir / cancer_type / filename
-    if columns is None:
-        columns = ["*"]
+    for c in columns or []:
+        if c not in CLINICAL_COLUMNS:
+            raise ValueError(f"Invalid column: {c}")
+    return DuckDBPool.query_df(
+        f"SELECT {select_list(columns)} FROM {DuckDBPool.view(path)}"
+    )
+
+
+def _open_store(path: Path) -> ExpressionStore:
+    """打开表达文件的基因主序存储，不存在或已过期时先构建"""
+    store = ExpressionStore.for_parquet(path)
+    if store is None:
+        logger.info(f"Building gene-major store for {path}")
+        build_store(path)
+        store = ExpressionStore.for_parquet(path)
+    return store
+
+
+def _merge_clinical(
+    expression: pd.DataFrame,
+    cancer_type: str,
+    columns: List[str],
+    drop_missing: bool = False,
+) -> pd.DataFrame:
+    """
+    按患者把临床列连接到表达数据
+
+    列选择与缺失值过滤在 DuckDB 中完成，只把需要的临床行读入 pandas，
+    再按 patient 做一次内连接（保持表达数据的行序）。
+
+    Returns:
+        pd.DataFrame: 表达数据的各列加上 columns
+    """
+    clinical = _load_clinical(cancer_type, columns, drop_missing)
+    return expression.merge(clinical, on="patient")
+
+
+def _load_clinical(
+    cancer_type: str, columns: List[str], drop_missing: bool = False
+) -> pd.DataFrame:
+    """临床数据的 patient 列加上 columns，drop_missing 时去掉有缺失值的行"""
     for c in columns:
         if c not in CLINICAL_COLUMNS:
             raise ValueError(f"Invalid column: {c}")
-    query = f"SELECT {', '.join(columns)} FROM '{path}'"
-    return ddb.query(query).df()
+    path = get_data_dir() / cancer_type / "clinical.parquet"
+    query = (
+        f"SELECT patient_barcode AS patient, {select_list(columns)} "
+        f"FROM {DuckDBPool.view(path)}"
+    )
+    if drop_missing:
+        query += " WHERE " + " AND ".join(
+            f"{select_list([c])} IS NOT NULL" for c in columns
+        )
+    clinical = DuckDBPool.query_df(query)
+    if drop_missing:
+        # 浮点列中的 NaN 不是 SQL NULL
+        clinical = clinical.dropna(subset=columns)
+    return clinical
 
 
 def _load_mutation_data(
@@ -317,22 +424,21 @@ def _load_mutation_data(
     data_dir = get_data_dir()
     filename = "mc3_maf.parquet"
     path = data_dir / cancer_type / filename
-    if columns is None:
-        columns = ["*"]
+    query = f"SELECT {select_list(columns)} FROM {DuckDBPool.view(path)}"
     if variant_type != "all":
         if variant_type not in VARIANT_TYPES:
             raise ValueError(f"Invalid variant type: {variant_type}")
-        query = f"SELECT {', '.join(columns)} FROM '{path}' WHERE Variant_Classification == '{variant_type}'"
-    else:
-        query = f"SELECT {', '.join(columns)} FROM '{path}'"
-    return ddb.query(query).df()
+        return DuckDBPool.query_df(
+            f"{query} WHERE Variant_Classification = ?", [variant_type]
+        )
+    return DuckDBPool.query_df(query)
 
 
 def differential_expression(
     gene: str,
     cancer_type: str = "BRCA",
     comparison: str = "tumor_vs_normal",
-) -> Dict[str, Any]:
+) -> Union[AnalysisResult, Dict[str, Any]]:
     """
     差异表达分析
 
@@ -342,36 +448,36 @@ def differential_expression(
         comparison: 比较组类型
 
     Returns:
-        Dict: 包含差异表达分析结果的字典
+        AnalysisResult: 各组样本的表达数据；出错时返回包含 error 的字典
     """
     logger.info(f"Running differential expression analysis for {gene} in {cancer_type}")
 
     # 加载数据
     try:
-        # TCGA data
-        path = get_data_dir() / cancer_type / "rsem_gene_tpm.parquet"
-        data = None
         if "tumor" in comparison:
             tcga_data = _load_expression_data(
                 cancer_type=cancer_type, columns=["patient", "sample_type", gene]
             )
-            normal_data = tcga_data.query('sample_type == "11"')
+            is_normal = tcga_data["sample_type"] == "11"
+            normal_data = tcga_data[is_normal]
             if comparison == "tumor_vs_normal":
-                tumor_data = tcga_data.query(
-                    'sample_type == "01" and patient not in @normal_data.patient'
-                )
+                tumor_data = tcga_data[
+                    (tcga_data["sample_type"] == "01")
+                    & ~tcga_data["patient"].isin(normal_data["patient"])
+                ]
                 # GTEx data
-                path = get_data_dir() / cancer_type / "gtex_rsem_gene_tpm.parquet"
-                gtex_data = ddb.query(f"SELECT patient, {gene} FROM '{path}'").df()
+                gtex_data = _load_expression_data(
+                    cancer_type=cancer_type,
+                    columns=["patient", gene],
+                    filename="gtex_rsem_gene_tpm.parquet",
+                )
                 data = pd.concat([tumor_data, normal_data, gtex_data])
-                data["sample_type"] = data["sample_type"].apply(
-                    lambda x: (
-                        "Normal" if x == "11" else ("Tumor" if x == "01" else "GTEx")
-                    )
+                data["sample_type"] = (
+                    data["sample_type"].map(SAMPLE_TYPE_LABELS).fillna("GTEx")
                 )
                 data = data[["patient", "sample_type", gene]]
             elif comparison == "paired_tumor_vs_normal":
-                tumor_data = tcga_data.query('sample_type == "01"')
+                tumor_data = tcga_data[tcga_data["sample_type"] == "01"]
                 merged_data = pd.merge(
                     tumor_data,
                     normal_data,
@@ -381,84 +487,30 @@ def differential_expression(
                 data = merged_data.melt(
                     id_vars="patient", var_name="sample_type", value_name=gene
                 )
-                data["sample_type"] = data["sample_type"].apply(
-                    lambda x: ("Normal" if x == f"{gene}_Normal" else "Tumor")
+                data["sample_type"] = np.where(
+                    data["sample_type"] == f"{gene}_Normal", "Normal", "Tumor"
                 )
                 data = data[["patient", "sample_type", gene]].sort_values(by="patient")
             else:
                 raise ValueError(f"Invalid comparison: {comparison}")
         else:
+            clinical_column = CLINICAL_COMPARISONS.get(comparison)
+            if clinical_column is None:
+                raise ValueError(f"Invalid comparison: {comparison}")
             tcga_data = _load_expression_data(
                 cancer_type=cancer_type, columns=["patient", gene], sample_type="tumor"
             )
-            if comparison == "pathologic_stage":
-                clinical_data = _load_survival_data(
-                    cancer_type=cancer_type, columns=["patient_barcode", "stage"]
-                )
-                data = pd.merge(
-                    tcga_data,
-                    clinical_data,
-                    left_on="patient",
-                    right_on="patient_barcode",
-                )[["patient", "stage", gene]]
-            elif comparison == "pathologic_t":
-                clinical_data = _load_survival_data(
-                    cancer_type=cancer_type, columns=["patient_barcode", "T"]
-                )
-                data = pd.merge(
-                    tcga_data,
-                    clinical_data,
-                    left_on="patient",
-                    right_on="patient_barcode",
-                )[["patient", "T", gene]]
-            elif comparison == "pathologic_n":
-                clinical_data = _load_survival_data(
-                    cancer_type=cancer_type, columns=["patient_barcode", "N"]
-                )
-                data = pd.merge(
-                    tcga_data,
-                    clinical_data,
-                    left_on="patient",
-                    right_on="patient_barcode",
-                )[["patient", "N", gene]]
-            elif comparison == "pathologic_m":
-                clinical_data = _load_survival_data(
-                    cancer_type=cancer_type, columns=["patient_barcode", "M"]
-                )
-                data = pd.merge(
-                    tcga_data,
-                    clinical_data,
-                    left_on="patient",
-                    right_on="patient_barcode",
-                )[["patient", "M", gene]]
-            elif comparison == "pathologic_grade":
-                clinical_data = _load_survival_data(
-                    cancer_type=cancer_type, columns=["patient_barcode", "grade"]
-                )
-                data = pd.merge(
-                    tcga_data,
-                    clinical_data,
-                    left_on="patient",
-                    right_on="patient_barcode",
-                )[["patient", "grade", gene]]
-            elif comparison == "gender":
-                clinical_data = _load_survival_data(
-                    cancer_type=cancer_type, columns=["patient_barcode", "gender"]
-                )
-                data = pd.merge(
-                    tcga_data,
-                    clinical_data,
-                    left_on="patient",
-                    right_on="patient_barcode",
-                )[["patient", "gender", gene]]
-            else:
-                raise ValueError(f"Invalid comparison: {comparison}")
+            data = _merge_clinical(tcga_data, cancer_type, [clinical_column])[
+                ["patient", clinical_column, gene]
+            ]
 
     except Exception as e:
         logger.error(f"Error loading TCGA data: {str(e)}", exc_info=True)
         return {"error": str(e)}
     else:
-        return data.to_json(orient="records")
+        return AnalysisResult.from_frame(
+            data, gene=gene, cancer_type=cancer_type, comparison=comparison
+        )
 
 
 def expression_correlation(
@@ -467,7 +519,7 @@ def expression_correlation(
     cancer_type: str = "BRCA",
     method: str = "pearson",
     min_samples: int = 30,
-) -> Dict[str, Any]:
+) -> Union[AnalysisResult, Dict[str, Any]]:
     """
     表达相关性分析（仅返回数据，分析在 R 绘图部分完成）
 
@@ -479,7 +531,7 @@ def expression_correlation(
         min_samples: 最小样本数
 
     Returns:
-        Dict: 包含原始数据的字典，分析结果将在 R 绘图部分生成
+        AnalysisResult: 原始数据表，分析结果将在 R 绘图部分生成
     """
     logger.info(
         f"Loading expression correlation data for {gene_x} and {gene_y} in {cancer_type}"
@@ -496,14 +548,12 @@ def expression_correlation(
         return {"error": f"Insufficient samples (need at least {min_samples})"}
 
     # 只返回原始数据，不进行任何分析
-    result = {
-        "data": data.to_json(orient="records"),
-        "cancer_type": cancer_type,
-        "method": method,  # 保留方法参数供 R 绘图使用
-        "n_samples": len(data),
-    }
-
-    return result
+    return AnalysisResult.from_frame(
+        data,
+        cancer_type=cancer_type,
+        method=method,  # 保留方法参数供 R 绘图使用
+        n_samples=len(data),
+    )
 
 
 def survival_analysis(
@@ -514,9 +564,13 @@ def survival_analysis(
     expression_level_value: float = 0,
     high_label: str = "High",
     low_label: str = "Low",
-) -> Dict[str, Any]:
+) -> Union[AnalysisResult, Dict[str, Any]]:
     """
-    生存分析（仅返回数据，分析在 R 绘图部分完成）
+    生存分析
+
+    返回按表达阈值分组的原始数据；log-rank p 值、高表达组相对低表达组的
+    风险比（Cox，Efron 结点处理）与各组 Kaplan-Meier 曲线在 Python 中计算，
+    放在元数据中。
 
     Args:
         gene: 基因名称
@@ -527,7 +581,8 @@ def survival_analysis(
         low_label: 低表达组标签 - 保留用于 R 绘图
 
     Returns:
-        Dict: 包含原始数据的字典，分析结果将在 R 绘图部分生成
+        AnalysisResult: 原始数据表；元数据含 logrank_p、hazard_ratio、hr_lower、
+        hr_upper、cox_p 与 km_curves（每组的 time、n_risk、survival、lower、upper）
     """
     logger.info(f"Loading survival analysis data for {gene} in {cancer_type}")
 
@@ -535,26 +590,18 @@ def survival_analysis(
     expression_data = _load_expression_data(
         cancer_type=cancer_type, columns=["patient", gene], sample_type="tumor"
     )
-    # 加载生存数据
-    survival_data = _load_survival_data(
-        cancer_type=cancer_type,
-        columns=["patient_barcode", survival_type, f"{survival_type}_time"],
-    )
-
-    if len(expression_data) == 0 or len(survival_data) == 0:
+    if len(expression_data) == 0:
         return {"error": "No data available"}
 
     # 合并表达数据和生存数据，过滤掉缺失值
-    data = (
-        pd.merge(
-            expression_data,
-            survival_data,
-            left_on="patient",
-            right_on="patient_barcode",
-        )
-        .query(f"~{survival_type}_time.isna() and ~{survival_type}.isna()")
-        .drop(columns=["patient_barcode"])
+    data = _merge_clinical(
+        expression_data,
+        cancer_type,
+        [survival_type, f"{survival_type}_time"],
+        drop_missing=True,
     )
+    if len(data) == 0:
+        return {"error": "No data available"}
     # 分组
     if expression_level == "mean":
         expression_level_value = float(data[gene].mean())
@@ -568,23 +615,293 @@ def survival_analysis(
         expression_level_value = expression_level_value
     else:
         raise ValueError(f"Invalid expression level: {expression_level}")
-    data["group"] = data[gene].apply(
-        lambda x: high_label if x > expression_level_value else low_label
+    high = data[gene] > expression_level_value
+    data["group"] = np.where(high, high_label, low_label)
+
+    time = data[f"{survival_type}_time"].to_numpy()
+    event = data[survival_type].to_numpy()
+    km_curves = {}
+    for label, members in ((high_label, high), (low_label, ~high)):
+        members = members.to_numpy()
+        if members.any():
+            curve = kaplan_meier(time[members], event[members])
+            km_curves[label] = curve[
+                ["time", "n_risk", "survival", "lower", "upper"]
+            ].to_dict("list")
+
+    return AnalysisResult.from_frame(
+        data,
+        gene=gene,
+        cancer_type=cancer_type,
+        survival_type=survival_type,
+        expression_level=expression_level,  # 保留参数供 R 绘图使用
+        high_label=high_label,  # 保留参数供 R 绘图使用
+        low_label=low_label,  # 保留参数供 R 绘图使用
+        n_samples=len(data),
+        **summarize_groups(time, event, high),
+        km_curves=km_curves,
     )
 
-    # 只返回原始数据，不进行任何分析
-    result = {
-        "data": data.to_json(orient="records"),
-        "gene": gene,
-        "cancer_type": cancer_type,
-        "survival_type": survival_type,
-        "expression_level": expression_level,  # 保留参数供 R 绘图使用
-        "high_label": high_label,  # 保留参数供 R 绘图使用
-        "low_label": low_label,  # 保留参数供 R 绘图使用
-        "n_samples": len(data),
-    }
 
-    return result
+# 生存扫描每批处理的矩阵元素数（样本数 × 基因数 × 候选阈值数）
+SURVIVAL_SCAN_CELLS = 1 << 23
+
+
+def survival_scan(
+    genes: Optional[Union[List[str], str]] = None,
+    cancer_type: str = "BRCA",
+    survival_type: str = "OS",
+    cutpoint: str = "median",
+    min_group_fraction: float = 0.1,
+    top_k: Optional[int] = 50,
+) -> Union[AnalysisResult, Dict[str, Any]]:
+    """
+    多基因生存扫描
+
+    每个基因按阈值把肿瘤样本分为高/低表达组，比较两组生存。随访数据只排序
+    一次，基因按批从基因主序存储读出，每批的 log-rank 与 Cox 对所有基因
+    同时计算（见 survival.py）。存储不存在时先构建。
+
+    Args:
+        genes: 基因列表（或逗号分隔的字符串），为空时扫描全部基因
+        cancer_type: 癌种类型
+        survival_type: 生存类型（OS, DFS, PFS, DSS 等）
+        cutpoint: 分组阈值（median, mean, optimal）；optimal 的 p 值未对
+            阈值选择做校正
+        min_group_fraction: 每组样本数占比下限，不满足的基因不参与检验
+        top_k: 按 log-rank p 值返回的基因数，None 返回全部
+
+    Returns:
+        AnalysisResult: 每个基因一行（gene, cutpoint, n_high, n_low,
+        logrank_p, fdr, hazard_ratio, hr_lower, hr_upper, cox_p），按 p 值
+        升序；FDR 为对全部参与检验的基因做 Benjamini-Hochberg 校正
+    """
+    if cutpoint not in CUTPOINT_METHODS:
+        raise ValueError(f"Invalid cutpoint method: {cutpoint}")
+    logger.info(f"Running survival scan in {cancer_type} ({survival_type})")
+
+    path = get_data_dir() / cancer_type / "rsem_gene_tpm.parquet"
+    if not path.exists():
+        return {"error": f"No expression data for {cancer_type}"}
+    store = _open_store(path)
+    if isinstance(genes, str):
+        genes = genes.split(",")
+    if genes:
+        genes = list(dict.fromkeys(g.strip() for g in genes if g.strip()))
+        missing = [g for g in genes if g not in store.offsets]
+        if missing:
+            return {"error": f"Genes not found: {', '.join(missing)}"}
+    else:
+        genes = store.genes
+
+    # 肿瘤样本在存储矩阵中的列号，连接临床数据后与随访数据同序
+    mask = store.sample_mask("01")
+    samples = pd.DataFrame(
+        {
+            "patient": store.samples["patient"].to_numpy()[mask],
+            "column": np.flatnonzero(mask),
+        }
+    )
+    data = _merge_clinical(
+        samples,
+        cancer_type,
+        [survival_type, f"{survival_type}_time"],
+        drop_missing=True,
+    )
+    if len(data) < 3:
+        return {"error": "Insufficient samples (need at least 3)"}
+    times = EventTimes(data[f"{survival_type}_time"], data[survival_type])
+    columns = data["column"].to_numpy()
+
+    rows = np.array([store.offsets[g] for g in genes])
+    candidates = CUTPOINT_CANDIDATES if cutpoint == "optimal" else 1
+    batch = max(1, SURVIVAL_SCAN_CELLS // (len(columns) * candidates))
+    batches = []
+    for start in range(0, len(rows), batch):
+        values = store.values[rows[start : start + batch]][:, columns]
+        batches.append(
+            scan_genes(times, values.T.astype(np.float64), cutpoint, min_group_fraction)
+        )
+    result = {k: np.concatenate([b[k] for b in batches]) for k in batches[0]}
+    result["fdr"] = benjamini_hochberg(result["logrank_p"])
+
+    # 未参与检验（p 值为 NaN）的基因排在最后
+    order = np.argsort(result["logrank_p"], kind="stable")
+    if top_k is not None:
+        order = order[: max(1, top_k)]
+    names = ["cutpoint", "n_high", "n_low", "logrank_p", "fdr"]
+    names += ["hazard_ratio", "hr_lower", "hr_upper", "cox_p"]
+    table = pa.table(
+        {
+            "gene": [genes[i] for i in order],
+            **{k: pa.array(result[k][order], from_pandas=True) for k in names},
+        }
+    )
+    return AnalysisResult(
+        table,
+        {
+            "cancer_type": cancer_type,
+            "survival_type": survival_type,
+            "cutpoint": cutpoint,
+            "n_samples": len(columns),
+            "n_events": int(times.event.sum()),
+            "n_genes_tested": int(np.sum(~np.isnan(result["logrank_p"]))),
+        },
+    )
+
+
+# 相关性矩阵最多包含的基因数
+MAX_MATRIX_GENES = 200
+
+
+def expression_correlation_matrix(
+    genes: Union[List[str], str],
+    cancer_type: str = "BRCA",
+    method: str = "pearson",
+    min_samples: int = 30,
+) -> Union[AnalysisResult, Dict[str, Any]]:
+    """
+    多基因表达相关性矩阵
+
+    一次投影读取所有基因的肿瘤样本表达，向量化计算全部基因对的相关系数
+    与 p 值（缺失值按 pairwise-complete 处理，见 correlation.py）。
+
+    Args:
+        genes: 基因列表（或逗号分隔的字符串）
+        cancer_type: 癌种类型
+        method: 相关性方法（pearson, spearman, kendall）
+        min_samples: 基因对的最小有效样本数，不足时 r 与 p 值为空
+
+    Returns:
+        AnalysisResult: 长表，每个有序基因对 (gene_x, gene_y) 一行，含 r、
+        p_value 与 n，可直接作为热图输入；元数据 genes 为矩阵的基因顺序
+    """
+    if isinstance(genes, str):
+        genes = genes.split(",")
+    genes = list(dict.fromkeys(g.strip() for g in genes if g.strip()))
+    if len(genes) < 2:
+        return {"error": "At least 2 genes are required"}
+    if len(genes) > MAX_MATRIX_GENES:
+        return {"error": f"Too many genes (max {MAX_MATRIX_GENES})"}
+
+    logger.info(
+        f"Loading expression correlation matrix for {len(genes)} genes in {cancer_type}"
+    )
+
+    path = get_data_dir() / cancer_type / "rsem_gene_tpm.parquet"
+    if not path.exists():
+        return {"error": f"No expression data for {cancer_type}"}
+    available = set(pq.read_schema(path).names)
+    missing = [g for g in genes if g not in available]
+    if missing:
+        return {"error": f"Genes not found: {', '.join(missing)}"}
+
+    data = _load_expression_data(
+        cancer_type=cancer_type, columns=genes, sample_type="tumor"
+    )
+    if len(data) < min_samples:
+        return {"error": f"Insufficient samples (need at least {min_samples})"}
+
+    r, p, n = pairwise_correlation(
+        data[genes].to_numpy(dtype=np.float64), method, min_samples
+    )
+    k = len(genes)
+    table = pa.table(
+        {
+            "gene_x": np.repeat(genes, k),
+            "gene_y": np.tile(genes, k),
+            "r": pa.array(r.ravel(), from_pandas=True),
+            "p_value": pa.array(p.ravel(), from_pandas=True),
+            "n": n.ravel(),
+        }
+    )
+    return AnalysisResult(
+        table,
+        {
+            "genes": genes,
+            "cancer_type": cancer_type,
+            "method": method,
+            "n_samples": len(data),
+        },
+    )
+
+
+def coexpression_scan(
+    gene: str,
+    cancer_type: str = "BRCA",
+    top_k: int = 50,
+) -> Union[AnalysisResult, Dict[str, Any]]:
+    """
+    全基因组共表达扫描
+
+    使用基因主序存储中按肿瘤样本标准化的 float32 矩阵（内存映射，
+    见 ExpressionStore.zscores），查询基因与全部基因的 Pearson 相关系数
+    由一次矩阵-向量乘积得到。缺失值按均值填补。存储不存在时先构建。
+
+    Args:
+        gene: 查询基因
+        cancer_type: 癌种类型
+        top_k: 正相关与负相关各返回的基因数
+
+    Returns:
+        AnalysisResult: 正、负相关各 top_k 个基因（gene, r, p_value, fdr,
+        direction, rank），FDR 为对全部基因做 Benjamini-Hochberg 校正
+    """
+    logger.info(f"Running co-expression scan for {gene} in {cancer_type}")
+
+    path = get_data_dir() / cancer_type / "rsem_gene_tpm.parquet"
+    if not path.exists():
+        return {"error": f"No expression data for {cancer_type}"}
+    store = _open_store(path)
+    if gene not in store.offsets:
+        return {"error": f"Gene not found: {gene}"}
+
+    zscores, std = store.zscores("01")
+    n_samples = zscores.shape[1]
+    if n_samples < 3:
+        return {"error": "Insufficient samples (need at least 3)"}
+    query = store.offsets[gene]
+    if std[query] == 0:
+        return {"error": f"{gene} has constant expression in {cancer_type}"}
+
+    r = (zscores @ np.asarray(zscores[query])).astype(np.float64) / n_samples
+    r = np.clip(r, -1.0, 1.0)
+    # 常数基因与查询基因本身不参与检验
+    r[std == 0] = np.nan
+    r[query] = np.nan
+    p_values = correlation_pvalues(r, np.full(len(r), n_samples))
+    fdr = benjamini_hochberg(p_values)
+
+    tested = np.flatnonzero(~np.isnan(r))
+    top_k = max(1, min(top_k, len(tested)))
+    by_r = tested[np.argsort(r[tested], kind="stable")]
+    positive = by_r[::-1][:top_k]
+    negative = by_r[:top_k]
+    positive = positive[r[positive] > 0]
+    negative = negative[r[negative] < 0]
+    hits = np.concatenate([positive, negative])
+
+    table = pa.table(
+        {
+            "gene": [store.genes[i] for i in hits],
+            "r": r[hits],
+            "p_value": p_values[hits],
+            "fdr": fdr[hits],
+            "direction": ["positive"] * len(positive) + ["negative"] * len(negative),
+            "rank": np.concatenate(
+                [np.arange(1, len(positive) + 1), np.arange(1, len(negative) + 1)]
+            ),
+        }
+    )
+    return AnalysisResult(
+        table,
+        {
+            "gene": gene,
+            "cancer_type": cancer_type,
+            "n_samples": n_samples,
+            "n_genes_tested": len(tested),
+        },
+    )
 
 
 def gene_mutation(
@@ -619,7 +936,7 @@ def gene_mutation(
 
     # 计算突变统计
     total_samples = len(data)
-    mutated_samples = len(data[data["mutation_type"] != "None"])
+    mutated_samples = int((data["mutation_type"] != "None").sum())
     mutation_rate = mutated_samples / total_samples if total_samples > 0 else 0
 
     # 按突变类型统计
@@ -671,30 +988,28 @@ def copy_number_variation(
     )
 
     # 分类 CNV
-    data["cnv_category"] = data["cnv_value"].apply(
-        lambda x: "amplification" if x > 0 else "deletion" if x < 0 else "normal"
+    data["cnv_category"] = pd.Categorical(
+        np.select(
+            [data["cnv_value"] > 0, data["cnv_value"] < 0],
+            ["amplification", "deletion"],
+            "normal",
+        ),
+        categories=CNV_CATEGORIES,
     )
-
-    # 筛选 CNV 类型
-    if cnv_type == "amplification":
-        cnv_data = data[data["cnv_category"] == "amplification"]
-    elif cnv_type == "deletion":
-        cnv_data = data[data["cnv_category"] == "deletion"]
-    else:
-        cnv_data = data[data["cnv_category"] != "normal"]
+    counts = data["cnv_category"].value_counts()
+    total = len(data)
 
     # 计算统计
     result = {
         "gene": gene,
         "cancer_type": cancer_type,
         "cnv_type": cnv_type,
-        "total_samples": len(data),
-        "amplification_samples": len(data[data["cnv_category"] == "amplification"]),
-        "deletion_samples": len(data[data["cnv_category"] == "deletion"]),
-        "normal_samples": len(data[data["cnv_category"] == "normal"]),
-        "amplification_rate": len(data[data["cnv_category"] == "amplification"])
-        / len(data),
-        "deletion_rate": len(data[data["cnv_category"] == "deletion"]) / len(data),
+        "total_samples": total,
+        "amplification_samples": int(counts["amplification"]),
+        "deletion_samples": int(counts["deletion"]),
+        "normal_samples": int(counts["normal"]),
+        "amplification_rate": float(counts["amplification"] / total),
+        "deletion_rate": float(counts["deletion"] / total),
     }
 
     return result
@@ -809,64 +1124,200 @@ def stem_index(
     return result
 
 
+# 箱线图离群点：每组最多返回的离群值个数
+PAN_CANCER_MAX_OUTLIERS = 50
+
 def pan_cancer_expression(
     gene: str,
     cancer_types: List[str] = None,
     show_normal: bool = True,
-) -> Dict[str, Any]:
+) -> Union[AnalysisResult, Dict[str, Any]]:
     """
     泛癌表达分析
 
+    一次 DuckDB 查询扫描所有癌种的表达文件，只投影目标基因列，
+    在引擎内按 (cancer_type, sample_type) 计算均值、中位数、四分位数
+    与箱线图须线，不把原始样本行载入 Python。
+
     Args:
         gene: 基因名称
         cancer_types: 癌种列表（空列表表示所有癌种）
         show_normal: 是否显示正常组织
 
     Returns:
-        Dict: 包含泛癌表达分析结果的字典
+        AnalysisResult: 每组的箱线图统计表，元数据 results 为各癌种的汇总
     """
     logger.info(f"Running pan-cancer expression analysis for {gene}")
 
     if cancer_types is None or len(cancer_types) == 0:
         cancer_types = TCGA_CANCER_TYPES
 
-    results = {}
-    for cancer_type in cancer_types:
-        data = _load_tcga_data(
-            cancer_type=cancer_type, data_type="expression", gene=gene
+    data_dir = get_data_dir()
+    paths = [
+        str((data_dir / ct / "rsem_gene_tpm.parquet").resolve())
+        for ct in cancer_types
+        if ct in TCGA_CANCER_TYPES
+        and (data_dir / ct / "rsem_gene_tpm.parquet").exists()
+    ]
+    sample_types = ["01", "11"] if show_normal else ["01"]
+
+    stats = pa.table({"cancer_type": pa.array([], pa.string())})
+    if paths:
+        value = select_list([gene])
+        # samples 被引用两次，物化后只扫描一次文件
+        stats = DuckDBPool.query_arrow(
+            f"""
+            WITH samples AS MATERIALIZED (
+                SELECT
+                    regexp_extract(
+                        filename, '([^/\\\\]+)[/\\\\]rsem_gene_tpm\\.parquet$', 1
+                    ) AS cancer_type,
+                    CASE sample_type WHEN '01' THEN 'Tumor' ELSE 'Normal' END
+                        AS sample_type,
+                    CAST({value} AS DOUBLE) AS value
+                FROM read_parquet(?, filename = true, union_by_name = true)
+                WHERE sample_type IN (SELECT unnest(?::VARCHAR[]))
+                  AND {value} IS NOT NULL
+            ),
+            stats AS (
+                SELECT
+                    cancer_type,
+                    sample_type,
+                    count(*) AS n,
+                    avg(value) AS mean,
+                    median(value) AS median,
+                    quantile_cont(value, 0.25) AS q1,
+                    quantile_cont(value, 0.75) AS q3,
+                    min(value) AS min,
+                    max(value) AS max
+                FROM samples
+                GROUP BY cancer_type, sample_type
+            )
+            SELECT
+                st.*,
+                min(s.value) FILTER (
+                    WHERE s.value >= st.q1 - 1.5 * (st.q3 - st.q1)
+                ) AS lower_whisker,
+                max(s.value) FILTER (
+                    WHERE s.value <= st.q3 + 1.5 * (st.q3 - st.q1)
+                ) AS upper_whisker,
+                count(*) FILTER (
+                    WHERE s.value < st.q1 - 1.5 * (st.q3 - st.q1)
+                       OR s.value > st.q3 + 1.5 * (st.q3 - st.q1)
+                ) AS n_outliers,
+                coalesce(
+                    list(s.value ORDER BY abs(s.value - st.median) DESC) FILTER (
+                        WHERE s.value < st.q1 - 1.5 * (st.q3 - st.q1)
+                           OR s.value > st.q3 + 1.5 * (st.q3 - st.q1)
+                    )[1:?],
+                    []
+                ) AS outliers
+            FROM stats st
+            JOIN samples s USING (cancer_type, sample_type)
+            GROUP BY ALL
+            ORDER BY st.cancer_type, st.sample_type
+            """,
+            [paths, sample_types, PAN_CANCER_MAX_OUTLIERS],
         )
 
+    groups = {(row["cancer_type"], row["sample_type"]): row for row in stats.to_pylist()}
+
+    def _summary(cancer_type: str, label: str) -> Dict[str, Any]:
+        row = groups.get((cancer_type, label))
+        key = label.lower()
+        return {
+            f"{key}_mean": row["mean"] if row is not None else 0,
+            f"{key}_median": row["median"] if row is not None else 0,
+            f"n_{key}": row["n"] if row is not None else 0,
+        }
+
+    results = {}
+    for cancer_type in cancer_types:
+        results[cancer_type] = _summary(cancer_type, "Tumor")
         if show_normal:
-            tumor_data = data[data["sample_type"] == "Tumor"]["expression"]
-            normal_data = data[data["sample_type"] == "Normal"]["expression"]
-            results[cancer_type] = {
-                "tumor_mean": float(tumor_data.mean()) if len(tumor_data) > 0 else 0,
-                "tumor_median": (
-                    float(tumor_data.median()) if len(tumor_data) > 0 else 0
-                ),
-                "normal_mean": float(normal_data.mean()) if len(normal_data) > 0 else 0,
-                "normal_median": (
-                    float(normal_data.median()) if len(normal_data) > 0 else 0
-                ),
-                "n_tumor": len(tumor_data),
-                "n_normal": len(normal_data),
-            }
-        else:
-            tumor_data = data[data["sample_type"] == "Tumor"]["expression"]
-            results[cancer_type] = {
-                "tumor_mean": float(tumor_data.mean()) if len(tumor_data) > 0 else 0,
-                "tumor_median": (
-                    float(tumor_data.median()) if len(tumor_data) > 0 else 0
-                ),
-                "n_tumor": len(tumor_data),
-            }
-
-    return {
-        "gene": gene,
-        "cancer_types": cancer_types,
-        "show_normal": show_normal,
-        "results": results,
-    }
+            results[cancer_type].update(_summary(cancer_type, "Normal"))
+
+    return AnalysisResult(
+        stats,
+        {
+            "gene": gene,
+            "cancer_types": cancer_types,
+            "show_normal": show_normal,
+            "results": results,
+        },
+    )
+
+
+def expression_summary(
+    gene: str,
+    cancer_types: List[str] = None,
+    sample_groups: List[str] = None,
+) -> Union[AnalysisResult, Dict[str, Any]]:
+    """
+    泛癌表达汇总
+
+    从预计算的汇总表（见 summary_table.py）按基因读取各癌种、各样本组的
+    n、均值、中位数、四分位数、极值与 log2FC。汇总表缺失或某癌种源文件
+    已更新时，该癌种改为从表达文件现场汇总这一个基因。
+
+    Args:
+        gene: 基因名称
+        cancer_types: 癌种列表（空列表表示所有癌种）
+        sample_groups: 样本组（Tumor, Normal, GTEx；默认全部）
+
+    Returns:
+        AnalysisResult: 每个 (癌种, 样本组) 一行的汇总表
+    """
+    if not cancer_types:
+        cancer_types = TCGA_CANCER_TYPES
+    sample_groups = sample_groups or summary_table.SAMPLE_GROUPS
+    for group in sample_groups:
+        if group not in summary_table.SAMPLE_GROUPS:
+            raise ValueError(f"Invalid sample group: {group}")
+
+    data_dir = get_data_dir()
+    path = summary_table.summary_path(data_dir)
+    sources = summary_table.read_sources(path) if path.exists() else {}
+    fresh, stale = [], []
+    for ct in cancer_types:
+        signature = summary_table.source_signature(data_dir, ct)
+        if signature is None:
+            continue
+        (fresh if sources.get(ct) == signature else stale).append(ct)
+
+    tables = []
+    if fresh:
+        tables.append(
+            DuckDBPool.query_arrow(
+                f"""
+                SELECT * FROM {DuckDBPool.view(path)}
+                WHERE gene = ? AND cancer_type IN (SELECT unnest(?::VARCHAR[]))
+                """,
+                [gene, fresh],
+            ).cast(summary_table.SCHEMA)
+        )
+    for ct in stale:
+        logger.info(f"Expression summary for {ct} is stale, summarizing {gene}")
+        tables.append(summary_table.summarize_cancer_type(data_dir, ct, genes=[gene]))
+
+    if not tables:
+        return {"error": f"No expression data for {gene}"}
+    table = pa.concat_tables(tables)
+    table = table.filter(
+        pc.is_in(table["sample_group"], pa.array(sample_groups, pa.string()))
+    ).sort_by([("cancer_type", "ascending"), ("sample_group", "ascending")])
+    if table.num_rows == 0:
+        return {"error": f"No expression data for {gene}"}
+
+    return AnalysisResult(
+        table,
+        {
+            "gene": gene,
+            "cancer_types": cancer_types,
+            "sample_groups": sample_groups,
+            "summarized_on_demand": stale,
+        },
+    )
 
 
 def pathway_analysis(
@@ -920,6 +1371,27 @@ def pathway_analysis(
     return result
 
 
+def data_fingerprint(sub_tool: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    结果缓存使用的数据指纹（见 app/services/analysis_cache.py）
+
+    由参数涉及的癌种目录下所有 Parquet 文件的路径、mtime 与大小组成，
+    数据文件更新后指纹随之变化。数据目录不存在时返回 None，不缓存。
+    """
+    data_dir = get_data_dir()
+    if not data_dir.exists():
+        return None
+    cancer_types = params.get("cancer_types") or [params.get("cancer_type", "all")]
+    if "all" in cancer_types:
+        cancer_types = TCGA_CANCER_TYPES
+    signature = []
+    for ct in sorted(set(cancer_types)):
+        for path in sorted((data_dir / ct).glob("*.parquet")):
+            stat = path.stat()
+            signature.append(f"{ct}/{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha1("\n".join(signature).encode()).hexdigest()
+
+
 # 主函数：根据子工具名称调用相应的分析函数
 def run_analysis(sub_tool: str, params: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -951,6 +1423,14 @@ def run_analysis(sub_tool: str, params: Dict[str, Any]) -> Dict[str, Any]:
             return expression_correlation(**params)
         elif sub_tool == "pathway_analysis":
             return pathway_analysis(**params)
+        elif sub_tool == "expression_summary":
+            return expression_summary(**params)
+        elif sub_tool == "expression_correlation_matrix":
+            return expression_correlation_matrix(**params)
+        elif sub_tool == "coexpression_scan":
+            return coexpression_scan(**params)
+        elif sub_tool == "survival_scan":
+            return survival_scan(**params)
         else:
             return {"error": f"Unknown sub-tool: {sub_tool}"}
     except Exception as e:
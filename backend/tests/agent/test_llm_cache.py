@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试 LLM 响应缓存：精确匹配、语义匹配、按调用关闭与 LRU 淘汰
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.core.config import settings
+from app.utils.http_pool import HTTPClientPool
+from app.utils.llm_cache import LLMResponseCache, cache_config
+from app.utils.llm_factory import get_llm
+from tests.fake_openai_server import FakeOpenAIServer
+
+PROMPT = ChatPromptTemplate.from_messages(
+    [("system", "Give a title."), ("human", "Message: {text}")]
+)
+
+
+def _run(server, calls):
+    async def run():
+        llm = get_llm(model="fake-model", source="Custom", base_url=server.base_url, api_key="k")
+        chain = PROMPT | llm
+        try:
+            results = []
+            for text, config, stream in calls:
+                if stream:
+                    parts = [c.content async for c in chain.astream({"text": text}, config=config)]
+                    results.append("".join(parts))
+                else:
+                    results.append((await chain.ainvoke({"text": text}, config=config)).content)
+            return results
+        finally:
+            await HTTPClientPool.aclose_all()
+
+    return asyncio.run(run())
+
+
+def test_exact_hits_and_opt_out():
+    LLMResponseCache.clear()
+    with FakeOpenAIServer(response_text="Volcano plot help") as server:
+        results = _run(
+            server,
+            [
+                ("volcano", cache_config("exact"), False),
+                ("volcano", cache_config("exact"), False),
+                ("volcano", cache_config("exact"), True),  # 流式请求重放缓存
+                ("volcano", cache_config("off"), False),
+                ("volcano", None, False),  # 默认不缓存，调用方需显式开启
+            ],
+        )
+
+    assert results == ["Volcano plot help"] * 5
+    assert len(server.requests) == 3
+    assert LLMResponseCache.stats()["hits"] == 2
+
+
+def test_semantic_match_uses_query_embedding():
+    LLMResponseCache.clear()
+    vectors = {"draw a volcano plot": [1.0, 0.0], "Draw a volcano plot!": [0.99, 0.05], "kaplan meier": [0.0, 1.0]}
+    LLMResponseCache.set_embedder(lambda text: vectors[text])
+    try:
+        with FakeOpenAIServer(response_text="Volcano") as server:
+            _run(
+                server,
+                [
+                    (text, cache_config("semantic", query=text), False)
+                    for text in ["draw a volcano plot", "Draw a volcano plot!", "kaplan meier"]
+                ],
+            )
+    finally:
+        LLMResponseCache.set_embedder(None)
+
+    assert len(server.requests) == 2
+    assert LLMResponseCache.stats()["semantic_hits"] == 1
+
+
+def test_lru_eviction_bounds_entries(monkeypatch):
+    LLMResponseCache.clear()
+    monkeypatch.setattr(settings, "llm_cache_max_entries", 2)
+    with FakeOpenAIServer(response_text="t") as server:
+        _run(
+            server,
+            [(text, cache_config("exact"), False) for text in ["a", "b", "c", "a"]],
+        )
+
+    assert len(server.requests) == 4
+    assert LLMResponseCache.stats()["evictions"] == 2
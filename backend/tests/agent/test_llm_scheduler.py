@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+测试 LLM 请求调度：429 重试、Retry-After、令牌桶、并发上限与对冲请求
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.http_pool import HTTPClientPool
+from app.utils.llm_factory import get_llm
+from app.utils.llm_scheduler import LLMScheduler, ScheduledChatModel, TokenBucket
+from tests.fake_openai_server import FakeOpenAIServer
+
+
+def test_rate_limited_request_is_retried():
+    LLMScheduler.reset()
+
+    async def run(base_url: str):
+        llm = get_llm(model="fake-model", source="Custom", base_url=base_url, api_key="k")
+        assert isinstance(llm.inner, ScheduledChatModel)  # 缓存层包在调度层外
+        try:
+            return await llm.ainvoke("hi")
+        finally:
+            await HTTPClientPool.aclose_all()
+
+    with FakeOpenAIServer(response_text="pong", fail_first=2, retry_after=0.05) as server:
+        message = asyncio.run(run(server.base_url))
+
+    assert message.content == "pong"
+    assert len(server.requests) == 3
+    stats = LLMScheduler.for_provider("Custom").snapshot()
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 2
+    assert stats["succeeded"] == 1
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 1 个突发令牌 + 4 个按 20/s 补充
+    assert asyncio.run(run()) >= 0.18
+
+
+def test_pause_applies_without_rate_limit():
+    async def run():
+        bucket = TokenBucket(rate=0, capacity=1)
+        bucket.pause(0.1)
+        assert not bucket.try_acquire()
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    # 关闭限速时 429 仍会暂停整个桶
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_wrapped_model_binds_tools_and_structured_output():
+    LLMScheduler.reset()
+
+    def lookup_gene(symbol: str) -> str:
+        """Look up a gene by symbol"""
+        return symbol
+
+    async def run(base_url: str):
+        llm = get_llm(model="fake-model", source="Custom", base_url=base_url, api_key="k")
+        try:
+            await llm.bind_tools([lookup_gene]).ainvoke("hi")
+            structured = llm.with_structured_output(
+                {"title": "Gene", "type": "object", "properties": {"symbol": {"type": "string"}}},
+                method="json_mode",
+            )
+            return await structured.ainvoke("hi")
+        finally:
+            await HTTPClientPool.aclose_all()
+
+    with FakeOpenAIServer(response_text='{"symbol": "TP53"}') as server:
+        result = asyncio.run(run(server.base_url))
+
+    assert result == {"symbol": "TP53"}
+    assert server.requests[0]["tools"][0]["function"]["name"] == "lookup_gene"
+    assert server.requests[1]["response_format"] == {"type": "json_object"}
+    # 绑定后的调用仍经过调度层
+    assert LLMScheduler.for_provider("Custom").snapshot()["succeeded"] == 2
+
+
+def _hedging_scheduler(**kwargs) -> LLMScheduler:
+    scheduler = LLMScheduler(
+        "test", rate=0, max_concurrency=4, hedge=True, hedge_min_samples=5, **kwargs
+    )
+    # 已观测到的 p95 延迟约 20ms
+    scheduler.latencies.extend([0.02] * 10)
+    return scheduler
+
+
+def test_concurrency_cap():
+    async def run():
+        scheduler = LLMScheduler("test", rate=0, max_concurrency=2, hedge=False)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            peak = max(peak, scheduler.stats["in_flight"])
+            await asyncio.sleep(0.02)
+            return "ok"
+
+        results = await asyncio.gather(*(scheduler.run(call) for _ in range(6)))
+        return scheduler, peak, results
+
+    scheduler, peak, results = asyncio.run(run())
+    assert results == ["ok"] * 6
+    assert peak == 2
+    assert scheduler.snapshot()["in_flight"] == 0
+
+
+def test_slow_request_is_hedged():
+    async def run():
+        scheduler = _hedging_scheduler()
+        calls = []
+
+        async def call():
+            calls.append(None)
+            # 第一次请求卡住，对冲请求立即返回
+            await asyncio.sleep(10 if len(calls) == 1 else 0)
+            return len(calls)
+
+        result = await asyncio.wait_for(scheduler.run(call), timeout=2)
+        await asyncio.sleep(0)
+        # 在事件循环关闭前取快照，否则遗留任务会在关闭时被统一取消
+        return scheduler.snapshot(), result
+
+    stats, result = asyncio.run(run())
+    assert result == 2
+    assert stats["hedges_sent"] == stats["hedges_won"] == 1
+    # 落败的首个请求已被取消，不再占用并发槽
+    assert stats["in_flight"] == 0
+
+
+def test_fast_request_is_not_hedged():
+    async def run():
+        scheduler = _hedging_scheduler()
+
+        async def call():
+            return "ok"
+
+        return scheduler, await scheduler.run(call)
+
+    scheduler, result = asyncio.run(run())
+    assert result == "ok"
+    assert scheduler.snapshot()["hedges_sent"] == 0
+
+
+def test_cancelled_caller_releases_slot_before_hedge():
+    async def run():
+        scheduler = _hedging_scheduler()
+        scheduler.latencies.extend([5.0] * 10)  # 对冲阈值远大于取消时间
+        started = asyncio.Event()
+
+        async def call():
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(scheduler.run(call))
+        await started.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0)
+        return scheduler.snapshot()
+
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 0
+    assert stats["hedges_sent"] == 0
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+测试链路耗时追踪：span 记录、跨任务传播与分阶段直方图
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.tracing import LatencyMetrics, record, span, start_trace
+
+
+def test_spans_are_collected_per_trace_and_in_histograms():
+    LatencyMetrics.reset()
+
+    async def turn():
+        trace = start_trace("chat.turn")
+        with span("history.load") as attrs:
+            attrs["messages"] = 3
+        # 并发任务继承当前 trace
+        async def analysis():
+            with span("llm.analysis"):
+                await asyncio.sleep(0.01)
+
+        await asyncio.create_task(analysis())
+        record("llm.ttft", 0.02)
+        trace.finish()
+        return trace.to_dict()
+
+    timings = asyncio.run(turn())
+
+    names = {s["name"] for s in timings["spans"]}
+    assert names == {"history.load", "llm.analysis", "llm.ttft"}
+    history = next(s for s in timings["spans"] if s["name"] == "history.load")
+    assert history["attrs"] == {"messages": 3}
+
+    stages = LatencyMetrics.snapshot()
+    assert stages["chat.turn"]["count"] == 1
+    assert stages["llm.analysis"]["p50_ms"] >= 10
+    assert 'stage="llm.ttft",le="25"} 1' in LatencyMetrics.prometheus()
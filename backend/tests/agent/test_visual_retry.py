@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试可视化错误恢复重试：修复后的请求保留上传数据集的引用
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+pytest.importorskip("llama_index")
+
+from app.agent import core
+from app.agent.error_recovery import FixedVisualRequest
+from app.agent.models import VisualToolRequest
+from app.schemas.visual import VisualRunResponse
+
+ROWS = [{"x": i, "y": i * i} for i in range(5)]
+
+
+class FakeRecovery:
+    async def analyze_error(self, **kwargs):
+        return SimpleNamespace(
+            error_type="column_not_found",
+            error_description="y_col does not exist",
+            can_auto_fix=True,
+        )
+
+    async def fix_request(self, original_request, **kwargs):
+        return FixedVisualRequest(
+            chart_type=original_request.chart_type,
+            engine=original_request.engine,
+            params={"y_col": "y"},
+            reasoning="use the existing column",
+            fixes_applied=["y_col: z -> y"],
+        )
+
+
+def test_retry_keeps_dataset(monkeypatch):
+    loaded = []
+
+    def load_rows(dataset_id, user_id):
+        loaded.append(dataset_id)
+        return ROWS
+
+    calls = []
+
+    async def run_tool(tool, params, user_id):
+        calls.append(params)
+        if not params["data"]:
+            return VisualRunResponse(success=False, message="no data")
+        if params.get("y_col") != "y":
+            return VisualRunResponse(
+                success=False,
+                message="column z not found",
+                error_details={"error_message": "column z not found"},
+                data_info={"columns": ["x", "y"]},
+            )
+        return VisualRunResponse(success=True, output_files=["a.png", "a.pdf"])
+
+    monkeypatch.setattr(core.DatasetService, "load_rows", load_rows)
+    monkeypatch.setattr(core.VisualService, "run_tool", run_tool)
+
+    agent = core.VisualAgent.__new__(core.VisualAgent)
+    agent.error_recovery = FakeRecovery()
+    request = VisualToolRequest(
+        chart_type="scatter/basic",
+        dataset="d" * 64,
+        params={"x_col": "x", "y_col": "z"},
+        reasoning="scatter",
+    )
+    result = asyncio.run(agent.generate_visualization(request, user_id=1))
+
+    assert result["success"] and result["retry_count"] == 1
+    assert loaded == ["d" * 64, "d" * 64]
+    assert [c["data"] for c in calls] == [ROWS, ROWS]
+    assert calls[1]["y_col"] == "y"
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+分析测试共用的夹具：在临时目录生成合成 TCGA 数据集并指向 tcga 加载函数
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.tcga import tcga
+from scripts.analysis.db.tcga.synthetic import generate_dataset
+
+SYNTHETIC_DEFAULTS = {
+    "cancer_types": ["BRCA", "LUAD"],
+    "n_genes": 40,
+    "n_samples": 80,
+    "n_gtex": 20,
+}
+
+
+@pytest.fixture
+def synthetic_dir(request, tmp_path, monkeypatch):
+    """
+    合成数据集目录。默认参数见 ``SYNTHETIC_DEFAULTS``，可通过间接参数化覆盖：
+
+        @pytest.mark.parametrize("synthetic_dir", [{"n_samples": 150}], indirect=True)
+    """
+    params = {**SYNTHETIC_DEFAULTS, **getattr(request, "param", {})}
+    generate_dataset(tmp_path, **params)
+    monkeypatch.setattr(tcga, "_DATA_DIR", tmp_path)
+    yield tmp_path
+    DuckDBPool.close()
@@ -0,0 +1,11 @@
+"""测试用分析模块：按参数休眠后返回数据"""
+
+import os
+import time
+
+
+def run_analysis(sub_tool, params):
+    if sub_tool == "crash":
+        os._exit(1)
+    time.sleep(params.get("seconds", 0))
+    return {"data": [{"pid": os.getpid(), "seconds": params.get("seconds", 0)}]}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试分析结果缓存：命中时跳过数据读取与 R 绘图，数据文件变化后失效；
+结果表直接写为绘图输入文件
+"""
+
+import asyncio
+import functools
+import os
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.config import settings
+from app.services.analysis import AnalysisService
+from app.services.analysis_cache import AnalysisResultCache
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.tcga import tcga
+
+
+@pytest.fixture
+def analysis_env(tmp_path, monkeypatch):
+    data_dir = tmp_path / "tcga"
+    (data_dir / "BRCA").mkdir(parents=True)
+    pq.write_table(
+        pa.table(
+            {
+                "patient": ["P1", "P2", "P3"],
+                "sample_type": ["01", "01", "01"],
+                "TP53": [1.0, 2.0, 3.0],
+                "EGFR": [3.0, 1.0, 2.0],
+            }
+        ),
+        data_dir / "BRCA" / "rsem_gene_tpm.parquet",
+    )
+    monkeypatch.setattr(tcga, "_DATA_DIR", data_dir)
+    monkeypatch.setattr(settings, "analysis_output_root", tmp_path / "out")
+    monkeypatch.setattr(settings, "analysis_cache_root", tmp_path / "cache")
+    # 在本进程内运行模块，以便统计调用次数
+    monkeypatch.setattr(settings, "analysis_pool_workers", 0)
+
+    calls = {"load": 0, "render": 0}
+    correlation = tcga.expression_correlation
+
+    @functools.wraps(correlation)
+    def counting_correlation(*args, **kwargs):
+        calls["load"] += 1
+        return correlation(*args, **kwargs)
+
+    async def fake_visualize(engine, script_path, file_paths):
+        calls["render"] += 1
+        file_paths["png"].write_bytes(b"png")
+        file_paths["pdf"].write_bytes(b"pdf")
+
+    monkeypatch.setattr(tcga, "expression_correlation", counting_correlation)
+    monkeypatch.setattr(AnalysisService, "visualize", fake_visualize)
+    AnalysisResultCache.clear()
+    yield data_dir, calls
+    AnalysisResultCache.clear()
+    DuckDBPool.close()
+
+
+def _run(**overrides):
+    params = {
+        "sub_tool": "expression_correlation",
+        "query_data": True,
+        "gene_x": "TP53",
+        "gene_y": "EGFR",
+        "min_samples": 1,
+        **overrides,
+    }
+    return asyncio.run(AnalysisService.run_analysis("db_tcga", params, user_id=1))
+
+
+def test_repeated_request_skips_fetch_and_render(analysis_env):
+    data_dir, calls = analysis_env
+
+    first = _run()
+    assert calls == {"load": 1, "render": 1}
+
+    # 显式传入默认值与省略参数共享同一缓存键
+    second = _run(cancer_type="BRCA", method="pearson")
+    assert calls == {"load": 1, "render": 1}
+    assert second["data"] == first["data"]
+    assert second["ggplot2"] == first["ggplot2"]
+
+    # 内存层清空后由磁盘层命中
+    AnalysisResultCache._tables.clear()
+    assert _run()["data"] == first["data"]
+    assert calls["load"] == 1
+    assert AnalysisResultCache.stats()["disk_hits"] == 1
+
+    # 数据文件更新后指纹变化，重新读取
+    path = data_dir / "BRCA" / "rsem_gene_tpm.parquet"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    _run()
+    assert calls["load"] == 2
+
+
+def test_disk_tier_is_size_bounded(analysis_env, monkeypatch):
+    table = pa.table({"x": list(range(1000))})
+    for i in range(5):
+        AnalysisResultCache.put(f"{i:02d}" * 32, table)
+    size = AnalysisResultCache._disk_path("00" * 32, "parquet").stat().st_size
+
+    monkeypatch.setattr(settings, "analysis_cache_disk_bytes", size * 2)
+    AnalysisResultCache._tables.clear()
+    AnalysisResultCache.put("ff" * 32, table)
+
+    files = list(settings.analysis_cache_root.glob("*/*.parquet"))
+    assert len(files) == 2
+    assert AnalysisResultCache.get("ff" * 32) is not None
+    assert AnalysisResultCache.get("00" * 32) is None
+
+
+def test_result_table_is_chart_input_and_rows_are_lazy(analysis_env):
+    result = _run()["data"]
+    assert result._rows is None
+    assert result.metadata["n_samples"] == 3
+
+    chart_input = (
+        settings.analysis_output_root
+        / "1"
+        / "db_tcga"
+        / "expression_correlation"
+        / "expression_correlation_data.arrow"
+    )
+    assert feather.read_table(chart_input).equals(result.table)
+    assert result.rows()[0] == {"patient": "P1", "TP53": 1.0, "EGFR": 3.0}
+
+    # 缓存命中时元数据随表一起恢复
+    AnalysisResultCache._tables.clear()
+    assert _run()["data"].metadata == result.metadata
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+测试分析进程池：AnalysisResult 经 Arrow IPC 返回、任务超时回收进程池、被牵连的任务自动重试
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.config import settings
+from app.services.analysis_pool import (
+    AnalysisTimeoutError,
+    AnalysisWorkerPool,
+    run_module,
+)
+
+SLEEPY = Path(__file__).parent / "sleepy_analysis.py"
+TCGA = settings.analysis_root / "db" / "tcga" / "tcga.py"
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    # 工作进程通过环境变量读取数据目录
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "analysis_pool_workers", 2)
+    (tmp_path / "tcga" / "BRCA").mkdir(parents=True)
+    pq.write_table(
+        pa.table(
+            {
+                "patient": ["P1", "P2", "P3"],
+                "sample_type": ["01", "01", "11"],
+                "TP53": [1.0, 2.0, 3.0],
+                "EGFR": [3.0, 1.0, 2.0],
+            }
+        ),
+        tmp_path / "tcga" / "BRCA" / "rsem_gene_tpm.parquet",
+    )
+    yield
+    AnalysisWorkerPool.shutdown()
+
+
+def test_tcga_module_runs_in_worker_process(pool):
+    params = {"gene_x": "TP53", "gene_y": "EGFR", "min_samples": 1}
+    result = asyncio.run(AnalysisWorkerPool.run(TCGA, "expression_correlation", params))
+    assert result.rows() == [
+        {"patient": "P1", "TP53": 1.0, "EGFR": 3.0},
+        {"patient": "P2", "TP53": 2.0, "EGFR": 1.0},
+    ]
+
+    result = asyncio.run(AnalysisWorkerPool.run(SLEEPY, "sleep", {}))
+    assert result.rows()[0]["pid"] != os.getpid()
+
+    params["min_samples"] = 10
+    with pytest.raises(ValueError, match="Insufficient samples"):
+        asyncio.run(AnalysisWorkerPool.run(TCGA, "expression_correlation", params))
+
+
+def test_timeout_recycles_pool_and_retries_siblings(pool):
+    async def scenario():
+        AnalysisWorkerPool.start()
+        sibling = asyncio.create_task(
+            AnalysisWorkerPool.run(SLEEPY, "sleep", {"seconds": 1.5}, timeout=60)
+        )
+        await asyncio.sleep(0.2)
+        with pytest.raises(AnalysisTimeoutError):
+            await AnalysisWorkerPool.run(
+                SLEEPY, "sleep", {"seconds": 60}, timeout=0.5
+            )
+        # 超时任务所在的进程池被替换，同时运行的任务在新进程池中重试
+        return await sibling
+
+    result = asyncio.run(scenario())
+    assert result.rows()[0]["seconds"] == 1.5
+
+    with pytest.raises(ValueError, match="crashed"):
+        asyncio.run(AnalysisWorkerPool.run(SLEEPY, "crash", {}))
+
+
+def test_in_process_fallback(pool, monkeypatch):
+    monkeypatch.setattr(settings, "analysis_pool_workers", 0)
+    result = asyncio.run(AnalysisWorkerPool.run(SLEEPY, "sleep", {}))
+    assert result.rows()[0]["pid"] == os.getpid()
+    result = run_module("tests.analysis.sleepy_analysis", "sleep", {})
+    assert result.table.num_rows == 1
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试全基因组共表达扫描：标准化矩阵上的矩阵-向量乘积与逐基因相关系数一致；
+多个进程同时按需构建同一个存储时互不干扰
+"""
+
+import multiprocessing
+import sys
+from pathlib import Path
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+from scipy import stats
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.analysis.db.tcga import tcga
+from scripts.analysis.db.tcga.expression_store import ExpressionStore
+
+
+pytestmark = pytest.mark.parametrize(
+    "synthetic_dir",
+    [{"cancer_types": ["BRCA"], "n_genes": 60, "n_samples": 90, "n_gtex": 5}],
+    indirect=True,
+)
+
+
+def test_scan_matches_per_gene_correlation(synthetic_dir):
+    result = tcga.coexpression_scan("TP53", "BRCA", top_k=5)
+    rows = result.rows()
+    assert result.metadata["n_samples"] == 90
+
+    expression = pq.read_table(
+        synthetic_dir / "BRCA" / "rsem_gene_tpm.parquet"
+    ).to_pandas()
+    tumor = expression[expression["sample_type"] == "01"].drop(
+        columns=["patient", "sample", "sample_type"]
+    )
+    reference = {
+        g: stats.pearsonr(tumor["TP53"], tumor[g])
+        for g in tumor.columns
+        if g != "TP53" and tumor[g].std() > 0
+    }
+    assert result.metadata["n_genes_tested"] == len(reference)
+
+    positive = [r for r in rows if r["direction"] == "positive"]
+    negative = [r for r in rows if r["direction"] == "negative"]
+    expected = sorted(reference, key=lambda g: reference[g].statistic)
+    assert [r["gene"] for r in positive] == expected[::-1][:5]
+    assert [r["gene"] for r in negative] == expected[:5]
+    assert [r["rank"] for r in positive] == [1, 2, 3, 4, 5]
+    for row in rows:
+        assert row["r"] == pytest.approx(reference[row["gene"]].statistic, abs=1e-5)
+        assert row["p_value"] == pytest.approx(
+            reference[row["gene"]].pvalue, rel=1e-3, abs=1e-12
+        )
+        assert row["p_value"] <= row["fdr"] <= 1
+
+
+def test_scan_builds_store_and_reuses_zscores(synthetic_dir):
+    path = synthetic_dir / "BRCA" / "rsem_gene_tpm.parquet"
+    assert ExpressionStore.for_parquet(path) is None
+    tcga.run_analysis("coexpression_scan", {"gene": "MKI67", "cancer_type": "BRCA"})
+
+    store = ExpressionStore.for_parquet(path)
+    assert (store.path / "zscore_01.npy").exists()
+    zscores, std = store.zscores("01")
+    assert zscores.shape == (60, 90) and isinstance(zscores, np.memmap)
+    assert store.zscores("01")[0] is zscores
+
+    assert "error" in tcga.coexpression_scan("NOPE", "BRCA")
+    assert "error" in tcga.coexpression_scan("TP53", "KICH")
+
+
+def _scan_in_process(data_dir, barrier, results):
+    tcga._DATA_DIR = Path(data_dir)
+    barrier.wait()
+    try:
+        result = tcga.coexpression_scan("TP53", "BRCA", top_k=3)
+        results.put(result.get("error") if isinstance(result, dict) else "ok")
+    except Exception as e:
+        results.put(repr(e))
+
+
+def test_concurrent_processes_build_store_once(synthetic_dir):
+    # 与分析进程池一样使用 spawn，两个进程同时遇到缺失的存储
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(2)
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=_scan_in_process, args=(str(synthetic_dir), barrier, results)
+        )
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=120) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+    assert outcomes == ["ok", "ok"]
+
+    brca = synthetic_dir / "BRCA"
+    assert ExpressionStore.for_parquet(brca / "rsem_gene_tpm.parquet") is not None
+    assert not list(brca.glob("*.part"))
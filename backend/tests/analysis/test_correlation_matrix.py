@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+测试多基因相关性矩阵：与 pandas / scipy 逐对结果一致，缺失值按 pairwise-complete 处理
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from scipy import stats
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.tcga import tcga
+from scripts.analysis.db.tcga.correlation import pairwise_correlation
+
+GENES = ["TP53", "EGFR", "MYC", "HLA-A"]
+
+
+@pytest.fixture
+def tcga_dir(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    n = 120
+    base = rng.normal(size=n)
+    columns = {
+        "TP53": base + rng.normal(0, 0.5, n),
+        "EGFR": -base + rng.normal(0, 1.0, n),
+        "MYC": rng.normal(size=n),
+        "HLA-A": rng.normal(size=n),
+    }
+    columns["MYC"][rng.random(n) < 0.15] = np.nan
+    columns["HLA-A"][rng.random(n) < 0.15] = np.nan
+    (tmp_path / "BRCA").mkdir()
+    pq.write_table(
+        pa.table(
+            {
+                "patient": [f"P{i}" for i in range(n)],
+                "sample_type": ["01"] * (n - 10) + ["11"] * 10,
+                **{g: pa.array(v, from_pandas=True) for g, v in columns.items()},
+            }
+        ),
+        tmp_path / "BRCA" / "rsem_gene_tpm.parquet",
+    )
+    monkeypatch.setattr(tcga, "_DATA_DIR", tmp_path)
+    yield pd.DataFrame(columns).iloc[: n - 10]
+    DuckDBPool.close()
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman", "kendall"])
+def test_matrix_matches_pairwise_reference(tcga_dir, method):
+    result = tcga.expression_correlation_matrix(
+        ",".join(GENES), "BRCA", method=method, min_samples=20
+    )
+    assert result.metadata["genes"] == GENES
+    assert result.table.num_rows == len(GENES) ** 2
+
+    cells = {(r["gene_x"], r["gene_y"]): r for r in result.rows()}
+    reference = tcga_dir.corr(method=method)
+    test = {"pearson": stats.pearsonr, "spearman": stats.spearmanr}.get(
+        method, stats.kendalltau
+    )
+    for x in GENES:
+        for y in GENES:
+            cell = cells[(x, y)]
+            both = tcga_dir[[x, y]].dropna()
+            assert cell["n"] == len(both)
+            assert cell["r"] == pytest.approx(reference.loc[x, y], abs=1e-10)
+            if x != y:
+                assert cell["p_value"] == pytest.approx(
+                    test(both[x], both[y]).pvalue, rel=1e-6
+                )
+    assert cells[("TP53", "EGFR")]["r"] < -0.3
+
+
+def test_min_samples_and_validation(tcga_dir):
+    values = np.array([[1.0, 2.0], [2.0, np.nan], [3.0, 1.0], [4.0, np.nan]])
+    r, p, n = pairwise_correlation(values, "pearson", min_samples=3)
+    assert n[0, 1] == 2 and np.isnan(r[0, 1]) and np.isnan(p[0, 1])
+    assert r[0, 0] == 1.0 and np.isnan(r[1, 1])
+
+    assert "error" in tcga.expression_correlation_matrix(["TP53"], "BRCA")
+    result = tcga.expression_correlation_matrix(["TP53", "NOPE"], "BRCA")
+    assert result["error"] == "Genes not found: NOPE"
+    with pytest.raises(ValueError):
+        tcga.expression_correlation_matrix(GENES, "BRCA", method="cosine")
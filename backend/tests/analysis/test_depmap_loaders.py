@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+测试 DepMap 加载函数：癌种与 min_samples 下推到 DuckDB 扫描、列缓存，
+以及四个子工具在小型宽表上的结果
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from scipy import stats
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.depmap import depmap
+
+N_MODELS = 60
+
+
+@pytest.fixture
+def depmap_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(depmap, "_DATA_DIR", tmp_path)
+    rng = np.random.default_rng(0)
+    # 故意打乱行序，加载结果按 model_id 排序
+    models = [f"ACH-{i:06d}" for i in rng.permutation(N_MODELS)]
+    cancer_types = ["BRCA" if i % 3 == 0 else "LUAD" for i in range(N_MODELS)]
+    pq.write_table(
+        pa.table(
+            {
+                "model_id": models,
+                "cell_line_name": [f"LINE{i}" for i in range(N_MODELS)],
+                "cancer_type": cancer_types,
+            }
+        ),
+        tmp_path / "models.parquet",
+    )
+
+    brca1 = rng.normal(5, 1, N_MODELS)
+    egfr = rng.normal(3, 1, N_MODELS)
+    pq.write_table(
+        pa.table({"model_id": models, "BRCA1": brca1, "EGFR": egfr}),
+        tmp_path / "expression.parquet",
+    )
+
+    # BRCA1 低表达时 PARP1 依赖性增强（合成致死），其余基因为噪声
+    effects = {f"G{i}": rng.normal(0, 0.2, N_MODELS) for i in range(20)}
+    loss = brca1 <= np.quantile(brca1, 0.25)
+    effects["PARP1"] = rng.normal(0, 0.2, N_MODELS) - 1.0 * loss
+    effects["G0"][:5] = np.nan
+    pq.write_table(
+        pa.table({"model_id": models, **effects}),
+        tmp_path / "crispr_gene_effect.parquet",
+    )
+
+    # 前 40 行筛选过 DRUG_A，DRUG_B 只筛选过 10 个细胞系
+    drug_a = np.where(np.arange(N_MODELS) < 40, -0.5 * egfr, np.nan)
+    drug_a = drug_a + rng.normal(0, 0.3, N_MODELS)
+    drug_b = np.where(np.arange(N_MODELS) < 10, 1.0, np.nan)
+    pq.write_table(
+        pa.table({"model_id": models, "DRUG_A": drug_a, "DRUG_B": drug_b}),
+        tmp_path / "drug_prism_auc.parquet",
+    )
+    depmap._SliceCache.clear()
+    yield tmp_path
+    depmap._SliceCache.clear()
+    DuckDBPool.close()
+
+
+def test_loader_pushes_down_cancer_type_and_caches_columns(depmap_dir):
+    model_ids, values = depmap._load_columns(
+        "expression.parquet", ["BRCA1", "EGFR"], "BRCA"
+    )
+    assert len(model_ids) == N_MODELS // 3
+    assert list(model_ids) == sorted(model_ids)
+    assert values.shape == (N_MODELS // 3, 2)
+
+    misses = depmap._SliceCache.stats()["misses"]
+    again_ids, again = depmap._load_columns("expression.parquet", ["EGFR"], "BRCA")
+    assert depmap._SliceCache.stats()["misses"] == misses
+    np.testing.assert_array_equal(again[:, 0], values[:, 1])
+    assert list(again_ids) == list(model_ids)
+
+    # 文件重写后缓存不再命中
+    table = pq.read_table(depmap_dir / "expression.parquet")
+    pq.write_table(table.slice(0, 9), depmap_dir / "expression.parquet")
+    _, rewritten = depmap._load_columns("expression.parquet", ["EGFR"])
+    assert len(rewritten) == 9
+
+    counts = depmap._non_null_counts("drug_prism_auc.parquet")
+    assert counts.to_dict() == {"DRUG_A": 40, "DRUG_B": 10}
+
+
+def test_correlation_and_dependency(depmap_dir):
+    result = depmap.run_analysis(
+        "correlation",
+        {
+            "feature_type_x": "expression",
+            "feature_type_y": "dependency",
+            "feature_x": "BRCA1",
+            "feature_y": "PARP1",
+            "method": "spearman",
+        },
+    )
+    rows = result.rows()
+    assert len(rows) == result.metadata["n_samples"] == N_MODELS
+    x = [r["x"] for r in rows]
+    y = [r["y"] for r in rows]
+    assert result.metadata["r"] == pytest.approx(stats.spearmanr(x, y).statistic)
+    assert "error" in depmap.correlation(
+        "expression", "dependency", "BRCA1", "PARP1", cancer_type="BRCA"
+    )
+
+    top = depmap.dependency("dependency", "PARP1", top_n=5)
+    values = [r["value"] for r in top.rows()]
+    assert values == sorted(values) and len(values) == 5
+    assert top.metadata["n_dependent"] >= N_MODELS // 5
+    assert set(top.metadata["by_cancer_type"]["cancer_type"]) == {"BRCA", "LUAD"}
+    assert "error" in depmap.dependency("dependency", "NOPE")
+    with pytest.raises(ValueError):
+        depmap.dependency("dependency", "PARP1", dataset="shRNA")
+
+
+@pytest.mark.parametrize("method", ["rank_product", "wilcoxon"])
+def test_synthetic_lethality_finds_planted_partner(depmap_dir, method):
+    result = depmap.synthetic_lethality("BRCA1", method=method)
+    assert [r["gene"] for r in result.rows()] == ["PARP1"]
+    assert result.metadata["n_partners_tested"] == 21
+    assert result.metadata["n_loss"] == N_MODELS // 4
+
+    subset = depmap.synthetic_lethality("BRCA1", "G1, G2", method=method, fdr=1)
+    assert subset.metadata["n_partners_tested"] == 2
+    assert "error" in depmap.synthetic_lethality("BRCA1", "NOPE")
+
+
+def test_drug_association_skips_sparse_drugs(depmap_dir):
+    result = depmap.run_analysis(
+        "drug_association", {"gene": "EGFR", "min_samples": 30}
+    )
+    rows = result.rows()
+    assert [r["drug"] for r in rows] == ["DRUG_A"]
+    assert rows[0]["n_samples"] == 40 and rows[0]["r"] < -0.5
+
+    assert "error" in depmap.drug_association("EGFR", min_samples=50)
+    assert "error" in depmap.drug_association("EGFR", drug_panel="GDSC1")
+    assert depmap.data_fingerprint("drug_association", {}) is not None
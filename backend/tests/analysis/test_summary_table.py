@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试泛癌表达汇总表：统计量正确、增量重建、过期时现场汇总
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.analysis.db.tcga import summary_table, tcga
+from scripts.analysis.db.tcga.synthetic import generate_cancer_type
+
+
+pytestmark = pytest.mark.parametrize(
+    "synthetic_dir", [{"n_genes": 30, "n_samples": 60, "n_gtex": 15}], indirect=True
+)
+
+
+@pytest.fixture(autouse=True)
+def small_column_batches(monkeypatch):
+    monkeypatch.setattr(summary_table, "SUMMARY_COLUMN_BATCH", 7)
+
+
+def _regenerate(data_dir: Path, cancer_type: str, n_samples: int) -> None:
+    path = data_dir / cancer_type / "rsem_gene_tpm.parquet"
+    genes = pq.read_schema(path).names[3:]
+    generate_cancer_type(data_dir, cancer_type, genes, n_samples, n_gtex=15, seed=11)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_summary_matches_numpy(synthetic_dir):
+    assert summary_table.build_summary(synthetic_dir, ["BRCA", "LUAD", "KICH"]) == [
+        "BRCA",
+        "LUAD",
+    ]
+
+    expression = pq.read_table(synthetic_dir / "BRCA" / "rsem_gene_tpm.parquet")
+    sample_type = np.asarray(expression["sample_type"])
+    tumor = np.asarray(expression["TP53"])[sample_type == "01"]
+    normal = np.asarray(expression["TP53"])[sample_type == "11"]
+
+    result = tcga.expression_summary("TP53", ["BRCA", "LUAD"])
+    assert result.metadata["summarized_on_demand"] == []
+    rows = {(r["cancer_type"], r["sample_group"]): r for r in result.rows()}
+    assert len(rows) == 6
+    brca = rows[("BRCA", "Tumor")]
+    assert brca["n"] == len(tumor)
+    assert brca["mean"] == pytest.approx(tumor.mean(), rel=1e-5)
+    assert brca["q1"] == pytest.approx(np.quantile(tumor, 0.25), rel=1e-5)
+    assert brca["max"] == pytest.approx(tumor.max(), rel=1e-5)
+    assert brca["log2fc"] == pytest.approx(tumor.mean() - normal.mean(), rel=1e-4)
+    assert brca["log2fc_reference"] == "Normal"
+
+    result = tcga.run_analysis(
+        "expression_summary", {"gene": "TP53", "sample_groups": ["GTEx"]}
+    )
+    assert {r["sample_group"] for r in result.rows()} == {"GTEx"}
+
+
+def test_rebuild_only_changed_cancer_types(synthetic_dir):
+    summary_table.build_summary(synthetic_dir, ["BRCA", "LUAD"])
+    assert summary_table.build_summary(synthetic_dir, ["BRCA", "LUAD"]) == []
+    before = tcga.expression_summary("EGFR", ["LUAD"]).rows()
+
+    _regenerate(synthetic_dir, "BRCA", n_samples=40)
+    # 重建前：BRCA 过期，现场汇总，结果已反映新文件
+    result = tcga.expression_summary("EGFR", ["BRCA", "LUAD"])
+    assert result.metadata["summarized_on_demand"] == ["BRCA"]
+    stale_rows = result.rows()
+    assert {(r["cancer_type"], r["sample_group"]): r["n"] for r in stale_rows}[
+        ("BRCA", "Tumor")
+    ] == 40
+
+    assert summary_table.build_summary(synthetic_dir, ["BRCA", "LUAD"]) == ["BRCA"]
+    result = tcga.expression_summary("EGFR", ["BRCA", "LUAD"])
+    assert result.metadata["summarized_on_demand"] == []
+    assert result.rows() == stale_rows
+    assert tcga.expression_summary("EGFR", ["LUAD"]).rows() == before
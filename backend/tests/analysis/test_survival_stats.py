@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+测试向量化生存统计：KM 与 log-rank 与 scipy 一致，Cox 系数为 Efron 偏似然的
+极大值点，多基因扫描与逐基因计算一致
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy import optimize, stats
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.analysis.db.tcga import tcga
+from scripts.analysis.db.tcga.survival import (
+    EventTimes,
+    cox_ph,
+    kaplan_meier,
+    logrank_test,
+    scan_genes,
+)
+
+
+@pytest.fixture
+def cohort():
+    rng = np.random.default_rng(1)
+    n = 200
+    x = rng.normal(size=n)
+    # 按天取整，制造同一时间点的多个事件
+    event_time = np.round(rng.exponential(100 * np.exp(-0.5 * x))) + 1
+    censor_time = np.round(rng.uniform(0, 200, n)) + 1
+    event = (event_time <= censor_time).astype(int)
+    return np.minimum(event_time, censor_time), event, x
+
+
+def _censored(time, event):
+    return stats.CensoredData(uncensored=time[event == 1], right=time[event == 0])
+
+
+def _efron_loglik(beta, time, event, x):
+    loglik = 0.0
+    for t in np.unique(time[event == 1]):
+        died = (time == t) & (event == 1)
+        d = died.sum()
+        at_risk = np.exp(beta * x[time >= t]).sum()
+        tied = np.exp(beta * x[died]).sum()
+        loglik += beta * x[died].sum()
+        loglik -= sum(np.log(at_risk - k / d * tied) for k in range(d))
+    return loglik
+
+
+def test_kaplan_meier_and_logrank_match_scipy(cohort):
+    time, event, x = cohort
+    curve = kaplan_meier(time, event)
+    reference = stats.ecdf(_censored(time, event)).sf
+    np.testing.assert_allclose(curve["survival"], reference.evaluate(curve["time"]))
+    assert curve["n_risk"].iloc[0] == len(time)
+    assert curve["n_event"].sum() == event.sum()
+
+    high = x > np.median(x)
+    result = logrank_test(EventTimes(time, event), high)
+    expected = stats.logrank(
+        _censored(time[high], event[high]), _censored(time[~high], event[~high])
+    )
+    assert result["p_value"][0] == pytest.approx(expected.pvalue, rel=1e-8)
+
+
+def test_cox_maximizes_efron_likelihood(cohort):
+    time, event, x = cohort
+    times = EventTimes(time, event)
+    for covariate in (x, (x > 0).astype(float)):
+        beta = optimize.minimize_scalar(
+            lambda b: -_efron_loglik(b, time, event, covariate)
+        ).x
+        fit = cox_ph(times, covariate)
+        assert np.log(fit["hazard_ratio"][0]) == pytest.approx(beta, abs=1e-5)
+        assert fit["lower"][0] < fit["hazard_ratio"][0] < fit["upper"][0]
+    assert fit["hazard_ratio"][0] > 1
+
+
+def test_masked_columns_match_subsets(cohort):
+    time, event, x = cohort
+    keep = np.random.default_rng(2).random(len(time)) > 0.2
+    values = np.c_[x, np.where(keep, x, np.nan)]
+    scan = scan_genes(EventTimes(time, event), values)
+
+    subset = EventTimes(time[keep], event[keep])
+    high = x[keep] > np.median(x[keep])
+    assert scan["n_high"][1] + scan["n_low"][1] == keep.sum()
+    assert scan["logrank_p"][1] == pytest.approx(
+        logrank_test(subset, high)["p_value"][0]
+    )
+    assert scan["hazard_ratio"][1] == pytest.approx(
+        cox_ph(subset, high)["hazard_ratio"][0], rel=1e-6
+    )
+
+    optimal = scan_genes(EventTimes(time, event), values, cutpoint="optimal")
+    assert np.all(optimal["logrank_p"] <= scan["logrank_p"])
+    assert np.all(np.minimum(optimal["n_high"], optimal["n_low"]) >= 0.1 * 160)
+
+
+@pytest.mark.parametrize(
+    "synthetic_dir",
+    [{"cancer_types": ["BRCA"], "n_samples": 150, "n_gtex": 5}],
+    indirect=True,
+)
+def test_survival_scan_matches_single_gene_analysis(synthetic_dir):
+    result = tcga.run_analysis(
+        "survival_scan", {"cancer_type": "BRCA", "top_k": None}
+    )
+    rows = {r["gene"]: r for r in result.rows()}
+    assert len(rows) == 40
+    # 大多数样本表达为 0 的基因分组不平衡，不参与检验，排在最后
+    tested = result.metadata["n_genes_tested"]
+    p_values = [r["logrank_p"] for r in result.rows()]
+    assert all(p is None for p in p_values[tested:])
+    assert p_values[:tested] == sorted(p_values[:tested])
+    # 合成数据中 MKI67 高表达缩短生存
+    assert rows["MKI67"]["logrank_p"] < 0.05 and rows["MKI67"]["hazard_ratio"] > 1
+
+    single = tcga.survival_analysis("MKI67", "BRCA")
+    assert single.metadata["n_samples"] == result.metadata["n_samples"]
+    for key in ("logrank_p", "hazard_ratio", "hr_lower", "hr_upper", "cox_p"):
+        assert rows["MKI67"][key] == pytest.approx(single.metadata[key], rel=1e-6)
+    curves = single.metadata["km_curves"]
+    assert set(curves) == {"High", "Low"}
+    assert curves["High"]["survival"][-1] < curves["Low"]["survival"][-1]
+
+    subset = tcga.survival_scan("MKI67, ESR1", "BRCA", cutpoint="optimal")
+    assert {r["gene"] for r in subset.rows()} == {"MKI67", "ESR1"}
+    assert "error" in tcga.survival_scan(["NOPE"], "BRCA")
+    with pytest.raises(ValueError):
+        tcga.survival_scan(None, "BRCA", cutpoint="tertile")
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+测试 TCGA 加载函数：共享 DuckDB 连接池、Parquet 视图复用与参数绑定
+"""
+
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.tcga import tcga
+
+
+@pytest.fixture
+def tcga_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tcga, "_DATA_DIR", tmp_path)
+    (tmp_path / "BRCA").mkdir()
+    pq.write_table(
+        pa.table(
+            {
+                "patient": ["P1", "P2", "P3", "P1"],
+                "sample_type": ["01", "01", "01", "11"],
+                "TP53": [1.0, 2.0, 3.0, 0.5],
+                "HLA-A": [4.0, 5.0, 6.0, 7.0],
+            }
+        ),
+        tmp_path / "BRCA" / "rsem_gene_tpm.parquet",
+    )
+    yield tmp_path
+    DuckDBPool.close()
+
+
+def test_expression_loader_binds_filters_and_reuses_view(tcga_dir):
+    # 含连字符的基因名需要作为标识符引用
+    df = tcga._load_expression_data(
+        "BRCA", columns=["patient", "HLA-A"], sample_type="tumor"
+    )
+    assert list(df.columns) == ["patient", "HLA-A"]
+    assert df["HLA-A"].tolist() == [4.0, 5.0, 6.0]
+
+    path = tcga_dir / "BRCA" / "rsem_gene_tpm.parquet"
+    view = DuckDBPool.view(path)
+    tcga._load_expression_data("BRCA", columns=["patient"], sample_type="normal")
+    assert DuckDBPool.view(path) == view
+    assert len(DuckDBPool._views) == 1
+
+    # 文件被重新生成后视图随之刷新
+    pq.write_table(
+        pa.table({"patient": ["P9"], "sample_type": ["01"], "TP53": [9.0]}), path
+    )
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    df = tcga._load_expression_data("BRCA", columns=["patient", "TP53"])
+    assert df["patient"].tolist() == ["P9"]
+
+    with pytest.raises(ValueError):
+        tcga._load_expression_data("BRCA", sample_type="metastatic")
+
+
+def test_each_thread_gets_its_own_cursor(tcga_dir):
+    cursors = {}
+
+    def load(i):
+        cursors[i] = DuckDBPool.cursor()
+        df = tcga._load_expression_data("BRCA", columns=["TP53"], sample_type="tumor")
+        assert len(df) == 3
+
+    threads = [threading.Thread(target=load, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(c) for c in cursors.values()}) == 4
+    assert DuckDBPool.cursor() is DuckDBPool.cursor()
+
+
+def test_pan_cancer_expression_aggregates_in_one_query(tcga_dir):
+    rng = np.random.default_rng(0)
+    values = {}
+    for ct in ["LUAD", "COAD"]:
+        (tcga_dir / ct).mkdir()
+        tumor = rng.normal(5, 1, 40).tolist() + [50.0]  # 一个离群点
+        normal = rng.normal(2, 1, 10).tolist()
+        values[ct] = (tumor, normal)
+        pq.write_table(
+            pa.table(
+                {
+                    "patient": [f"P{i}" for i in range(51)],
+                    "sample_type": ["01"] * 41 + ["11"] * 10,
+                    "TP53": tumor + normal,
+                }
+            ),
+            tcga_dir / ct / "rsem_gene_tpm.parquet",
+        )
+
+    result = tcga.pan_cancer_expression("TP53", ["LUAD", "COAD", "KICH"])
+
+    tumor, normal = values["LUAD"]
+    luad = result.metadata["results"]["LUAD"]
+    assert luad["n_tumor"] == 41 and luad["n_normal"] == 10
+    assert luad["tumor_mean"] == pytest.approx(np.mean(tumor))
+    assert luad["normal_median"] == pytest.approx(np.median(normal))
+    assert result.metadata["results"]["KICH"]["n_tumor"] == 0
+
+    boxes = {(b["cancer_type"], b["sample_type"]): b for b in result.rows()}
+    assert set(boxes) == {
+        ("COAD", "Normal"),
+        ("COAD", "Tumor"),
+        ("LUAD", "Normal"),
+        ("LUAD", "Tumor"),
+    }
+    box = boxes[("LUAD", "Tumor")]
+    assert box["q1"] == pytest.approx(np.quantile(tumor, 0.25))
+    assert box["outliers"][0] == 50.0 and box["n_outliers"] >= 1
+    assert box["upper_whisker"] < 50.0
+
+    result = tcga.pan_cancer_expression("TP53", ["LUAD"], show_normal=False)
+    assert "n_normal" not in result.metadata["results"]["LUAD"]
+    assert {b["sample_type"] for b in result.rows()} == {"Tumor"}
+
+
+def test_expression_loader_reads_gene_major_store(tcga_dir, monkeypatch):
+    from scripts.analysis.db.tcga import expression_store
+
+    path = tcga_dir / "BRCA" / "rsem_gene_tpm.parquet"
+    monkeypatch.setattr(expression_store, "BUILD_COLUMN_BATCH", 1)
+    expression_store.build_all(tcga_dir, ["BRCA", "LUAD"])
+
+    store = expression_store.ExpressionStore.for_parquet(path)
+    assert store.genes == ["TP53", "HLA-A"]
+    assert store.gene("HLA-A").tolist() == [4.0, 5.0, 6.0, 7.0]
+
+    # 存储可用时不经过 DuckDB
+    query_df = DuckDBPool.__dict__["query_df"]
+    monkeypatch.setattr(DuckDBPool, "query_df", None)
+    df = tcga._load_expression_data(
+        "BRCA", columns=["patient", "sample_type", "TP53"], sample_type="tumor"
+    )
+    assert df["patient"].tolist() == ["P1", "P2", "P3"]
+    assert df["TP53"].tolist() == [1.0, 2.0, 3.0]
+    monkeypatch.setattr(DuckDBPool, "query_df", query_df)
+
+    # 源文件更新后存储过期，回退到 Parquet
+    pq.write_table(
+        pa.table({"patient": ["P9"], "sample_type": ["01"], "TP53": [9.5]}), path
+    )
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert expression_store.ExpressionStore.for_parquet(path) is None
+    df = tcga._load_expression_data("BRCA", columns=["patient", "TP53"])
+    assert df["TP53"].tolist() == [9.5]
+
+
+def test_clinical_columns_are_joined_in_duckdb(tcga_dir):
+    pq.write_table(
+        pa.table(
+            {
+                "patient_barcode": ["P3", "P1", "P2", "P4"],
+                "stage": ["Stage II", "Stage I", None, "Stage III"],
+                "OS": [1, 0, 1, 0],
+                "OS_time": [300.0, 1200.0, None, 800.0],
+            }
+        ),
+        tcga_dir / "BRCA" / "clinical.parquet",
+    )
+
+    result = tcga.differential_expression("TP53", "BRCA", "pathologic_stage")
+    assert result.columns == ["patient", "stage", "TP53"]
+    assert [r["stage"] for r in result.rows()] == ["Stage I", None, "Stage II"]
+
+    # 缺失生存时间的患者被过滤，分组按中位数
+    result = tcga.survival_analysis("TP53", "BRCA")
+    rows = result.rows()
+    assert [r["patient"] for r in rows] == ["P1", "P3"]
+    assert [r["group"] for r in rows] == ["Low", "High"]
+    assert rows[0]["OS_time"] == 1200.0
+
+    result = tcga.differential_expression("TP53", "BRCA", "paired_tumor_vs_normal")
+    assert [(r["sample_type"], r["TP53"]) for r in result.rows()] == [
+        ("Tumor", 1.0),
+        ("Normal", 0.5),
+    ]
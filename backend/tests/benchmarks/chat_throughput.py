@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+聊天流式吞吐基准测试（离线）
+
+Drives ``ChatOrchestrator.process_stream`` at increasing concurrency against:
+
+- a local fake OpenAI-compatible streaming server with a configurable token rate
+- a SQLite test database (or any async database URL via ``--database-url``)
+- a stub renderer: the R interpreter is replaced by a small executable that
+  sleeps and writes the PNG/PDF outputs, so ``VisualService`` runs unchanged
+
+Reports p50/p95/p99 time to first token, full-turn latency, event-loop lag and
+memory per stream for each concurrency level.
+
+Usage (from backend/):
+    python -m tests.benchmarks.chat_throughput --concurrency 1,4,16,64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# Keep the RAG embedding setup from reaching the network
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models import User, Conversation
+from app.orchestration import ChatOrchestrator
+from tests.fake_openai_server import FakeOpenAIServer
+
+SAMPLE_ROWS = [{"x": i, "y": (i * 7) % 11, "group": "ab"[i % 2]} for i in range(50)]
+
+CHAT_RESPONSE = json.dumps(
+    {
+        "message": "Here is a scatter plot of y against x, coloured by group. "
+        "Points are drawn with the default theme so the trend is easy to read.",
+        "needs_info": False,
+        "missing_params": [],
+        "suggestions": [],
+        "visual_request": {
+            "chart_type": "scatter/basic",
+            "engine": "r",
+            "data": SAMPLE_ROWS,
+            "params": {
+                "ggplot2": {
+                    "mapping": {"x": "x", "y": "y", "colour": "group"},
+                    "layers": [{"type": "geom_point"}],
+                }
+            },
+            "reasoning": "Two numeric columns and one grouping column",
+        },
+    }
+)
+
+ANALYSIS_RESPONSE = json.dumps(
+    {
+        "analysis": "y cycles with x and does not differ between groups.",
+        "insights": ["No group effect"],
+        "recommendations": ["Fit a periodic model"],
+        "possible_analyses": ["Correlation analysis"],
+    }
+)
+
+STUB_RENDERER = """#!{python}
+import os, time
+time.sleep({seconds})
+for key in ("VISUAL_OUTPUT_PNG", "VISUAL_OUTPUT_PDF"):
+    with open(os.environ[key], "wb") as f:
+        f.write(b"stub")
+"""
+
+
+def _respond(request: dict) -> str:
+    """Streaming calls are chat turns, plain calls are the result analysis"""
+    if request.get("stream"):
+        return CHAT_RESPONSE
+    system = " ".join(
+        str(m.get("content", "")) for m in request.get("messages", []) if m.get("role") == "system"
+    )
+    if "title" in system.lower():
+        return "Benchmark conversation"
+    return ANALYSIS_RESPONSE
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def q(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+    return {"p50": q(0.5), "p95": q(0.95), "p99": q(0.99), "max": round(ordered[-1] * 1000, 1)}
+
+
+class LoopMonitor:
+    """Samples event-loop lag and RSS while a level runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.peak_rss = _rss_bytes()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+            self.peak_rss = max(self.peak_rss, _rss_bytes())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def _run_stream(
+    orchestrator: ChatOrchestrator,
+    session_factory,
+    conversation_id: int,
+    user_id: int,
+    turns: int,
+) -> List[Dict[str, Any]]:
+    results = []
+    async with session_factory() as db:
+        for turn in range(turns):
+            start = time.perf_counter()
+            ttft = None
+            errors = []
+            async for event in orchestrator.process_stream(
+                db=db,
+                user_message=f"Plot y against x, coloured by group (turn {turn})",
+                conversation_id=conversation_id,
+                user_id=user_id,
+            ):
+                # Same serialization as the SSE endpoint
+                json.dumps(event, ensure_ascii=False)
+                if ttft is None and event.get("type") == "message" and event.get("content"):
+                    ttft = time.perf_counter() - start
+                if event.get("type") == "error":
+                    errors.append(str(event.get("content")))
+            results.append(
+                {"ttft": ttft, "latency": time.perf_counter() - start, "errors": errors}
+            )
+    return results
+
+
+async def _prepare_streams(session_factory, count: int, offset: int, llm_config: dict):
+    """One user and conversation per stream so render outputs don't collide"""
+    ids = []
+    async with session_factory() as db:
+        for i in range(offset, offset + count):
+            user = User(
+                username=f"bench{i}", email=f"bench{i}@example.com", hashed_password="x"
+            )
+            db.add(user)
+            await db.flush()
+            conversation = Conversation(
+                user_id=user.id,
+                title="Benchmark conversation",
+                is_active=True,
+                meta_data={"llm_config": llm_config},
+            )
+            db.add(conversation)
+            await db.flush()
+            ids.append((conversation.id, user.id))
+        await db.commit()
+    return ids
+
+
+async def run_level(
+    orchestrator, session_factory, concurrency: int, offset: int, turns: int, llm_config
+) -> Dict[str, Any]:
+    streams = await _prepare_streams(session_factory, concurrency, offset, llm_config)
+    baseline_rss = _rss_bytes()
+    monitor = LoopMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    per_stream = await asyncio.gather(
+        *[
+            _run_stream(orchestrator, session_factory, cid, uid, turns)
+            for cid, uid in streams
+        ]
+    )
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    turns_done = [t for stream in per_stream for t in stream]
+    return {
+        "concurrency": concurrency,
+        "turns": len(turns_done),
+        "errors": sum(len(t["errors"]) for t in turns_done),
+        "error_samples": sorted({e for t in turns_done for e in t["errors"]})[:3],
+        "turns_per_second": round(len(turns_done) / elapsed, 2),
+        "ttft_ms": _percentiles([t["ttft"] for t in turns_done if t["ttft"] is not None]),
+        "turn_latency_ms": _percentiles([t["latency"] for t in turns_done]),
+        "loop_lag_ms": _percentiles(monitor.lags),
+        "memory_per_stream_kb": round(
+            max(0, monitor.peak_rss - baseline_rss) / concurrency / 1024, 1
+        ),
+    }
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    def fmt(stats: Dict[str, Any], keys=("p50", "p95", "p99")) -> str:
+        return "/".join(str(stats[k]) for k in keys)
+
+    header = (
+        f"{'conc':>5} {'turns/s':>8} {'err':>4} "
+        f"{'ttft p50/p95/p99 (ms)':>24} {'turn p50/p95/p99 (ms)':>24} "
+        f"{'lag p95/max (ms)':>17} {'KB/stream':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['concurrency']:>5} {r['turns_per_second']:>8} {r['errors']:>4} "
+            f"{fmt(r['ttft_ms']):>24} {fmt(r['turn_latency_ms']):>24} "
+            f"{fmt(r['loop_lag_ms'], ('p95', 'max')):>17} "
+            f"{r['memory_per_stream_kb']:>10}"
+        )
+
+
+async def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    workdir = Path(tempfile.mkdtemp(prefix="chat_bench_"))
+
+    # Stub renderer in place of Rscript
+    renderer = workdir / "stub_render"
+    renderer.write_text(
+        STUB_RENDERER.format(python=sys.executable, seconds=args.render_ms / 1000)
+    )
+    renderer.chmod(renderer.stat().st_mode | stat.S_IEXEC)
+    settings.interpreter_config["r"]["command"] = str(renderer)
+    settings.visual_output_root = workdir / "visual"
+
+    # Measure the backend, not the provider limits or the response cache
+    settings.siliconflow_api_key = settings.siliconflow_api_key or "bench"
+    settings.llm_rate_limit = 0
+    settings.llm_max_concurrency = max(settings.llm_max_concurrency, 4 * max(args.concurrency))
+    settings.llm_cache_enabled = args.cache
+    settings.debug = False
+
+    database_url = args.database_url or f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    results = []
+    with FakeOpenAIServer(
+        responder=_respond,
+        latency=args.first_token_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+    ) as server:
+        llm_config = {
+            "source": "Custom",
+            "model": "bench-model",
+            "base_url": server.base_url,
+            "temperature": 0,
+        }
+        orchestrator = ChatOrchestrator()
+        offset = 0
+        for concurrency in args.concurrency:
+            result = await run_level(
+                orchestrator, session_factory, concurrency, offset, args.turns, llm_config
+            )
+            offset += concurrency
+            results.append(result)
+            print(
+                f"concurrency={concurrency}: {result['turns_per_second']} turns/s, "
+                f"ttft p95={result['ttft_ms']['p95']} ms",
+                file=sys.stderr,
+            )
+
+    await engine.dispose()
+    _print_table(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    # Turns that ended in an error event only time the error path
+    errors = sum(r["errors"] for r in results)
+    if errors:
+        print(
+            f"\nERROR: {errors} turn(s) emitted error events; the numbers above do "
+            "not measure a successful render + analysis turn.",
+            file=sys.stderr,
+        )
+        for sample in sorted({e for r in results for e in r["error_samples"]}):
+            print(f"  {sample}", file=sys.stderr)
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[1, 2, 4, 8, 16, 32],
+        help="Comma-separated concurrent stream counts",
+    )
+    parser.add_argument("--turns", type=int, default=3, help="Turns per stream")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--render-ms", type=float, default=300.0)
+    parser.add_argument("--database-url", help="Async database URL (default: temp SQLite)")
+    parser.add_argument("--cache", action="store_true", help="Keep the LLM response cache on")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    results = asyncio.run(main(parse_args()))
+    sys.exit(1 if any(r["errors"] for r in results) else 0)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+TCGA 分析子工具基准测试（离线）
+
+Generates a synthetic TCGA-shaped dataset (``scripts.analysis.db.tcga.synthetic``)
+unless ``--data-dir`` points at an existing one, then times every
+``run_analysis`` sub-tool of ``scripts.analysis.db.tcga.tcga``:
+
+- cold: first call in a fresh process (module import, DuckDB views and
+  Parquet footers not cached yet), reported separately from the import
+- warm: ``--warm-runs`` further calls in the same process
+
+Each sub-tool runs in its own spawned process so cold timings and peak RSS
+are not shared between tools. Reports cold latency, warm p50/p95, warm
+throughput and the process peak RSS. Sub-tools that return an error are
+listed with the message instead of timings.
+
+Usage (from backend/):
+    python -m tests.benchmarks.tcga_analysis --cancer-types 4 --genes 2000 --samples 1000
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.analysis.db.tcga.synthetic import generate_dataset
+
+
+def sub_tool_params(cancer_types: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Representative parameters for every sub-tool"""
+    cancer_type = cancer_types[0]
+    return {
+        "differential_expression": {"gene": "TP53", "cancer_type": cancer_type},
+        "expression_correlation": {
+            "gene_x": "TP53",
+            "gene_y": "EGFR",
+            "cancer_type": cancer_type,
+        },
+        "survival_analysis": {"gene": "MKI67", "cancer_type": cancer_type},
+        "gene_mutation": {"gene": "TP53", "cancer_type": cancer_type},
+        "copy_number_variation": {"gene": "TP53", "cancer_type": cancer_type},
+        "immune_infiltration": {"gene": "TP53", "cancer_type": cancer_type},
+        "stem_index": {"gene": "TP53", "cancer_type": cancer_type},
+        "pan_cancer_expression": {"gene": "TP53", "cancer_types": cancer_types},
+        "pathway_analysis": {
+            "gene_set": "TP53,EGFR,KRAS,PTEN,MYC",
+            "cancer_type": cancer_type,
+        },
+        "expression_summary": {"gene": "TP53", "cancer_types": cancer_types},
+        "expression_correlation_matrix": {
+            "genes": "TP53,EGFR,KRAS,PTEN,MYC",
+            "cancer_type": cancer_type,
+        },
+        "coexpression_scan": {"gene": "TP53", "cancer_type": cancer_type},
+        "survival_scan": {"cancer_type": cancer_type},
+    }
+
+
+def _measure(
+    data_dir: str, sub_tool: str, params: Dict[str, Any], warm_runs: int
+) -> Dict[str, Any]:
+    """Worker entry point: time one sub-tool in this (fresh) process"""
+    sys.path.insert(0, str(project_root))
+    start = time.perf_counter()
+    from app.utils.analysis_result import AnalysisResult
+    from scripts.analysis.db.tcga import tcga
+
+    import_ms = (time.perf_counter() - start) * 1000
+    tcga._DATA_DIR = Path(data_dir)
+
+    def call() -> float:
+        start = time.perf_counter()
+        AnalysisResult.coerce(tcga.run_analysis(sub_tool, dict(params)))
+        return (time.perf_counter() - start) * 1000
+
+    result: Dict[str, Any] = {"sub_tool": sub_tool, "import_ms": import_ms}
+    try:
+        result["cold_ms"] = call()
+        warm = [call() for _ in range(warm_runs)]
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    result["warm_p50_ms"] = statistics.median(warm)
+    result["warm_p95_ms"] = sorted(warm)[max(0, int(len(warm) * 0.95) - 1)]
+    result["warm_per_second"] = 1000 * len(warm) / sum(warm)
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def run_suite(
+    data_dir: Path, cancer_types: List[str], warm_runs: int, sub_tools: List[str]
+) -> List[Dict[str, Any]]:
+    params = sub_tool_params(cancer_types)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for sub_tool in sub_tools:
+        with context.Pool(1) as pool:
+            results.append(
+                pool.apply(
+                    _measure, (str(data_dir), sub_tool, params[sub_tool], warm_runs)
+                )
+            )
+    return results
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    header = (
+        f"{'sub_tool':<32}{'cold ms':>10}{'warm p50':>10}{'warm p95':>10}"
+        f"{'calls/s':>10}{'peak RSS MB':>13}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if "error" in r:
+            print(f"{r['sub_tool']:<32}error: {r['error'][:60]}")
+            continue
+        print(
+            f"{r['sub_tool']:<32}{r['cold_ms']:>10.1f}{r['warm_p50_ms']:>10.1f}"
+            f"{r['warm_p95_ms']:>10.1f}{r['warm_per_second']:>10.1f}"
+            f"{r['peak_rss_mb']:>13.0f}"
+        )
+
+
+def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    cancer_types = ["BRCA", "LUAD", "COAD", "KIRC", "LIHC", "STAD", "PRAD", "THCA"]
+    cancer_types = cancer_types[: args.cancer_types]
+    sub_tools = args.sub_tools or list(sub_tool_params(cancer_types))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir) if args.data_dir else Path(tmp)
+        if not args.data_dir:
+            start = time.perf_counter()
+            generate_dataset(
+                data_dir,
+                cancer_types,
+                n_genes=args.genes,
+                n_samples=args.samples,
+                seed=args.seed,
+            )
+            print(
+                f"Generated {len(cancer_types)} cancer types x {args.samples} samples "
+                f"x {args.genes} genes in {time.perf_counter() - start:.1f}s"
+            )
+        if args.build_store:
+            from scripts.analysis.db.tcga.expression_store import build_all
+
+            build_all(data_dir, cancer_types)
+
+        results = run_suite(data_dir, cancer_types, args.warm_runs, sub_tools)
+
+    _print_table(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cancer-types", type=int, default=4, help="Number of cancer types (max 8)")
+    parser.add_argument("--genes", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=1000, help="Tumor samples per cancer type")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-runs", type=int, default=20)
+    parser.add_argument(
+        "--sub-tools",
+        type=lambda s: s.split(","),
+        help="Comma-separated sub-tools (default: all)",
+    )
+    parser.add_argument("--data-dir", help="Use an existing (synthetic or real) data directory")
+    parser.add_argument(
+        "--build-store", action="store_true", help="Build gene-major expression stores first"
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+TCGA 数据变换微基准（离线）
+
+Compares the row-wise pandas code the TCGA sub-tools used to run (``.apply``
+with a lambda per row, ``.query`` strings, ``pd.merge`` of a separately
+loaded clinical table) with the current vectorised versions, where the
+clinical columns are selected and filtered in DuckDB before a single join, on
+a synthetic cancer type written to a temporary data directory.
+
+The transforms are timed on frames already loaded into memory, so the speedup
+column measures only the code that changed. The Parquet loads each side needs
+(including the DuckDB-side clinical filtering of the current version) are
+timed and reported separately.
+
+Usage (from backend/):
+    python -m tests.benchmarks.tcga_transforms --samples 10000 --repeat 5
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.utils.duckdb_pool import DuckDBPool
+from scripts.analysis.db.tcga import tcga
+
+GENE = "TP53"
+
+
+def write_cancer_type(data_dir: Path, n_samples: int, seed: int = 0) -> None:
+    """Expression (tumor + 10% normal) and clinical Parquet for one cancer type"""
+    rng = np.random.default_rng(seed)
+    n_patients = n_samples
+    patients = [f"TCGA-XX-{i:06d}" for i in range(n_patients)]
+    n_normal = n_samples // 10
+    directory = data_dir / "BENCH"
+    directory.mkdir(parents=True)
+    pq.write_table(
+        pa.table(
+            {
+                "patient": patients + patients[:n_normal],
+                "sample_type": ["01"] * n_patients + ["11"] * n_normal,
+                GENE: rng.lognormal(2, 1, n_patients + n_normal),
+            }
+        ),
+        directory / "rsem_gene_tpm.parquet",
+    )
+    os_time = rng.exponential(1000, n_patients)
+    os_time[rng.random(n_patients) < 0.05] = np.nan
+    pq.write_table(
+        pa.table(
+            {
+                "patient_barcode": patients,
+                "stage": rng.choice(["Stage I", "Stage II", "Stage III"], n_patients),
+                "OS": rng.integers(0, 2, n_patients),
+                "OS_time": os_time,
+            }
+        ),
+        directory / "clinical.parquet",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Loads (timed separately from the transforms)
+# ---------------------------------------------------------------------------
+
+
+def load_tumor() -> pd.DataFrame:
+    return tcga._load_expression_data(
+        "BENCH", columns=["patient", GENE], sample_type="tumor"
+    )
+
+
+def load_all_samples() -> pd.DataFrame:
+    return tcga._load_expression_data(
+        "BENCH", columns=["patient", "sample_type", GENE]
+    )
+
+
+def legacy_load_survival() -> pd.DataFrame:
+    return tcga._load_survival_data(
+        "BENCH", columns=["patient_barcode", "OS", "OS_time"]
+    )
+
+
+def current_load_survival() -> pd.DataFrame:
+    return tcga._load_clinical("BENCH", ["OS", "OS_time"], drop_missing=True)
+
+
+def legacy_load_stage() -> pd.DataFrame:
+    return tcga._load_survival_data("BENCH", columns=["patient_barcode", "stage"])
+
+
+def current_load_stage() -> pd.DataFrame:
+    return tcga._load_clinical("BENCH", ["stage"])
+
+
+# ---------------------------------------------------------------------------
+# Previous implementations
+# ---------------------------------------------------------------------------
+
+
+def legacy_survival(expression: pd.DataFrame, survival: pd.DataFrame) -> pd.DataFrame:
+    data = (
+        pd.merge(expression, survival, left_on="patient", right_on="patient_barcode")
+        .query("~OS_time.isna() and ~OS.isna()")
+        .drop(columns=["patient_barcode"])
+    )
+    cutoff = float(data[GENE].median())
+    data["group"] = data[GENE].apply(lambda x: "High" if x > cutoff else "Low")
+    return data
+
+
+def legacy_tumor_vs_normal(tcga_data: pd.DataFrame) -> pd.DataFrame:
+    normal_data = tcga_data.query('sample_type == "11"')
+    tumor_data = tcga_data.query(
+        'sample_type == "01" and patient not in @normal_data.patient'
+    )
+    data = pd.concat([tumor_data, normal_data])
+    data["sample_type"] = data["sample_type"].apply(
+        lambda x: ("Normal" if x == "11" else ("Tumor" if x == "01" else "GTEx"))
+    )
+    return data
+
+
+def legacy_stage(expression: pd.DataFrame, clinical: pd.DataFrame) -> pd.DataFrame:
+    return pd.merge(
+        expression, clinical, left_on="patient", right_on="patient_barcode"
+    )[["patient", "stage", GENE]]
+
+
+def legacy_cnv(values: np.ndarray) -> dict:
+    data = pd.DataFrame({"cnv_value": values})
+    data["cnv_category"] = data["cnv_value"].apply(
+        lambda x: "amplification" if x > 0 else "deletion" if x < 0 else "normal"
+    )
+    return {
+        c: len(data[data["cnv_category"] == c])
+        for c in ("amplification", "deletion", "normal")
+    }
+
+
+# ---------------------------------------------------------------------------
+# Current implementations
+# ---------------------------------------------------------------------------
+
+
+def current_survival(expression: pd.DataFrame, clinical: pd.DataFrame) -> pd.DataFrame:
+    # _merge_clinical without the load
+    data = expression.merge(clinical, on="patient")
+    cutoff = float(data[GENE].median())
+    data["group"] = np.where(data[GENE] > cutoff, "High", "Low")
+    return data
+
+
+def current_stage(expression: pd.DataFrame, clinical: pd.DataFrame) -> pd.DataFrame:
+    return expression.merge(clinical, on="patient")[["patient", "stage", GENE]]
+
+
+def current_tumor_vs_normal(tcga_data: pd.DataFrame) -> pd.DataFrame:
+    is_normal = tcga_data["sample_type"] == "11"
+    normal_data = tcga_data[is_normal]
+    tumor_data = tcga_data[
+        (tcga_data["sample_type"] == "01")
+        & ~tcga_data["patient"].isin(normal_data["patient"])
+    ]
+    data = pd.concat([tumor_data, normal_data])
+    data["sample_type"] = data["sample_type"].map(tcga.SAMPLE_TYPE_LABELS).fillna(
+        "GTEx"
+    )
+    return data
+
+
+def current_cnv(values: np.ndarray) -> dict:
+    categories = pd.Categorical(
+        np.select([values > 0, values < 0], ["amplification", "deletion"], "normal"),
+        categories=tcga.CNV_CATEGORIES,
+    )
+    return {c: int(n) for c, n in pd.Series(categories).value_counts().items()}
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    fn()  # warm views / imports
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    cnv_values = np.random.default_rng(1).choice(
+        [-2, -1, 0, 1, 2], args.samples, p=[0.05, 0.1, 0.7, 0.1, 0.05]
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tcga._DATA_DIR = Path(tmp)
+        write_cancer_type(Path(tmp), args.samples)
+
+        # (name, legacy load, current load); each returns the transform's inputs
+        loads: List[Tuple[str, Callable[[], tuple], Callable[[], tuple]]] = [
+            (
+                "survival_analysis",
+                lambda: (load_tumor(), legacy_load_survival()),
+                lambda: (load_tumor(), current_load_survival()),
+            ),
+            ("tumor_vs_normal", lambda: (load_all_samples(),), None),
+            (
+                "pathologic_stage",
+                lambda: (load_tumor(), legacy_load_stage()),
+                lambda: (load_tumor(), current_load_stage()),
+            ),
+            ("cnv_categories", lambda: (cnv_values,), None),
+        ]
+        transforms = {
+            "survival_analysis": (legacy_survival, current_survival),
+            "tumor_vs_normal": (legacy_tumor_vs_normal, current_tumor_vs_normal),
+            "pathologic_stage": (legacy_stage, current_stage),
+            "cnv_categories": (legacy_cnv, current_cnv),
+        }
+
+        print(f"{args.samples} samples, best of {args.repeat}")
+        print(
+            f"{'transform':<20}{'legacy ms':>12}{'current ms':>12}{'speedup':>10}"
+            f"{'legacy load':>14}{'current load':>14}"
+        )
+        for name, legacy_load, current_load in loads:
+            current_load = current_load or legacy_load
+            legacy_inputs = legacy_load()
+            current_inputs = current_load()
+            legacy, current = transforms[name]
+            assert len(legacy(*legacy_inputs)) == len(current(*current_inputs))
+
+            # Transforms run on frames already in memory
+            before = best_of(lambda: legacy(*legacy_inputs), args.repeat)
+            after = best_of(lambda: current(*current_inputs), args.repeat)
+            load_before = best_of(legacy_load, args.repeat)
+            load_after = best_of(current_load, args.repeat)
+            print(
+                f"{name:<20}{before * 1000:>12.2f}{after * 1000:>12.2f}"
+                f"{before / after:>9.1f}x"
+                f"{load_before * 1000:>14.2f}{load_after * 1000:>14.2f}"
+            )
+        DuckDBPool.close()
+
+
+if __name__ == "__main__":
+    main()
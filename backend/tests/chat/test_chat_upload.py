@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+测试聊天附件上传：分块写入、SHA-256 去重与大小限制
+"""
+
+import asyncio
+import hashlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.services.chat_upload import ChatUploadService, UploadTooLargeError
+
+
+def _save(content: bytes, filename: str = "expr.csv", declare_size: bool = True):
+    async def run():
+        upload = UploadFile(
+            io.BytesIO(content),
+            filename=filename,
+            size=len(content) if declare_size else None,
+        )
+        return [event async for event in ChatUploadService.save(upload, user_id=1)]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def upload_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "static_root", tmp_path)
+    monkeypatch.setattr(settings, "chat_upload_chunk_size", 1024)
+    monkeypatch.setattr(settings, "chat_upload_progress_interval", 0)
+    monkeypatch.setattr(settings, "chat_upload_max_bytes", 64 * 1024)
+    return tmp_path
+
+
+def test_chunked_upload_is_hashed_and_deduplicated(upload_settings):
+    content = b"gene,value\n" + b"TP53,1.5\n" * 1000
+
+    first = _save(content)
+    second = _save(content, filename="copy.csv")
+
+    assert [e["type"] for e in first[:-1]] == ["upload_progress"] * (len(first) - 1)
+    assert first[-1]["deduplicated"] is False and second[-1]["deduplicated"] is True
+
+    a, b = Path(first[-1]["file"]["file_path"]), Path(second[-1]["file"]["file_path"])
+    assert a != b and a.read_bytes() == content == b.read_bytes()
+    # 相同内容只存一份
+    assert a.stat().st_ino == b.stat().st_ino
+    assert first[-1]["file"]["sha256"] == hashlib.sha256(content).hexdigest()
+
+
+def test_oversized_upload_is_rejected_and_removed(upload_settings):
+    content = b"x" * (65 * 1024)
+
+    with pytest.raises(UploadTooLargeError):
+        _save(content)
+    # 未声明大小时在写入过程中超限
+    with pytest.raises(UploadTooLargeError):
+        _save(content, declare_size=False)
+
+    assert not any(p.is_file() for p in (upload_settings / "chat_files").rglob("*"))
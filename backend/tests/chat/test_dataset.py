@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+测试上传表格的数据集化：格式嗅探、Parquet 转换、列画像与按哈希缓存
+"""
+
+import asyncio
+import gzip
+import hashlib
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.config import settings
+from app.services.dataset import DatasetService
+
+
+@pytest.fixture
+def dataset_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "static_root", tmp_path)
+    monkeypatch.setattr(settings, "dataset_sniff_rows", 10)
+    return tmp_path
+
+
+def _file_info(path: Path) -> dict:
+    return {
+        "filename": path.name,
+        "file_path": str(path),
+        "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+    }
+
+
+def test_tsv_without_extension_is_profiled_and_cached(dataset_root):
+    path = dataset_root / "upload"
+    # 类型检测只采样开头，靠后的行出现非数值时整列回退为字符串
+    rows = [f"G{i}\t{i * 0.5}\t{i}" for i in range(100_000)]
+    rows[90_000] = "G90000\t45000.0\tNA_x"
+    path.write_text("gene\tlog2FC\tcount\n" + "\n".join(rows) + "\n")
+    info = _file_info(path)
+
+    assert DatasetService.sniff_format(path) == "tsv"
+    profiles = asyncio.run(DatasetService.wait_for([info], user_id=1))
+    profile = profiles[info["sha256"]]
+
+    assert profile["rows"] == 100_000 and profile["format"] == "tsv"
+    assert [c["name"] for c in profile["columns"]] == ["gene", "log2FC", "count"]
+    assert profile["columns"][2]["type"] == "VARCHAR"
+    assert pq.read_metadata(profile["parquet_path"]).num_rows == 100_000
+
+    text = DatasetService.format_for_prompt([info], profiles)
+    assert f"dataset={info['sha256']}" in text and "log2FC" in text
+
+    # 第二次直接读取缓存
+    path.unlink()
+    again = asyncio.run(DatasetService.profile(info))
+    assert again["rows"] == 100_000
+
+    rows = DatasetService.load_rows(info["sha256"], user_id=1)
+    assert len(rows) == 100_000 and rows[0]["gene"] == "G0"
+    with pytest.raises(ValueError):
+        DatasetService.load_rows(info["sha256"], user_id=2)
+
+
+def test_parquet_and_non_tabular_files(dataset_root):
+    parquet_path = dataset_root / "expr.parquet"
+    pq.write_table(pa.table({"x": [1.0, 2.0, 3.0], "y": ["a", "b", None]}), parquet_path)
+    fastq_path = dataset_root / "reads.fastq"
+    fastq_path.write_text("@r1\nACGT\n+\nIIII\n")
+
+    infos = [_file_info(parquet_path), _file_info(fastq_path)]
+    profiles = asyncio.run(DatasetService.wait_for(infos, user_id=1))
+
+    assert list(profiles) == [infos[0]["sha256"]]
+    columns = {c["name"]: c for c in profiles[infos[0]["sha256"]]["columns"]}
+    assert columns["x"]["max"] == "3.0" and columns["y"]["null_percent"] > 0
+
+
+def test_compressed_upload_uses_original_filename(dataset_root):
+    # 上传文件以生成的名字保存，只有原始文件名带 .csv.gz
+    path = dataset_root / "3f2a9c.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("gene,score\n" + "\n".join(f"G{i},{i}" for i in range(20)) + "\n")
+    info = {**_file_info(path), "filename": "scores.csv.gz"}
+
+    assert DatasetService.sniff_format(path) is None
+    assert DatasetService.sniff_format(path, "scores.csv.gz") == "csv"
+    profile = asyncio.run(DatasetService.wait_for([info], user_id=1))[info["sha256"]]
+    assert profile["format"] == "csv" and profile["rows"] == 20
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+会话测试共用的数据库夹具：内存 SQLite、建表、一个用户和一个会话
+"""
+
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.models import Conversation, User
+from app.models import visual as _visual_models  # noqa: F401  (User relationships)
+
+
+@dataclass
+class ConversationDB:
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    user_id: int
+    conversation_id: int
+
+
+async def _create_conversation_db() -> ConversationDB:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        user = User(username="u", email="u@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        conversation = Conversation(user_id=user.id, title="t", is_active=True)
+        db.add(conversation)
+        await db.commit()
+    return ConversationDB(engine, session_factory, user.id, conversation.id)
+
+
+@pytest.fixture
+def conversation_db():
+    """
+    异步工厂：``cdb = await conversation_db()``。
+
+    在测试自己的事件循环里调用（测试用 asyncio.run），结束时
+    ``await cdb.engine.dispose()``。
+    """
+    return _create_conversation_db
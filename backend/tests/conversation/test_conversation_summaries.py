@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试会话列表摘要：最后一条消息预览与游标分页
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete, update
+
+from app.models import Conversation, Message, User
+from app.services.conversation import ConversationService
+
+
+def test_conversation_summaries(conversation_db):
+    async def run():
+        cdb = await conversation_db()
+        async with cdb.session_factory() as db:
+            # 夹具自带的会话 "t" 没有消息；其余会话在同一秒内创建，
+            # updated_at 相同时按 id 倒序
+            conversations = [
+                Conversation(user_id=cdb.user_id, title=f"c{i}", is_active=True)
+                for i in range(4)
+            ]
+            db.add_all(conversations)
+            db.add(Conversation(user_id=cdb.user_id, title="archived", is_active=False))
+            other = User(username="o", email="o@example.com", hashed_password="x")
+            db.add(other)
+            await db.flush()
+            db.add(Conversation(user_id=other.id, title="other", is_active=True))
+            for i, conv in enumerate(conversations):
+                db.add_all(
+                    Message(
+                        conversation_id=conv.id,
+                        role="user" if j % 2 == 0 else "assistant",
+                        content=f"c{i}-m{j}" + "x" * 50,
+                    )
+                    for j in range(i + 1)
+                )
+            await db.commit()
+
+        async with cdb.session_factory() as db:
+            pages, cursor = [], None
+            for _ in range(5):
+                summaries, cursor = await ConversationService.list_conversation_summaries(
+                    db, cdb.user_id, limit=2, cursor=cursor, preview_chars=5
+                )
+                pages.append(
+                    [
+                        (s.title, s.last_message.content if s.last_message else None)
+                        for s in summaries
+                    ]
+                )
+                if cursor is None:
+                    break
+
+            assert pages == [
+                [("c3", "c3-m3"), ("c2", "c2-m2")],
+                [("c1", "c1-m1"), ("c0", "c0-m0")],
+                [("t", None)],
+            ]
+
+            everything, _ = await ConversationService.list_conversation_summaries(
+                db, cdb.user_id, limit=10, include_inactive=True
+            )
+            assert [s.title for s in everything][0] == "archived"
+            assert len(everything) == 6
+        await cdb.engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_cursor_survives_deleted_and_updated_rows(conversation_db):
+    async def run():
+        cdb = await conversation_db()
+        async with cdb.session_factory() as db:
+            # 显式时间戳带微秒，夹具自带会话 "t" 的服务端默认值不带
+            base = datetime(2020, 1, 1, 12, 0, 0, 500)
+            db.add_all(
+                Conversation(
+                    user_id=cdb.user_id,
+                    title=f"c{i}",
+                    is_active=True,
+                    updated_at=base + timedelta(seconds=i // 2),
+                )
+                for i in range(4)
+            )
+            await db.commit()
+
+        async with cdb.session_factory() as db:
+            first, cursor = await ConversationService.list_conversation_summaries(
+                db, cdb.user_id, limit=2
+            )
+            assert [s.title for s in first] == ["t", "c3"]
+
+            # 游标所在的会话被删除，另一个已列出的会话被更新到最前
+            await db.execute(delete(Conversation).where(Conversation.title == "c3"))
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.title == "t")
+                .values(updated_at=datetime(2030, 1, 1))
+            )
+            await db.commit()
+
+            second, cursor = await ConversationService.list_conversation_summaries(
+                db, cdb.user_id, limit=2, cursor=cursor
+            )
+            assert [s.title for s in second] == ["c2", "c1"]
+            third, cursor = await ConversationService.list_conversation_summaries(
+                db, cdb.user_id, limit=2, cursor=cursor
+            )
+            assert [s.title for s in third] == ["c0"] and cursor is None
+
+            with pytest.raises(ValueError):
+                await ConversationService.list_conversation_summaries(
+                    db, cdb.user_id, cursor="not-a-cursor"
+                )
+        await cdb.engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+测试会话加载档位（header / recent / full）与消息键集分页
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy.exc import InvalidRequestError
+
+from app.models import Message
+from app.schemas.conversation import ConversationUpdate
+from app.services.conversation import ConversationService, MessageService
+
+
+async def _setup(conversation_db, n_messages: int):
+    cdb = await conversation_db()
+    async with cdb.session_factory() as db:
+        # 同一秒内写入，created_at 相同时由 id 决定顺序
+        db.add_all(
+            Message(
+                conversation_id=cdb.conversation_id,
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"m{i}",
+                is_complete=i != n_messages - 1,
+            )
+            for i in range(n_messages)
+        )
+        await db.commit()
+    return cdb.engine, cdb.session_factory, cdb.user_id, cdb.conversation_id
+
+
+def test_loading_profiles(conversation_db):
+    async def run():
+        engine, session_factory, user_id, conversation_id = await _setup(conversation_db, 6)
+        async with session_factory() as db:
+            header = await ConversationService.get_conversation(
+                db, conversation_id, user_id, load="header"
+            )
+            with pytest.raises(InvalidRequestError):
+                header.messages
+
+        async with session_factory() as db:
+            recent = await ConversationService.get_conversation(
+                db, conversation_id, user_id, load="recent", message_limit=2
+            )
+            assert [m.content for m in recent.messages] == ["m4", "m5"]
+
+        async with session_factory() as db:
+            updated = await ConversationService.update_conversation(
+                db, conversation_id, user_id, ConversationUpdate(title="new")
+            )
+            assert updated.title == "new"
+            history = await MessageService.format_messages_for_agent(
+                db, conversation_id, limit=3
+            )
+            # 未完成的最后一条消息不计入
+            assert [m["content"] for m in history] == ["m2", "m3", "m4"]
+
+        async with session_factory() as db:
+            assert await ConversationService.delete_conversation(db, conversation_id, user_id)
+            assert await ConversationService.get_conversation(db, conversation_id) is None
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_keyset_pagination(conversation_db):
+    async def run():
+        engine, session_factory, _, conversation_id = await _setup(conversation_db, 7)
+        async with session_factory() as db:
+            pages, after_id = [], None
+            while True:
+                page = await MessageService.get_conversation_messages(
+                    db, conversation_id, limit=3, after_id=after_id
+                )
+                if not page:
+                    break
+                pages.append([m.content for m in page])
+                after_id = page[-1].id
+            assert pages == [["m0", "m1", "m2"], ["m3", "m4", "m5"], ["m6"]]
+
+            previous = await MessageService.get_conversation_messages(
+                db, conversation_id, limit=2, before_id=after_id
+            )
+            assert [m.content for m in previous] == ["m4", "m5"]
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+测试 MessageBatch：一次事务写入多条消息，更新时在内存中合并元数据
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import event, select
+
+from app.models import Message
+from app.services.conversation import MessageBatch, MessageService
+
+
+def test_message_batch_turn(conversation_db):
+    async def run():
+        cdb = await conversation_db()
+        engine, session_factory = cdb.engine, cdb.session_factory
+        conversation_id = cdb.conversation_id
+
+        statements = []
+        event.listen(
+            engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+
+        async with session_factory() as db:
+            batch = MessageBatch(db)
+            batch.add(conversation_id, "user", "plot", metadata={"files": None})
+            reply = batch.add(
+                conversation_id,
+                "assistant",
+                "drawing",
+                metadata={"needs_info": False},
+                is_complete=False,
+            )
+            await batch.commit()
+            assert [m.id for m in batch.messages] == sorted(
+                m.id for m in batch.messages
+            )
+            assert reply.created_at is not None
+
+            batch.update(reply, metadata={"visual_tool_id": 7}, is_complete=True)
+            await batch.commit()
+            # Nothing staged: no statement
+            await batch.commit()
+
+        # PostgreSQL 上是一条多值 INSERT；SQLite 为保证 RETURNING 顺序按行执行
+        kinds = [s.lstrip().split()[0].upper() for s in statements]
+        assert kinds.count("INSERT") <= 2
+        assert kinds.count("UPDATE") == 1
+        assert not any(
+            "FROM messages" in s for s in statements if s.lstrip().upper().startswith("SELECT")
+        )
+
+        async with session_factory() as db:
+            messages = await MessageService.get_conversation_messages(db, conversation_id)
+            assert [(m.role, m.is_complete) for m in messages] == [
+                ("user", True),
+                ("assistant", True),
+            ]
+            assert messages[1].meta_data == {"needs_info": False, "visual_tool_id": 7}
+            rows = (await db.execute(select(Message.id))).scalars().all()
+            assert len(rows) == 2
+
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试流式对话中的结果分析：错误恢复改动了请求时，分析基于实际渲染的参数
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+pytest.importorskip("llama_index")
+
+from app.agent.models import VisualAnalysisResponse
+from app.orchestration import ChatOrchestrator
+
+REQUEST = {
+    "chart_type": "scatter/basic",
+    "engine": "r",
+    "data": [{"x": 1, "y": 2}],
+    "params": {"x_col": "x", "y_col": "z"},
+    "reasoning": "scatter",
+}
+
+
+class FakeAgent:
+    def __init__(self):
+        self.analysed = []
+
+    async def process_message_stream(self, **kwargs):
+        yield {
+            "type": "message",
+            "content": "ok",
+            "needs_info": False,
+            "visual_request": REQUEST,
+        }
+
+    async def generate_visualization(self, visual_request, user_id):
+        # 第一次渲染失败，错误恢复把 y_col 改成存在的列
+        fixed = visual_request.model_copy(
+            update={"params": {**visual_request.params, "y_col": "y"}}
+        )
+        return {
+            "success": True,
+            "image_url": "/a.png",
+            "retry_count": 1,
+            "visual_request": fixed,
+        }
+
+    async def analyze_visualization(self, chart_type, params, user_request):
+        self.analysed.append(params)
+        await asyncio.sleep(0)
+        return VisualAnalysisResponse(
+            analysis=f"y_col={params['y_col']}",
+            insights=[],
+            recommendations=[],
+            possible_analyses=[],
+        )
+
+
+def test_analysis_follows_recovered_request(conversation_db, monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(
+        ChatOrchestrator, "_get_agent", lambda self, config=None: agent
+    )
+
+    async def run():
+        cdb = await conversation_db()
+        async with cdb.session_factory() as db:
+            events = [
+                e
+                async for e in ChatOrchestrator().process_stream(
+                    db, "plot y", cdb.conversation_id, cdb.user_id
+                )
+            ]
+        await cdb.engine.dispose()
+        return events
+
+    events = asyncio.run(run())
+    analysis = next(e for e in events if e["type"] == "analysis")
+    assert analysis["analysis"] == "y_col=y"
+    assert agent.analysed[-1]["y_col"] == "y"
@@ -0,0 +1,165 @@
+"""
+Local fake of the OpenAI chat completions API for tests and benchmarks.
+
+Serves ``POST /v1/chat/completions`` (plain and SSE streaming) from a
+background thread. Behaviour is configurable per instance: a fixed response
+text (or a ``responder`` callable choosing it per request), latency before
+the first token, streaming token rate, and a number of initial requests
+answered with 429 / 500.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+
+class FakeOpenAIServer:
+    """Threaded OpenAI-compatible server; use as a context manager."""
+
+    def __init__(
+        self,
+        response_text: str = '{"message": "ok", "needs_info": false}',
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        fail_first: int = 0,
+        fail_status: int = 429,
+        retry_after: Optional[float] = None,
+        chunk_size: int = 4,
+        responder: Optional[Callable[[dict], str]] = None,
+    ):
+        self.response_text = response_text
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.responder = responder
+        self.requests: List[dict] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    fake.requests.append(request)
+                    attempt = len(fake.requests)
+
+                if attempt <= fake.fail_first:
+                    headers = {}
+                    if fake.retry_after is not None:
+                        headers["Retry-After"] = str(fake.retry_after)
+                    self._send_json(
+                        fake.fail_status,
+                        {"error": {"message": "fake failure", "type": "rate_limit"}},
+                        headers,
+                    )
+                    return
+
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                model = request.get("model", "fake-model")
+                text = fake.responder(request) if fake.responder else fake.response_text
+                if not request.get("stream"):
+                    self._send_json(
+                        200,
+                        {
+                            "id": f"chatcmpl-{attempt}",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": text,
+                                    },
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": {
+                                "prompt_tokens": 1,
+                                "completion_tokens": 1,
+                                "total_tokens": 2,
+                            },
+                        },
+                    )
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write_event(data: str):
+                    payload = f"data: {data}\n\n".encode()
+                    self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                    self.wfile.flush()
+
+                for start in range(0, len(text), fake.chunk_size):
+                    if fake.tokens_per_second:
+                        time.sleep(1 / fake.tokens_per_second)
+                    chunk = {
+                        "id": f"chatcmpl-{attempt}",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"content": text[start : start + fake.chunk_size]},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                    write_event(json.dumps(chunk))
+                write_event("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "FakeOpenAIServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试图表请求预检：列映射、类型与自动修复
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.visual_preflight import VisualPreflightService
+
+
+VOLCANO_DATA = [
+    {"symbol": "Ccdc50", "log2FC": "0.0209", "qvalue": 0.9487, "group": "None"},
+    {"symbol": "Hmgcs1", "log2FC": "0.4255", "qvalue": 0.2555, "group": "Up"},
+]
+
+
+def test_case_insensitive_columns_and_numeric_strings_are_fixed():
+    params = {
+        "data": VOLCANO_DATA,
+        "ggplot2": {
+            "mapping": {"x": "log2fc", "y": "-log10(QValue)", "colour": "Group"},
+            "layers": [{"type": "geom_point", "mapping": {"size": "abs(log2FC)"}}],
+        },
+    }
+    result = VisualPreflightService.validate(params)
+
+    assert result.ok
+    mapping = result.params["ggplot2"]["mapping"]
+    assert mapping == {"x": "log2FC", "y": "-log10(qvalue)", "colour": "group"}
+    assert result.params["data"][0]["log2FC"] == 0.0209
+    # 原始参数不被修改
+    assert params["ggplot2"]["mapping"]["x"] == "log2fc"
+    assert params["ggplot2"]["layers"][0]["mapping"]["size"] == "abs(log2FC)"
+    assert VOLCANO_DATA[0]["log2FC"] == "0.0209"
+
+
+def test_data_is_shared_when_no_rows_change():
+    data = [{"x": i, "y": i * 2.0} for i in range(1000)]
+    params = {"data": data, "ggplot2": {"mapping": {"x": "X", "y": "y"}}}
+    result = VisualPreflightService.validate(params)
+
+    assert result.ok
+    assert result.params["ggplot2"]["mapping"]["x"] == "x"
+    assert params["ggplot2"]["mapping"]["x"] == "X"
+    # 内联数据不复制
+    assert result.params["data"] is data
+
+
+def test_missing_column_and_type_mismatch_are_reported():
+    params = {
+        "data": VOLCANO_DATA,
+        "ggplot2": {"mapping": {"x": "pvalue", "y": "-log10(symbol)"}},
+    }
+    result = VisualPreflightService.validate(params)
+
+    assert not result.ok
+    assert [i.error_type for i in result.issues] == ["missing_column", "type_mismatch"]
+    assert result.error_details()["error_type"] == "preflight"
+
+
+def test_params_schema_types_and_column_params():
+    schema = {
+        "x_col": {"type": "string"},
+        "color_col": {"type": ["string", "null"]},
+        "width": {"type": "integer"},
+        "height": {"type": "integer"},
+        "dpi": {"type": "integer"},
+    }
+    params = {
+        "data": VOLCANO_DATA,
+        "x_col": "SYMBOL",
+        "width": "800",
+        "height": 600.0,
+        "dpi": 72.5,
+    }
+    result = VisualPreflightService.validate(params, schema)
+
+    assert result.params["x_col"] == "symbol"
+    assert result.params["width"] == 800
+    assert result.params["height"] == 600 and isinstance(result.params["height"], int)
+    # 非整数的浮点数仍然报类型错误
+    assert [issue.field for issue in result.issues] == ["dpi"]
+    assert result.error_details()["issues"][0]["error_type"] == "type_mismatch"
+
+
+def test_heatmap_rownames_column():
+    params = {
+        "data": {"matrix": [{"Sample": "YAP1", "S1": "2.1", "S2": 3.0}]},
+        "heatmap": {"transform": {"rownames": "sample"}},
+    }
+    result = VisualPreflightService.validate(params)
+
+    assert result.ok
+    assert result.params["heatmap"]["transform"]["rownames"] == "Sample"
+    assert result.params["data"]["matrix"][0]["S1"] == 2.1
+    assert params["heatmap"]["transform"]["rownames"] == "sample"
+    assert params["data"]["matrix"][0]["S1"] == "2.1"